@@ -0,0 +1,513 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from storage import BOUNDARY_LAYER, INFRASTRUCTURE_DIR
+
+# Batch mode: the site-selection analysis for every district in a manifest,
+# one district per worker process. The province-wide inputs, the road graph
+# as CSR arrays and the POI coordinates, are copied once into
+# multiprocessing.shared_memory; workers map them by name instead of
+# receiving pickled copies and cut out their district's window. Workers
+# return raw tehsil criteria and site attributes, so all districts can be
+# scored together into one province-wide ranking; each district's own
+# ranking, station plan, catchment loads and charger sizing are kept next
+# to it.
+
+MANIFEST_FILE = 'data/districts/manifest.json'
+SITES_FILE = 'outputs/analysis/province_site_ranking.csv'
+TEHSILS_FILE = 'outputs/analysis/province_tehsil_ranking.csv'
+
+# Road graph and POIs are kept this far around a district, so drive times and
+# POI densities near its edge include the neighbouring district; it has to
+# cover the widest activity kernel, as the activity surface reaches that far
+# past the district's cells (demand.economic_activity)
+MARGIN_M = 20_000
+CELL_SIZE_M = 500
+
+NETWORK_ARRAYS = ['indptr', 'indices', 'travel_time', 'node_ids', 'x', 'y']
+CENSUS_COLUMNS = ['Tehsil', 'Population_2023', 'Area_SqKm', 'Population_Density', 'Annual_Growth_Rate']
+SITE_COLUMNS = ['Site_Name', 'Site_Type', 'Latitude', 'Longitude']
+
+
+class SharedArrays:
+    """Numpy arrays in named shared memory blocks, attached in other processes through ``spec``"""
+
+    def __init__(self, blocks, spec, owner):
+        self.blocks = blocks
+        self.spec = spec
+        self.owner = owner
+
+    @classmethod
+    def create(cls, arrays):
+        blocks, spec = {}, {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            blocks[name] = block
+            spec[name] = (block.name, array.dtype.str, array.shape)
+        return cls(blocks, spec, owner=True)
+
+    @classmethod
+    def attach(cls, spec):
+        blocks = {name: shared_memory.SharedMemory(name=block) for name, (block, _, _) in spec.items()}
+        return cls(blocks, spec, owner=False)
+
+    def __contains__(self, name):
+        return name in self.spec
+
+    def __getitem__(self, name):
+        """Read-only view of one array, no copy"""
+        _, dtype, shape = self.spec[name]
+        array = np.ndarray(shape, dtype, buffer=self.blocks[name].buf)
+        array.flags.writeable = False
+        return array
+
+    @property
+    def nbytes(self):
+        return sum(block.size for block in self.blocks.values())
+
+    def close(self):
+        """Detach; the creating process also frees the blocks"""
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+
+
+def province_arrays(network_file, infrastructure_dir=INFRASTRUCTURE_DIR):
+    """Road graph and POI arrays to share, and the POI category names"""
+    from network import RoadNetwork
+    from spatial_index import InfrastructureIndex
+
+    arrays = {}
+    if os.path.exists(network_file):
+        network = RoadNetwork.load(network_file)
+        arrays.update({f'network_{key}': getattr(network, key) for key in NETWORK_ARRAYS})
+
+    categories = []
+    pois = InfrastructureIndex(infrastructure_dir).pois()
+    if pois:
+        categories, codes = np.unique(pois.categories, return_inverse=True)
+        arrays['poi_x'], arrays['poi_y'] = pois.coords[:, 0], pois.coords[:, 1]
+        arrays['poi_category'] = codes.astype(np.int16)
+    return arrays, [str(category) for category in categories]
+
+
+# Shared inputs of a worker process, attached once by _attach
+_shared = None
+
+
+def _attach(spec):
+    global _shared
+    _shared = SharedArrays.attach(spec)
+
+
+class DistrictInfrastructure:
+    """spatial_index.InfrastructureIndex interface for one district window
+
+    POI indexes are built from the shared province arrays inside ``window``
+    (metric bounds); roads are read from the road layer with a bbox filter.
+    """
+
+    def __init__(self, window, categories, infrastructure_dir=INFRASTRUCTURE_DIR):
+        self.window = window
+        self.categories = np.asarray(categories)
+        self.infrastructure_dir = infrastructure_dir
+        self._layers = {}
+        if 'poi_x' in _shared:
+            x, y = _shared['poi_x'], _shared['poi_y']
+            inside = (x >= window[0]) & (y >= window[1]) & (x <= window[2]) & (y <= window[3])
+            self._x, self._y = x[inside], y[inside]
+            self._category = self.categories[_shared['poi_category'][inside]]
+        else:
+            self._x = self._y = np.zeros(0)
+            self._category = np.zeros(0, dtype=str)
+
+    def _points(self, mask, name):
+        import geopandas as gpd
+
+        from coordinates import points
+        from spatial_index import LayerIndex
+
+        if not mask.any():
+            return None
+        index = LayerIndex(gpd.GeoSeries(points(self._x[mask], self._y[mask])), name=name)
+        index.categories = self._category[mask]
+        return index
+
+    def layer(self, name):
+        if name not in self._layers:
+            self._layers[name] = self._points(self._category == name, name)
+        return self._layers[name]
+
+    def pois(self):
+        if 'pois' not in self._layers:
+            self._layers['pois'] = self._points(np.ones(len(self._x), dtype=bool), 'pois')
+        return self._layers['pois']
+
+    def roads(self):
+        if 'roads' not in self._layers:
+            from coordinates import to_geographic
+            from spatial_index import ROAD_LAYERS, InfrastructureIndex, LayerIndex
+            from storage import read_layer
+
+            lon, lat = to_geographic([self.window[0], self.window[2]], [self.window[1], self.window[3]])
+            self._layers['roads'] = None
+            for name in ROAD_LAYERS:
+                filepath = InfrastructureIndex(self.infrastructure_dir).path(name)
+                if filepath:
+                    roads = read_layer(filepath, columns=[], bbox=(lon[0], lat[0], lon[1], lat[1]), memory_map=True)
+                    self._layers['roads'] = LayerIndex(roads.geometry, name=name) if len(roads) else None
+                    break
+        return self._layers['roads']
+
+
+def district_network(window):
+    """The shared road graph cut to a district window, None without a network"""
+    from network import RoadNetwork
+
+    if 'network_indptr' not in _shared:
+        return None
+    network = RoadNetwork(*(_shared[f'network_{key}'] for key in NETWORK_ARRAYS))
+    inside = (network.x >= window[0]) & (network.y >= window[1]) & (network.x <= window[2]) & (network.y <= window[3])
+    return network.subgraph(inside) if inside.any() else None
+
+
+def district_census(district):
+    """Tehsil table of a district: census columns plus Lat/Lon centres"""
+    import pandas as pd
+
+    census_df = pd.read_csv(district['census'])
+    missing = [column for column in CENSUS_COLUMNS if column not in census_df.columns]
+    if missing:
+        raise ValueError(f"{district['census']} lacks columns: {', '.join(missing)}")
+    if 'tehsils' in district:
+        # Rows without a centre (e.g. district totals) are not tehsils
+        centres = district['tehsils']
+        census_df = census_df[census_df['Tehsil'].isin(centres)].reset_index(drop=True)
+        census_df['Lat'] = [centres[name][0] for name in census_df['Tehsil']]
+        census_df['Lon'] = [centres[name][1] for name in census_df['Tehsil']]
+    elif not {'Lat', 'Lon'} <= set(census_df.columns):
+        raise ValueError(f"{district['name']}: tehsil centres need Lat/Lon columns or a 'tehsils' entry")
+    return census_df
+
+
+def district_boundary(district):
+    """Boundary layer of a district, or its manifest bbox when the layer is missing"""
+    import geopandas as gpd
+    import shapely
+
+    from storage import find_layer, read_layer
+    from study_area import GEOGRAPHIC_CRS
+
+    filepath = find_layer(district['boundary']) if 'boundary' in district else None
+    if filepath:
+        return read_layer(filepath)
+    if 'bbox' in district:
+        return gpd.GeoDataFrame({'name': [district['name']]}, geometry=[shapely.box(*district['bbox'])],
+                                crs=GEOGRAPHIC_CRS)
+    raise ValueError(f"{district['name']}: no boundary layer and no bbox")
+
+
+def district_sites(district, census_df):
+    """Candidate sites of a district, each in its given or nearest tehsil"""
+    import pandas as pd
+
+    from coordinates import add_metric_xy, to_metric
+
+    sites = pd.read_csv(district['sites'])
+    missing = [column for column in SITE_COLUMNS if column not in sites.columns]
+    if missing:
+        raise ValueError(f"{district['sites']} lacks columns: {', '.join(missing)}")
+    add_metric_xy(sites)
+    if 'Tehsil' not in sites.columns:
+        tehsil_x, tehsil_y = to_metric(census_df['Lon'], census_df['Lat'])
+        distance = np.hypot(sites['x'].to_numpy()[:, None] - tehsil_x, sites['y'].to_numpy()[:, None] - tehsil_y)
+        sites['Tehsil'] = census_df['Tehsil'].to_numpy()[distance.argmin(axis=1)]
+    return sites
+
+
+def score_tehsils(tehsils, network=True):
+    """MCDA scores of tehsils from their raw criterion columns, as in ev_site_analysis.py
+
+    Accessibility is the population within a 15 minute drive, or without a
+    road network the tehsil area (smaller = more accessible).
+    """
+    import mcda
+    from criteria import criteria_weights
+
+    accessibility_direction = mcda.BENEFIT if network else mcda.COST
+    criteria_matrix = np.column_stack([
+        tehsils['Population_Density'],
+        tehsils['Annual_Growth_Rate'],
+        tehsils['Accessibility'] if network else tehsils['Area_SqKm'],
+        tehsils['Economic_Activity'],
+        tehsils['Population_Density']
+    ])
+    directions = [mcda.BENEFIT, mcda.BENEFIT, accessibility_direction, mcda.BENEFIT, mcda.BENEFIT]
+    return mcda.score(criteria_matrix, mcda.weight_vector(criteria_weights), directions=directions)
+
+
+def analyze_district(district, categories, cell_size=CELL_SIZE_M, margin=MARGIN_M):
+    """One district's analysis in a worker: tehsil criteria, site attributes and district-level results"""
+    import pandas as pd
+
+    import catchment
+    import dasymetric
+    import demand
+    import facility_location
+    import grid
+    import site_scoring
+    import sizing
+    from coordinates import metric_xy, to_metric
+    from criteria import site_criteria_directions, site_criteria_weights
+    from ev_site_analysis import COVERAGE_RADIUS_M, MONTE_CARLO_SAMPLES, N_STATIONS, RANDOM_SEED
+    from network import reachable_totals, site_accessibility
+    from study_area import METRIC_CRS
+
+    start = time.perf_counter()
+    census_df = district_census(district)
+    boundary = district_boundary(district)
+    minx, miny, maxx, maxy = boundary.to_crs(METRIC_CRS).total_bounds
+    window = (minx - margin, miny - margin, maxx + margin, maxy + margin)
+    infrastructure = DistrictInfrastructure(window, categories, district.get('infrastructure', INFRASTRUCTURE_DIR))
+    road_network = district_network(window)
+
+    roads = infrastructure.roads()
+    cells = grid.cell_criteria(grid.make_grid(boundary, cell_size=cell_size), census_df)
+    cells['Population'] = dasymetric.cell_population(cells, census_df, roads.geometry.values if roads else None)
+
+    pois = infrastructure.pois()
+    if pois:
+        cells['Economic_Activity'] = demand.economic_activity(pois, cells['x'], cells['y'])
+        tehsil_activity = cells.groupby('Tehsil', observed=True)['Economic_Activity'].mean()
+        census_df['Economic_Activity'] = census_df['Tehsil'].map(tehsil_activity).fillna(0).to_numpy()
+    else:
+        census_df['Economic_Activity'] = census_df['Population_2023'] * census_df['Population_Density'] / 1000000
+
+    if road_network is not None:
+        node_population = road_network.node_totals(cells['x'], cells['y'], cells['Population'])
+        tehsil_x, tehsil_y = to_metric(census_df['Lon'], census_df['Lat'])
+        census_df['Accessibility'] = reachable_totals(road_network, road_network.snap(tehsil_x, tehsil_y),
+                                                      node_population, [15])[:, 0]
+    else:
+        census_df['Accessibility'] = np.nan
+
+    scores = score_tehsils(census_df, network=road_network is not None)
+    census_df['District_Score'] = scores.composite
+    census_df['District_Rank'] = scores.ranks
+
+    sites = district_sites(district, census_df)
+    sites = sites.merge(census_df[['Tehsil', 'District_Score', 'Annual_Growth_Rate']].rename(columns={
+        'District_Score': 'Tehsil_Score', 'Annual_Growth_Rate': 'Growth_Potential'}), on='Tehsil', how='inner')
+    site_catchments = dasymetric.catchment_matrix(sites[['x', 'y']].to_numpy(), cells, COVERAGE_RADIUS_M)
+    sites['Population_Served'] = np.rint(
+        dasymetric.served_population(site_catchments, cells['Population'])).astype(np.int64)
+    sites = sites.join(site_scoring.site_features(sites, infrastructure))
+    if road_network is not None:
+        sites = sites.join(site_accessibility(road_network, sites, cells))
+    else:
+        sites['Population_15Min'] = np.nan
+
+    # District-level ranking and station plan, as the single-district analysis makes them
+    sites = site_scoring.score_sites(sites, site_criteria_weights, site_criteria_directions,
+                                     monte_carlo_samples=MONTE_CARLO_SAMPLES, seed=RANDOM_SEED)
+    sites = sites.sort_values('Site_Score', ascending=False, kind='stable').reset_index(drop=True)
+    sites = sites.rename(columns={'Site_Score': 'District_Score'}).drop(columns=['Recommendation',
+                                                                                 'Tier_Confidence'])
+    sites['District_Rank'] = np.arange(1, len(sites) + 1)
+    site_x, site_y = metric_xy(sites)
+    coverage = facility_location.coverage_matrix(np.column_stack([site_x, site_y]), cells[['x', 'y']].to_numpy(),
+                                                 COVERAGE_RADIUS_M)
+    plan = facility_location.max_coverage(coverage, cells['Population'], N_STATIONS)
+    sites['Selection_Order'] = pd.array([pd.NA] * len(sites), dtype='Int64')
+    sites.loc[plan.selected, 'Selection_Order'] = np.arange(1, len(plan.selected) + 1)
+    sites['Population_Covered'] = 0.0
+    sites.loc[plan.selected, 'Population_Covered'] = plan.gains
+
+    catchments = catchment.Catchments(cells[['x', 'y']].to_numpy(), cells['Population'], network=road_network)
+    site_loads = catchments.set_sites(np.column_stack([site_x, site_y])).site_loads()
+    for column in ['Catchment_Population', 'Sessions_Per_Day', 'Utilization', 'Overloaded']:
+        sites[column] = site_loads[column].to_numpy()
+    site_sizing = sizing.size_sites(sites['Sessions_Per_Day'], seed=RANDOM_SEED)
+    for column in site_sizing.columns:
+        sites[column] = site_sizing[column].to_numpy()
+
+    census_df.insert(0, 'District', district['name'])
+    sites.insert(0, 'District', district['name'])
+    summary = {'district': district['name'], 'tehsils': len(census_df), 'sites': len(sites), 'cells': len(cells),
+               'pois': len(pois) if pois else 0, 'nodes': len(road_network) if road_network is not None else 0,
+               'seconds': round(time.perf_counter() - start, 2)}
+    return census_df, sites, summary
+
+
+def province_ranking(tehsils, sites):
+    """All districts scored together: province-wide tehsil scores, then site scores and ranks"""
+    import site_scoring
+    from criteria import site_criteria_directions, site_criteria_weights
+    from ev_site_analysis import MONTE_CARLO_SAMPLES, RANDOM_SEED
+
+    # Drive-time accessibility only if every district had road network nodes
+    scores = score_tehsils(tehsils, network=bool(tehsils['Accessibility'].notna().all()))
+    tehsils = tehsils.assign(composite_score=scores.composite, priority_rank=scores.ranks)
+    tehsils = tehsils.sort_values('priority_rank', kind='stable').reset_index(drop=True)
+
+    tehsil_scores = tehsils.set_index(['District', 'Tehsil'])['composite_score']
+    sites = sites.assign(Tehsil_Score=tehsil_scores.reindex(list(zip(sites['District'], sites['Tehsil']))).to_numpy())
+    sites = site_scoring.score_sites(sites, site_criteria_weights, site_criteria_directions,
+                                     monte_carlo_samples=MONTE_CARLO_SAMPLES, seed=RANDOM_SEED)
+    sites = sites.sort_values('Site_Score', ascending=False, kind='stable').reset_index(drop=True)
+    sites.insert(0, 'Province_Rank', np.arange(1, len(sites) + 1))
+    return tehsils, sites
+
+
+def run_districts(districts, arrays, categories, workers=None):
+    """Every district in a process pool over the shared arrays; returns results and failures"""
+    shared = SharedArrays.create(arrays)
+    print(f"🧠 Shared inputs: {len(arrays)} arrays, {shared.nbytes / 1e6:,.1f} MB")
+    results, failures = [], []
+    try:
+        with ProcessPoolExecutor(max_workers=workers or min(len(districts), os.cpu_count() or 1),
+                                 mp_context=get_context('spawn'), initializer=_attach,
+                                 initargs=(shared.spec,)) as pool:
+            futures = {pool.submit(analyze_district, district, categories): district['name'] for district in districts}
+            for future in as_completed(futures):
+                try:
+                    tehsils, sites, summary = future.result()
+                except Exception as e:
+                    failures.append({'district': futures[future], 'error': f'{type(e).__name__}: {e}'})
+                    print(f"❌ {futures[future]}: {failures[-1]['error']}")
+                    continue
+                results.append((tehsils, sites, summary))
+                print(f"✅ {summary['district']}: {summary['tehsils']} tehsils, {summary['sites']} sites, "
+                      f"{summary['cells']:,} cells, {summary['nodes']:,} nodes in {summary['seconds']:.1f}s")
+    finally:
+        shared.close()
+    # Manifest order, so ties rank the same way however the workers finished
+    order = {district['name']: i for i, district in enumerate(districts)}
+    return sorted(results, key=lambda result: order[result[2]['district']]), failures
+
+
+def load_manifest(filepath):
+    """District entries of a manifest file
+
+    A manifest is {"districts": [...]}, each district with a ``name``, a
+    ``census`` CSV (CENSUS_COLUMNS, plus Lat/Lon unless ``tehsils`` maps tehsil
+    names to [lat, lon]), a ``sites`` CSV (SITE_COLUMNS, Tehsil optional) and
+    a ``boundary`` layer path without extension and/or a lon/lat ``bbox``.
+    Relative paths are from the project root.
+    """
+    with open(filepath) as f:
+        districts = json.load(f)['districts']
+    names = [district['name'] for district in districts]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate districts in {filepath}: {', '.join(duplicates)}")
+    return districts
+
+
+def write_lahore_manifest(filepath=MANIFEST_FILE):
+    """Manifest with the built-in Lahore inputs, a template for adding districts"""
+    import pandas as pd
+
+    from ev_site_analysis import potential_sites
+    from study_area import lahore_coords, tehsil_coordinates
+
+    sites_file = os.path.join(os.path.dirname(filepath), 'lahore_sites.csv')
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    pd.DataFrame([
+        {'Site_Name': site['name'], 'Tehsil': tehsil, 'Site_Type': site['type'],
+         'Latitude': site['lat'], 'Longitude': site['lon']}
+        for tehsil, sites in potential_sites.items() for site in sites
+    ]).to_csv(sites_file, index=False)
+    lons, lats = zip(*lahore_coords)
+    manifest = {'districts': [{
+        'name': 'Lahore',
+        'census': 'data/demographics/lahore_census_2023.csv',
+        'tehsils': tehsil_coordinates,
+        'sites': sites_file,
+        'boundary': BOUNDARY_LAYER,
+        'bbox': [min(lons), min(lats), max(lons), max(lats)]
+    }]}
+    with open(filepath, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return filepath
+
+
+def main(argv=None):
+    import pandas as pd
+
+    from instrumentation import RunLog
+    from network import NETWORK_FILE
+
+    parser = argparse.ArgumentParser(description="Site selection for every district in a manifest")
+    parser.add_argument('--manifest', default=MANIFEST_FILE)
+    parser.add_argument('--init', action='store_true', help="Write a manifest with the Lahore inputs and exit")
+    parser.add_argument('--network', default=NETWORK_FILE, help="Province-wide road network (.npz)")
+    parser.add_argument('--infrastructure', default=INFRASTRUCTURE_DIR, help="Province-wide POI/road layers")
+    parser.add_argument('--districts', help="Comma-separated subset of the manifest's districts")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--sites-output', default=SITES_FILE)
+    parser.add_argument('--tehsils-output', default=TEHSILS_FILE)
+    args = parser.parse_args(argv)
+
+    if args.init:
+        print(f"✅ Manifest: {write_lahore_manifest(args.manifest)}")
+        return 0
+    if not os.path.exists(args.manifest):
+        parser.error(f"{args.manifest} not found (--init writes one for Lahore)")
+
+    districts = load_manifest(args.manifest)
+    if args.districts:
+        selected = args.districts.split(',')
+        unknown = set(selected) - {district['name'] for district in districts}
+        if unknown:
+            parser.error(f"Not in {args.manifest}: {', '.join(sorted(unknown))}")
+        districts = [district for district in districts if district['name'] in selected]
+    for district in districts:
+        district.setdefault('infrastructure', args.infrastructure)
+
+    print("⚡ PROVINCE BATCH SITE SELECTION")
+    print("=" * 60)
+    run_log = RunLog('batch')
+
+    with run_log.stage('shared_inputs') as stage:
+        arrays, categories = province_arrays(args.network, args.infrastructure)
+        stage.count(nodes=len(arrays.get('network_node_ids', [])), pois=len(arrays.get('poi_x', [])))
+    if 'network_indptr' not in arrays:
+        print(f"⚠️ Road network not found ({args.network}), accessibility approximated from tehsil area")
+
+    with run_log.stage('districts') as stage:
+        results, failures = run_districts(districts, arrays, categories, args.workers)
+        stage.count(districts=len(results), failed=len(failures))
+    if not results:
+        print("❌ No district finished")
+        return 1
+
+    with run_log.stage('ranking') as stage:
+        tehsils, sites = province_ranking(pd.concat([r[0] for r in results], ignore_index=True),
+                                          pd.concat([r[1] for r in results], ignore_index=True))
+        for filepath, table in ((args.sites_output, sites), (args.tehsils_output, tehsils)):
+            os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+            table.to_csv(filepath, index=False)
+        stage.count(tehsils=len(tehsils), sites=len(sites))
+
+    print(f"\n🏆 TOP 10 SITES ACROSS {len(results)} DISTRICTS:")
+    for _, row in sites.head(10).iterrows():
+        print(f"{row['Province_Rank']}. {row['Site_Name']} ({row['Tehsil']}, {row['District']}) - "
+              f"Score: {row['Site_Score']:.1f} | {row['Recommendation']} | district #{row['District_Rank']}")
+    print(f"\n📊 Sites: {args.sites_output}")
+    print(f"📊 Tehsils: {args.tehsils_output}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
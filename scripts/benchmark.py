@@ -0,0 +1,451 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from importlib import import_module
+from multiprocessing import get_context
+
+import numpy as np
+
+from instrumentation import reset_peak_rss, rss_mb
+
+# Scaling benchmarks on synthetic, seeded Lahore-sized inputs. Every
+# (stage, size) case runs in a fresh process so peak RSS is the case's own;
+# its inputs are generated first and only the stage itself is timed. Results
+# go to a JSON file that can be stored as a baseline and compared against
+# later runs to flag slowdowns and memory growth. Nothing is downloaded.
+
+RESULTS_FILE = 'outputs/benchmarks/benchmark.json'
+BASELINE_FILE = 'outputs/benchmarks/baseline.json'
+SEED = 42
+
+QUICK_SIZES = [10 ** 3, 10 ** 4, 10 ** 5]
+FULL_SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+
+# Slower or bigger than the baseline by more than this share is a regression,
+# ignoring differences below the noise floors
+TOLERANCE = 0.25
+MIN_SECONDS = 0.05
+MIN_RSS_MB = 10
+
+# Synthetic study area: a lobed polygon of this radius around the centre
+BOUNDARY_RADIUS_M = 20_000
+BOUNDARY_VERTICES = 64
+ROAD_SPACING_M = 100
+ACCESSIBILITY_SOURCES = 64
+
+# Start-up budget of CLI subcommands, checked on every run: `cli.py <command>`
+# is run for real from an empty directory until its first stage starts
+# (EV_STARTUP_PROBE, instrumentation.py), or to the end for commands without
+# stages such as check. analyze needs pandas before its first stage, which
+# alone takes 350-550 ms here, so its budget is above check's.
+IMPORT_BUDGET_MS = {'check': 300, 'analyze': 900}
+IMPORT_RUNS = 5
+# Arguments each subcommand is started with
+STARTUP_ARGS = {'analyze': ['--no-map']}
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _centre():
+    from coordinates import to_metric
+    from study_area import lahore_center
+
+    x, y = to_metric([lahore_center[1]], [lahore_center[0]])
+    return float(x[0]), float(y[0])
+
+
+def synthetic_boundary(rng, radius=BOUNDARY_RADIUS_M, vertices=BOUNDARY_VERTICES):
+    """District-like polygon (metric CRS GeoDataFrame): a circle with random lobes"""
+    import geopandas as gpd
+    import shapely
+
+    from study_area import METRIC_CRS
+
+    cx, cy = _centre()
+    angle = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    lobes = sum(rng.uniform(0, 0.08) * np.cos(k * angle + rng.uniform(0, 2 * np.pi)) for k in range(2, 6))
+    r = radius * (1 + lobes)
+    ring = np.column_stack([cx + r * np.cos(angle), cy + r * np.sin(angle)])
+    return gpd.GeoDataFrame({'name': ['Synthetic District']}, geometry=[shapely.polygons(ring)], crs=METRIC_CRS)
+
+
+def synthetic_points(n, rng, clusters=20, spread=0.25, radius=BOUNDARY_RADIUS_M):
+    """Metric x/y of n points, most of them in Gaussian clusters like POIs"""
+    cx, cy = _centre()
+    centres = rng.normal(0, radius / 3, (clusters, 2))
+    clustered = rng.random(n) < 0.8
+    members = rng.integers(0, clusters, n)
+    xy = np.where(clustered[:, None],
+                  centres[members] + rng.normal(0, radius * spread / 4, (n, 2)),
+                  rng.uniform(-radius, radius, (n, 2)))
+    return cx + xy[:, 0], cy + xy[:, 1]
+
+
+def synthetic_pois(n, rng):
+    """POIs as a metric GeoDataFrame with spatial_index.POI_CATEGORIES"""
+    import geopandas as gpd
+
+    from spatial_index import POI_CATEGORIES
+    from study_area import METRIC_CRS
+
+    x, y = synthetic_points(n, rng)
+    return gpd.GeoDataFrame({'category': rng.choice(POI_CATEGORIES, n), 'name': np.arange(n).astype(str)},
+                            geometry=gpd.points_from_xy(x, y), crs=METRIC_CRS)
+
+
+def synthetic_cells(n, boundary):
+    """Hex candidate grid with about n cells over the boundary"""
+    import grid
+
+    area = float(boundary.geometry.area.sum())
+    # Hex cell area is s² √3/2 for centre spacing s
+    return grid.make_grid(boundary, cell_size=np.sqrt(area / n / (np.sqrt(3) / 2)))
+
+
+def synthetic_network(n, rng, spacing=ROAD_SPACING_M, removed=0.1):
+    """network.RoadNetwork on a jittered lattice of about n nodes
+
+    Neighbours are joined both ways, a share of links is dropped so routes
+    detour, and every link gets a speed from network.DEFAULT_SPEEDS_KPH.
+    """
+    from scipy.sparse import csr_matrix
+
+    from network import DEFAULT_SPEEDS_KPH, RoadNetwork
+
+    side = int(np.ceil(np.sqrt(n)))
+    cx, cy = _centre()
+    row, col = np.divmod(np.arange(side * side), side)
+    x = cx + (col - side / 2) * spacing + rng.normal(0, spacing / 5, side * side)
+    y = cy + (row - side / 2) * spacing + rng.normal(0, spacing / 5, side * side)
+
+    node = np.arange(side * side).reshape(side, side)
+    u = np.concatenate([node[:, :-1].ravel(), node[:-1, :].ravel()])
+    v = np.concatenate([node[:, 1:].ravel(), node[1:, :].ravel()])
+    keep = rng.random(len(u)) >= removed
+    u, v = u[keep], v[keep]
+    speed = rng.choice(np.array(list(DEFAULT_SPEEDS_KPH.values()), dtype=float), len(u))
+    seconds = np.hypot(x[u] - x[v], y[u] - y[v]) / (speed / 3.6)
+
+    matrix = csr_matrix((np.concatenate([seconds, seconds]).astype(np.float32),
+                         (np.concatenate([u, v]), np.concatenate([v, u]))), shape=(side * side, side * side))
+    return RoadNetwork(matrix.indptr, matrix.indices, matrix.data, np.arange(side * side, dtype=np.int64), x, y)
+
+
+def synthetic_sites(n, rng):
+    """Candidate site table with every criteria.site_criteria_weights column"""
+    import pandas as pd
+
+    from criteria import site_criteria_weights
+
+    columns = {
+        'Site_Name': np.char.add('Site ', np.arange(n).astype(str)),
+        'Tehsil_Score': rng.uniform(0, 100, n),
+        'Nearest_Commercial_Km': rng.gamma(2, 0.5, n),
+        'POIs_Within_1Km': rng.poisson(8, n),
+        'Road_Distance_Km': rng.gamma(1.5, 0.3, n),
+        'Population_15Min': rng.lognormal(12, 1, n)
+    }
+    missing = set(site_criteria_weights) - set(columns)
+    if missing:
+        raise KeyError(f"No synthetic data for site criteria: {sorted(missing)}")
+    return pd.DataFrame(columns)
+
+
+# inputs(size, rng) -> keyword arguments of run, which returns the number of
+# items processed; imports are loaded before timing so one-off import cost
+# (measured separately) does not swamp small sizes
+Stage = namedtuple('Stage', ['inputs', 'run', 'max_size', 'imports'])
+
+def _scoring_inputs(n, rng):
+    return {'sites': synthetic_sites(n, rng)}
+
+
+def _scoring(sites):
+    import site_scoring
+    from criteria import site_criteria_directions, site_criteria_weights
+
+    return len(site_scoring.score_sites(sites, site_criteria_weights, site_criteria_directions))
+
+
+def _spatial_join_inputs(n, rng):
+    boundary = synthetic_boundary(rng)
+    return {'pois': synthetic_pois(n, rng), 'cells': synthetic_cells(n, boundary)}
+
+
+def _spatial_join(pois, cells):
+    from spatial_index import LayerIndex
+
+    index = LayerIndex(pois.geometry, name='pois')
+    x, y = cells['x'].to_numpy(), cells['y'].to_numpy()
+    index.nearest(x, y)
+    index.count_within(x, y, 1000)
+    return len(cells)
+
+
+def _network_inputs(n, rng):
+    network = synthetic_network(n, rng)
+    x, y = synthetic_points(n, rng)
+    return {'network': network, 'x': x, 'y': y, 'population': rng.lognormal(5, 1, n),
+            'sources': rng.choice(len(network), min(ACCESSIBILITY_SOURCES, len(network)), replace=False)}
+
+
+def _network(network, x, y, population, sources):
+    from network import reachable_totals
+
+    reachable_totals(network, sources, network.node_totals(x, y, population))
+    return len(network)
+
+
+def _map_inputs(n, rng):
+    import pandas as pd
+
+    from coordinates import to_geographic
+
+    lon, lat = to_geographic(*synthetic_points(n, rng))
+    popups = pd.DataFrame({'Name': np.char.add('POI ', np.arange(n).astype(str)),
+                           'Score': rng.uniform(0, 100, n).round(1)})
+    return {'lat': lat, 'lon': lon, 'popups': popups, 'directory': tempfile.mkdtemp(prefix='ev_benchmark_')}
+
+
+def _map_rendering(lat, lon, popups, directory):
+    import folium
+
+    from web_map import add_points, save_map
+
+    m = folium.Map(location=[float(np.mean(lat)), float(np.mean(lon))], zoom_start=11)
+    add_points(m, lat, lon, popups, name='Synthetic POIs')
+    save_map(m, os.path.join(directory, 'benchmark_map.html'))
+    return len(lat)
+
+
+def _io_inputs(n, rng):
+    return {'pois': synthetic_pois(n, rng), 'directory': tempfile.mkdtemp(prefix='ev_benchmark_')}
+
+
+def _io(pois, directory):
+    from storage import read_layer, write_layer
+
+    for fmt in ('parquet', 'feather'):
+        read_layer(write_layer(pois, os.path.join(directory, f'pois_{fmt}'), fmt))
+    return len(pois)
+
+
+def _sizing_inputs(n, rng):
+    # Daily sessions per site, skewed like catchment demand
+    return {'sessions': rng.gamma(2.0, 40.0, n)}
+
+
+def _sizing(sessions):
+    import sizing
+
+    return len(sizing.size_sites(sessions, seed=SEED))
+
+
+STAGES = {
+    'scoring': Stage(_scoring_inputs, _scoring, 10 ** 7, ['site_scoring']),
+    'spatial_join': Stage(_spatial_join_inputs, _spatial_join, 10 ** 7,
+                          ['spatial_index', 'scipy.spatial', 'shapely']),
+    'network': Stage(_network_inputs, _network, 10 ** 6, ['network', 'scipy.sparse.csgraph', 'geopandas']),
+    'map_rendering': Stage(_map_inputs, _map_rendering, 10 ** 6, ['folium', 'web_map']),
+    'io': Stage(_io_inputs, _io, 10 ** 7, ['storage', 'geopandas', 'pyarrow.parquet', 'pyarrow.feather']),
+    # Sites, each simulated over sizing.REPLICATIONS days
+    'charger_sizing': Stage(_sizing_inputs, _sizing, 10 ** 4, ['sizing'])
+}
+
+
+def run_case(stage, size, seed=SEED):
+    """Generate the inputs of one case, then time the stage on them"""
+    spec = STAGES[stage]
+    rng = np.random.default_rng([seed, size])
+
+    start = time.perf_counter()
+    inputs = spec.inputs(size, rng)
+    for module in spec.imports:
+        import_module(module)
+    generate_seconds = time.perf_counter() - start
+
+    rss_before = rss_mb()
+    reset = reset_peak_rss()
+    wall, cpu = time.perf_counter(), time.process_time()
+    count = spec.run(**inputs)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    if 'directory' in inputs:
+        shutil.rmtree(inputs['directory'], ignore_errors=True)
+    return {
+        'stage': stage, 'size': size, 'items': int(count),
+        'wall_seconds': round(wall, 4), 'cpu_seconds': round(cpu, 4),
+        'peak_rss_mb': round(rss_mb(), 1), 'rss_before_mb': round(rss_before, 1),
+        # Without a reset the peak may be the input generation's
+        'peak_is_stage': reset,
+        'generate_seconds': round(generate_seconds, 4)
+    }
+
+
+def run_benchmarks(stages, sizes, seed=SEED):
+    """Every stage at every size up to its limit, one fresh process per case"""
+    cases = [(stage, size) for stage in stages for size in sizes if size <= STAGES[stage].max_size]
+    results = []
+    for stage, size in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            try:
+                result = pool.submit(run_case, stage, size, seed).result()
+            except Exception as e:
+                result = {'stage': stage, 'size': size, 'error': f'{type(e).__name__}: {e}'}
+        results.append(result)
+        if 'error' in result:
+            print(f"⚠️ {stage} @ {size:,}: {result['error']}")
+        else:
+            print(f"✅ {stage} @ {size:,}: {result['wall_seconds']:.3f}s wall, "
+                  f"{result['cpu_seconds']:.3f}s CPU, peak {result['peak_rss_mb']:,.0f} MB")
+    return results
+
+
+def _startup_command(command):
+    return [os.path.join(SCRIPTS_DIR, 'cli.py'), command, *STARTUP_ARGS.get(command, [])]
+
+
+def import_times(commands, runs=IMPORT_RUNS, top=5):
+    """Start-up time of each CLI subcommand, and its heaviest imports from ``-X importtime``
+
+    Each command runs in a fresh interpreter and an empty scratch directory,
+    with EV_STARTUP_PROBE set so it ends when its first stage starts; the
+    median wall time of ``runs`` starts is compared against IMPORT_BUDGET_MS.
+    Nothing is downloaded (EV_OSM_OFFLINE) or written to the project.
+    """
+    env = dict(os.environ, EV_STARTUP_PROBE='1', EV_OSM_OFFLINE='1', PYTHONIOENCODING='utf-8')
+    results = []
+    for command in commands:
+        with tempfile.TemporaryDirectory(prefix='ev_startup_') as scratch:
+            walls = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, *_startup_command(command)], cwd=scratch, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                walls.append((time.perf_counter() - start) * 1000)
+
+            # Lines are 'import time: self [us] | cumulative | name', nested imports indented
+            profile = subprocess.run([sys.executable, '-X', 'importtime', *_startup_command(command)], cwd=scratch,
+                                     env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+        modules = {}
+        for line in profile.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[1].strip().isdigit() and not fields[2].startswith('  '):
+                modules[fields[2].strip()] = int(fields[1]) / 1000
+        budget = IMPORT_BUDGET_MS.get(command)
+        results.append({
+            'command': command, 'startup_ms': round(statistics.median(walls), 1),
+            'import_ms': round(sum(modules.values()), 1), 'budget_ms': budget,
+            'heaviest': {name: round(ms, 1) for name, ms in sorted(modules.items(), key=lambda m: -m[1])[:top]}
+        })
+    return results
+
+
+def over_budget(imports):
+    """Subcommands whose start-up exceeds their budget"""
+    return [r for r in imports if r['budget_ms'] is not None and r['startup_ms'] > r['budget_ms']]
+
+
+def compare(results, baseline, tolerance=TOLERANCE, min_seconds=MIN_SECONDS, min_rss_mb=MIN_RSS_MB):
+    """Cases slower or using more memory than the baseline beyond the tolerance"""
+    previous = {(r['stage'], r['size']): r for r in baseline.get('results', []) if 'error' not in r}
+    regressions = []
+    for result in results:
+        old = previous.get((result['stage'], result['size']))
+        if old is None or 'error' in result:
+            continue
+        for metric, floor in (('wall_seconds', min_seconds), ('peak_rss_mb', min_rss_mb)):
+            before, after = old[metric], result[metric]
+            if after > before * (1 + tolerance) and after - before > floor:
+                regressions.append({'stage': result['stage'], 'size': result['size'], 'metric': metric,
+                                    'baseline': before, 'current': after, 'ratio': round(after / before, 2)})
+    return regressions
+
+
+def _sizes(text):
+    return [int(float(size)) for size in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmarks on synthetic Lahore-sized data")
+    parser.add_argument('--stages', default=','.join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument('--sizes', type=_sizes, help="Comma-separated sizes, e.g. 1e3,1e5")
+    parser.add_argument('--full', action='store_true', help="Run 10^3 to 10^7 elements (default up to 10^5)")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Results to compare against, if present")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--skip-imports', action='store_true', help="Skip the CLI start-up budget check")
+    args = parser.parse_args()
+
+    stages = args.stages.split(',')
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))} (choose from {', '.join(STAGES)})")
+    sizes = args.sizes or (FULL_SIZES if args.full else QUICK_SIZES)
+
+    print("⚡ PIPELINE BENCHMARKS")
+    print("=" * 60)
+    results = run_benchmarks(stages, sizes, args.seed)
+
+    imports = []
+    if not args.skip_imports:
+        from cli import COMMANDS
+
+        print("\n⏱️ CLI START-UP:")
+        imports = import_times(COMMANDS)
+        for r in imports:
+            budget = f" (budget {r['budget_ms']} ms)" if r['budget_ms'] is not None else ''
+            heaviest = ', '.join(f"{name} {ms:.0f}" for name, ms in r['heaviest'].items())
+            print(f"{'⚠️' if over_budget([r]) else '✅'} {r['command']}: {r['startup_ms']:.0f} ms{budget} "
+                  f"- imports {r['import_ms']:.0f} ms: {heaviest}")
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'results': results,
+        'imports': imports
+    }
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report['baseline'] = args.baseline
+        report['regressions'] = regressions
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📊 Results: {args.output}")
+
+    budget_failures = over_budget(imports)
+    for r in budget_failures:
+        print(f"⚠️ OVER BUDGET cli {r['command']}: {r['startup_ms']} ms > {r['budget_ms']} ms")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved as baseline: {args.baseline}")
+    elif 'regressions' in report:
+        if not regressions:
+            print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        for r in regressions:
+            print(f"⚠️ REGRESSION {r['stage']} @ {r['size']:,}: {r['metric']} "
+                  f"{r['baseline']} -> {r['current']} ({r['ratio']}x)")
+    return 1 if regressions or budget_failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,331 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Catchments: every demand cell is assigned to its nearest site, either by
+# straight-line distance (Voronoi through a KD-tree) or by drive time
+# (multi-source Dijkstra over the road network). Adding or removing a site
+# only recomputes the cells whose nearest site can change, so what-if
+# edits of a plan stay interactive on a million cells.
+
+# Expected public charging sessions generated per resident per day
+EV_PER_1000_RESIDENTS = 0.5
+SESSIONS_PER_EV_PER_DAY = 0.3  # Averaged over days without a charge
+PUBLIC_CHARGING_SHARE = 0.5  # Sessions at public stations rather than at home
+SESSIONS_PER_RESIDENT = EV_PER_1000_RESIDENTS / 1000 * SESSIONS_PER_EV_PER_DAY * PUBLIC_CHARGING_SHARE
+
+# Sessions a site handles per day: 4 chargers x 20 sessions
+SITE_CAPACITY_SESSIONS = 80
+
+
+class Catchments:
+    """Nearest-site assignment of demand points, editable one site at a time
+
+    ``demand_xy`` are metric coordinates (e.g. grid cell centres) and
+    ``demand`` their weights (e.g. population). With a
+    network.RoadNetwork costs are drive times in seconds, otherwise
+    distances in metres. Points further than ``max_cost`` from every site
+    stay unassigned (-1).
+    """
+
+    def __init__(self, demand_xy, demand, network=None, max_cost=None):
+        self.demand_xy = np.asarray(demand_xy, dtype=float)
+        self.demand = np.asarray(demand, dtype=float)
+        self.network = network
+        self.max_cost = max_cost
+        self.site_xy = np.zeros((0, 2))
+        self.active = np.zeros(0, dtype=bool)
+        self.assignment = np.full(len(self.demand_xy), -1, dtype=np.int64)
+        self.cost = np.full(len(self.demand_xy), np.inf)
+
+        if network is not None:
+            self.demand_nodes = network.snap(self.demand_xy[:, 0], self.demand_xy[:, 1])
+            self.site_nodes = np.zeros(0, dtype=np.int64)
+            self.node_time = np.full(len(network), np.inf)
+            self.node_site = np.full(len(network), -1, dtype=np.int64)
+            self._edge_sources = np.repeat(np.arange(len(network)), np.diff(network.indptr))
+        else:
+            from scipy.spatial import cKDTree
+
+            self._demand_tree = cKDTree(self.demand_xy)
+
+    @property
+    def limit(self):
+        return np.inf if self.max_cost is None else self.max_cost
+
+    def set_sites(self, site_xy):
+        """Assign every demand point from scratch"""
+        self.site_xy = np.asarray(site_xy, dtype=float).reshape(-1, 2)
+        self.active = np.ones(len(self.site_xy), dtype=bool)
+        if self.network is None:
+            self._assign_euclidean(np.arange(len(self.demand_xy)))
+            return self
+
+        self.site_nodes = self.network.snap(self.site_xy[:, 0], self.site_xy[:, 1])
+        self.node_time[:] = np.inf
+        self.node_site[:] = -1
+        if len(self.site_nodes):
+            times, origin = self.network.nearest_source(self.site_nodes, limit=self.limit)
+            self.node_time = np.where(origin >= 0, times, np.inf)
+            self.node_site = origin
+        self._cells_from_nodes()
+        return self
+
+    def add_site(self, xy):
+        """Add a site, returns its index and the demand points it took over"""
+        xy = np.asarray(xy, dtype=float)
+        site = len(self.site_xy)
+        self.site_xy = np.vstack([self.site_xy, xy])
+        self.active = np.append(self.active, True)
+
+        if self.network is not None:
+            from scipy.sparse.csgraph import dijkstra
+
+            node = self.network.snap([xy[0]], [xy[1]])[0]
+            self.site_nodes = np.append(self.site_nodes, node)
+            times = dijkstra(self.network.matrix, directed=True, indices=node, limit=self.limit)
+            # Ties keep their current site
+            better = np.flatnonzero(times < self.node_time)
+            self.node_time[better] = times[better]
+            self.node_site[better] = site
+            return site, self._cells_from_nodes(better)
+
+        # A point can only switch if the new site is closer than its current
+        # one, so only points within the largest current distance are checked
+        radius = min(self.limit, self.cost.max(initial=0.0))
+        if np.isfinite(radius):
+            candidates = np.asarray(self._demand_tree.query_ball_point(xy, radius), dtype=np.int64)
+        else:
+            candidates = np.arange(len(self.demand_xy))
+        distance = np.hypot(*(self.demand_xy[candidates] - xy).T)
+        better = (distance < self.cost[candidates]) & (distance <= self.limit)
+        changed = candidates[better]
+        self.cost[changed] = distance[better]
+        self.assignment[changed] = site
+        return site, changed
+
+    def remove_site(self, site):
+        """Deactivate a site (indices stay stable), returns the points reassigned"""
+        self.active[site] = False
+        if self.network is None:
+            changed = np.flatnonzero(self.assignment == site)
+            self._assign_euclidean(changed)
+            return changed
+
+        nodes = np.flatnonzero(self.node_site == site)
+        self._reassign_nodes(nodes)
+        return self._cells_from_nodes(nodes)
+
+    def _assign_euclidean(self, points):
+        from scipy.spatial import cKDTree
+
+        sites = np.flatnonzero(self.active)
+        if not len(sites) or not len(points):
+            self.assignment[points] = -1
+            self.cost[points] = np.inf
+            return
+        distance, nearest = cKDTree(self.site_xy[sites]).query(self.demand_xy[points],
+                                                               distance_upper_bound=self.limit, workers=-1)
+        found = nearest < len(sites)
+        self.cost[points] = np.where(found, distance, np.inf)
+        self.assignment[points] = np.where(found, sites[np.minimum(nearest, len(sites) - 1)], -1)
+
+    def _cells_from_nodes(self, nodes=None):
+        """Demand points take the time and site of their snapped node"""
+        if nodes is None:
+            points = np.arange(len(self.demand_xy))
+        else:
+            touched = np.zeros(len(self.network), dtype=bool)
+            touched[nodes] = True
+            points = np.flatnonzero(touched[self.demand_nodes])
+        node = self.demand_nodes[points]
+        self.cost[points] = self.node_time[node]
+        self.assignment[points] = self.node_site[node]
+        return points
+
+    def _reassign_nodes(self, nodes):
+        """Shortest times to the given nodes from the remaining sites
+
+        Times of all other nodes are still valid, so paths into the
+        affected region start from its unaffected neighbours: one Dijkstra
+        over the affected subgraph from a virtual source linked to every
+        entry node.
+        """
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import dijkstra
+
+        network = self.network
+        self.node_time[nodes] = np.inf
+        self.node_site[nodes] = -1
+        if not len(nodes):
+            return
+        affected = np.zeros(len(network), dtype=bool)
+        affected[nodes] = True
+        local = np.full(len(network), -1, dtype=np.int64)
+        local[nodes] = np.arange(len(nodes))
+
+        u, v, w = self._edge_sources, network.indices, network.travel_time
+        entry = affected[v] & ~affected[u] & np.isfinite(self.node_time[u])
+        seed_node = v[entry]
+        seed_time = self.node_time[u[entry]] + w[entry]
+        seed_site = self.node_site[u[entry]]
+        # Remaining sites inside the region start there at zero time
+        inside = np.flatnonzero(self.active & affected[self.site_nodes])
+        seed_node = np.concatenate([seed_node, self.site_nodes[inside]])
+        seed_time = np.concatenate([seed_time, np.zeros(len(inside))])
+        seed_site = np.concatenate([seed_site, inside])
+
+        # Best seed per entry node (csr_matrix would sum duplicates)
+        order = np.lexsort((seed_time, seed_node))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = seed_node[order][1:] != seed_node[order][:-1]
+        best = order[first]
+        entry_site = np.full(len(nodes), -1, dtype=np.int64)
+        entry_site[local[seed_node[best]]] = seed_site[best]
+
+        inner = affected[u] & affected[v]
+        source = len(nodes)
+        rows = np.concatenate([local[u[inner]], np.full(len(best), source)])
+        cols = np.concatenate([local[v[inner]], local[seed_node[best]]])
+        # csgraph drops explicit zeros, so zero-time seeds get a negligible cost
+        weights = np.concatenate([w[inner], np.maximum(seed_time[best], 1e-9)])
+        graph = csr_matrix((weights, (rows, cols)), shape=(source + 1, source + 1))
+        times, predecessors = dijkstra(graph, directed=True, indices=source,
+                                       return_predecessors=True, limit=self.limit)
+
+        # Follow predecessors back to the entry node each path started from
+        parent = predecessors[:source]
+        root = np.where((parent == source) | (parent < 0), np.arange(source), parent)
+        while True:
+            jumped = root[root]
+            if np.array_equal(jumped, root):
+                break
+            root = jumped
+        reached = np.isfinite(times[:source])
+        self.node_time[nodes] = np.where(reached, times[:source], np.inf)
+        self.node_site[nodes] = np.where(reached, entry_site[root], -1)
+
+    def membership(self):
+        """Sparse (sites x points) matrix with a 1 where the point is assigned to the site"""
+        from scipy.sparse import csr_matrix
+
+        points = np.flatnonzero(self.assignment >= 0)
+        return csr_matrix((np.ones(len(points)), (self.assignment[points], points)),
+                          shape=(len(self.site_xy), len(self.demand_xy)))
+
+    def site_loads(self, sessions_per_resident=SESSIONS_PER_RESIDENT, capacity=SITE_CAPACITY_SESSIONS):
+        """Demand, expected sessions per day and overload flag of every site"""
+        n = len(self.site_xy)
+        assigned = self.assignment >= 0
+        sites, demand = self.assignment[assigned], self.demand[assigned]
+        load = np.bincount(sites, weights=demand, minlength=n)
+        weighted_cost = np.bincount(sites, weights=demand * self.cost[assigned], minlength=n)
+        mean_cost = np.divide(weighted_cost, load, out=np.full(n, np.nan), where=load > 0)
+        max_cost = np.full(n, np.nan)
+        if len(sites):
+            np.fmax.at(max_cost, sites, self.cost[assigned])
+
+        if self.network is None:
+            cost_columns = {'Mean_Distance_M': mean_cost, 'Max_Distance_M': max_cost}
+        else:
+            cost_columns = {'Mean_Drive_Min': mean_cost / 60, 'Max_Drive_Min': max_cost / 60}
+        sessions = load * sessions_per_resident
+        capacity = np.broadcast_to(np.asarray(capacity, dtype=float), n)
+        return pd.DataFrame({
+            'Active': self.active,
+            'Cells': np.bincount(sites, minlength=n),
+            'Catchment_Population': load,
+            **cost_columns,
+            'Sessions_Per_Day': sessions,
+            'Capacity_Sessions': capacity,
+            'Utilization': np.divide(sessions, capacity, out=np.full(n, np.nan), where=capacity > 0),
+            'Overloaded': sessions > capacity
+        })
+
+
+def main():
+    import grid
+    from dasymetric import cell_population
+    from network import NETWORK_FILE, RoadNetwork
+    from coordinates import metric_xy, to_metric
+    from spatial_index import InfrastructureIndex
+    from storage import BOUNDARY_LAYER, find_layer, read_layer
+    from study_area import approximate_boundary, tehsil_coordinates
+
+    parser = argparse.ArgumentParser(description="Site catchments and load, with what-if edits")
+    parser.add_argument('--sites', default='outputs/analysis/site_recommendations.csv')
+    parser.add_argument('--census', default='data/demographics/lahore_census_2023.csv')
+    parser.add_argument('--cell-size', type=float, default=250)
+    parser.add_argument('--metric', choices=['network', 'euclidean'], default='network',
+                        help="Drive time over the road network or straight-line distance")
+    parser.add_argument('--add', action='append', default=[], metavar='LAT,LON', help="What-if: add a site")
+    parser.add_argument('--remove', action='append', default=[], metavar='SITE_NAME',
+                        help="What-if: remove a site")
+    parser.add_argument('--output', default='outputs/analysis/site_catchments.csv')
+    args = parser.parse_args()
+
+    print("⚡ SITE CATCHMENTS")
+    print("=" * 60)
+
+    boundary_file = find_layer(BOUNDARY_LAYER)
+    boundary = read_layer(boundary_file) if boundary_file else approximate_boundary()
+    census_df = pd.read_csv(args.census)
+    tehsils = census_df[census_df['Tehsil'].isin(tehsil_coordinates)].reset_index(drop=True)
+    tehsils['Lat'] = [tehsil_coordinates[name][0] for name in tehsils['Tehsil']]
+    tehsils['Lon'] = [tehsil_coordinates[name][1] for name in tehsils['Tehsil']]
+    cells = grid.cell_criteria(grid.make_grid(boundary, cell_size=args.cell_size), tehsils)
+    roads = InfrastructureIndex().roads()
+    cells['Population'] = cell_population(cells, tehsils, roads.geometry.values if roads else None)
+
+    network = None
+    if args.metric == 'network':
+        if os.path.exists(NETWORK_FILE):
+            network = RoadNetwork.load()
+        else:
+            print(f"⚠️ Road network not found: {NETWORK_FILE}, using straight-line distance")
+
+    sites_df = pd.read_csv(args.sites)
+    site_x, site_y = metric_xy(sites_df)
+    start = time.perf_counter()
+    catchments = Catchments(cells[['x', 'y']].to_numpy(), cells['Population'], network=network)
+    catchments.set_sites(np.column_stack([site_x, site_y]))
+    print(f"✅ {len(cells):,} cells assigned to {len(sites_df)} sites in {time.perf_counter() - start:.2f}s "
+          f"({'drive time' if network is not None else 'straight-line distance'})")
+
+    names = list(sites_df['Site_Name'])
+    for name in args.remove:
+        if name not in names:
+            print(f"⚠️ Unknown site: {name}")
+            continue
+        start = time.perf_counter()
+        changed = catchments.remove_site(names.index(name))
+        print(f"➖ Removed {name}: {len(changed):,} cells reassigned in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for position in args.add:
+        lat, lon = (float(value) for value in position.split(','))
+        x, y = to_metric([lon], [lat])
+        start = time.perf_counter()
+        _, changed = catchments.add_site([x[0], y[0]])
+        names.append(f'New site {lat:.4f},{lon:.4f}')
+        print(f"➕ Added {names[-1]}: {len(changed):,} cells taken over in "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+    loads = catchments.site_loads()
+    loads.insert(0, 'Site_Name', names)
+    loads = loads[loads['Active']].drop(columns='Active')
+
+    print("🔌 LOAD PER SITE:")
+    for _, row in loads.iterrows():
+        flag = ' ⚠️ OVERLOADED' if row['Overloaded'] else ''
+        print(f"   {row['Site_Name']}: {row['Catchment_Population']:,.0f} residents, "
+              f"{row['Sessions_Per_Day']:.0f} sessions/day ({row['Utilization']:.0%}){flag}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    loads.to_csv(args.output, index=False)
+    print(f"✅ Catchments saved: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,82 +1,410 @@
+import argparse
+import csv
+import glob
+import json
 import os
-import pandas as pd
-import geopandas as gpd
-
-print("🔍 LAHORE EV PROJECT - DATA QUALITY CHECK")
-print("=" * 50)
-
-# Check census data
-print("\n📊 CENSUS DATA:")
-if os.path.exists('data/demographics/lahore_census_2023.csv'):
-    census_df = pd.read_csv('data/demographics/lahore_census_2023.csv')
-    print(f"✅ Census data loaded: {len(census_df)} records")
-    print(f"   Total population: {census_df.loc[0, 'Population_2023']:,}")
-else:
-    print("❌ Census data missing")
-
-# Check OSM boundary data
-print("\n🗺️ BOUNDARY DATA:")
-if os.path.exists('data/boundaries/lahore_boundary.shp'):
-    boundary = gpd.read_file('data/boundaries/lahore_boundary.shp')
-    print(f"✅ Lahore boundary loaded: {len(boundary)} features")
-else:
-    print("❌ Boundary data missing")
-
-# Check infrastructure data
-print("\n🏗️ INFRASTRUCTURE DATA:")
-infrastructure_files = [
-    ('fuel_stations.shp', 'Fuel stations'),
-    ('lahore_roads.shp', 'Road network'),
-    ('commercial_areas.shp', 'Commercial areas'),
-    ('education.shp', 'Educational institutions'),
-    ('healthcare.shp', 'Healthcare facilities')
-]
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-total_infrastructure = 0
-for filename, description in infrastructure_files:
-    filepath = f'data/infrastructure/{filename}'
-    if os.path.exists(filepath):
-        try:
-            gdf = gpd.read_file(filepath)
-            print(f"✅ {description}: {len(gdf)} features")
-            total_infrastructure += len(gdf)
-        except:
-            print(f"⚠️ {description}: File exists but couldn't read")
-    else:
-        print(f"❌ {description}: Not found")
+from storage import BOUNDARY_LAYER, FORMATS, INFRASTRUCTURE_DIR, _geo_metadata, find_layer, layer_format, layer_info
+
+# Data quality checks for the layers the scripts actually write. Feature
+# count, bbox, CRS and schema come from file metadata alone (storage.layer_info);
+# geometries are then decoded from WKB and validated in chunks on a thread
+# pool (shapely releases the GIL): validity, emptiness, features entirely
+# outside the district boundary and duplicated geometries, within each layer
+# and across the POI layers. Everything found is written to a JSON report.
+
+REPORT_FILE = 'outputs/reports/data_quality.json'
+CENSUS_FILE = 'data/demographics/lahore_census_2023.csv'
+
+# Geometries per validation task
+CHUNK_SIZE = 100_000
+# Examples kept per problem in the report
+EXAMPLES = 5
+
+KNOWN_CRS = ['EPSG:4326', 'OGC:CRS84', 'EPSG:32643']
+
+POLYGONS = ['Polygon', 'MultiPolygon']
+LINES = ['LineString', 'MultiLineString']
+POINTS = ['Point']
+
+# Layer path (without extension) -> (description, required columns, geometry
+# types, must exist); POI layers come from an OSM extract (osm_extract.py) or
+# are the *_sample files download_osm_data.py writes otherwise
+expected_layers = {
+    BOUNDARY_LAYER: ('District boundary', [], POLYGONS, True),
+    f'{INFRASTRUCTURE_DIR}/major_roads': ('Major roads', ['highway'], LINES, False),
+    f'{INFRASTRUCTURE_DIR}/lahore_roads': ('All roads', ['highway'], LINES, False),
+    f'{INFRASTRUCTURE_DIR}/commercial': ('Commercial areas (OSM)', ['name', 'type'], POINTS, False),
+    f'{INFRASTRUCTURE_DIR}/education': ('Universities (OSM)', ['name', 'type'], POINTS, False),
+    f'{INFRASTRUCTURE_DIR}/healthcare': ('Hospitals (OSM)', ['name', 'type'], POINTS, False),
+    f'{INFRASTRUCTURE_DIR}/transport': ('Fuel, parking and bus stations (OSM)', ['name', 'type'], POINTS, False),
+    f'{INFRASTRUCTURE_DIR}/charging_stations': ('Charging stations (OSM)', ['name', 'type'], POINTS, False),
+    f'{INFRASTRUCTURE_DIR}/commercial_sample': ('Commercial areas', ['name', 'type'], POINTS, False),
+    f'{INFRASTRUCTURE_DIR}/education_sample': ('Universities', ['name', 'type'], POINTS, False),
+    f'{INFRASTRUCTURE_DIR}/healthcare_sample': ('Hospitals', ['name', 'type'], POINTS, False),
+    f'{INFRASTRUCTURE_DIR}/transport_sample': ('Transport hubs', ['name', 'type'], POINTS, False),
+    f'{INFRASTRUCTURE_DIR}/residential_sample': ('Residential areas', ['name', 'type'], POINTS, False)
+}
 
-# Check output files
-print("\n📋 OUTPUT FILES:")
 output_files = [
     ('outputs/maps/lahore_population_density.html', 'Population density map'),
     ('outputs/maps/lahore_infrastructure_overview.html', 'Infrastructure overview map'),
+    ('outputs/maps/ev_site_analysis_branded.html', 'Site analysis map'),
+    ('outputs/analysis/site_recommendations.csv', 'Site recommendations'),
     ('outputs/reports/data_summary.md', 'Data summary report')
 ]
 
-for filepath, description in output_files:
-    if os.path.exists(filepath):
-        size_kb = os.path.getsize(filepath) / 1024
-        print(f"✅ {description}: {size_kb:.1f} KB")
+
+def discover_layers(directories=('data/boundaries', INFRASTRUCTURE_DIR)):
+    """Expected layer paths plus any other layer file found in the data directories"""
+    layers = list(expected_layers)
+    for directory in directories:
+        for suffix in FORMATS.values():
+            for filepath in sorted(glob.glob(os.path.join(directory, f'*{suffix}'))):
+                base = filepath[:-len(suffix)]
+                if base not in layers:
+                    layers.append(base)
+    return layers
+
+
+def _wkb_chunks(filepath, chunk_size):
+    """Raw WKB of every geometry in chunks, without building a GeoDataFrame"""
+    fmt = layer_format(filepath)
+    if fmt == 'shapefile':
+        import geopandas as gpd
+
+        wkb = gpd.read_file(filepath).geometry.to_wkb().to_numpy()
+        for start in range(0, len(wkb), chunk_size):
+            yield wkb[start:start + chunk_size]
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    geometry = _geo_metadata(filepath, fmt)['primary_column']
+    if fmt == 'parquet':
+        column = pq.read_table(filepath, columns=[geometry]).column(geometry)
+    else:
+        column = pa.ipc.open_file(pa.memory_map(filepath)).read_all().column(geometry)
+    for start in range(0, len(column), chunk_size):
+        yield column.slice(start, chunk_size).to_numpy(zero_copy_only=False)
+
+
+def _check_chunk(wkb, boundary, offset):
+    """Validity, emptiness and boundary checks of one WKB chunk"""
+    import numpy as np
+    import pandas as pd
+    import shapely
+
+    geometries = shapely.from_wkb(wkb, on_invalid='ignore')
+    missing = pd.isna(geometries)
+    empty = missing | shapely.is_empty(geometries)
+    invalid = ~empty & ~shapely.is_valid(geometries)
+    outside = np.zeros(len(wkb), dtype=bool)
+    if boundary is not None:
+        outside = ~empty & ~shapely.intersects(boundary, geometries)
+    hashes = pd.util.hash_array(np.asarray(wkb, dtype=object))
+    # Point coordinates for the report examples (NaN for other geometry types)
+    xy = np.column_stack([shapely.get_x(geometries), shapely.get_y(geometries)])
+    return {
+        'invalid': offset + np.flatnonzero(invalid),
+        'empty': offset + np.flatnonzero(empty),
+        'outside_boundary': offset + np.flatnonzero(outside),
+        'hashes': hashes,
+        'points': xy
+    }
+
+
+def duplicate_groups(hashes):
+    """Positions of features sharing a geometry, one array per group"""
+    import numpy as np
+
+    _, inverse, counts = np.unique(hashes, return_inverse=True, return_counts=True)
+    repeated = np.flatnonzero(counts[inverse] > 1)
+    if not len(repeated):
+        return []
+    order = repeated[np.argsort(inverse[repeated], kind='stable')]
+    return np.split(order, np.flatnonzero(np.diff(inverse[order])) + 1)
+
+
+def _location(xy):
+    # lat/lon order, as the coordinates are written elsewhere in the project
+    return {} if any(value != value for value in xy) else {'lat_lon': f'{xy[1]:.4f}/{xy[0]:.4f}'}
+
+
+def validate_geometries(filepath, boundary=None, pool=None, chunk_size=CHUNK_SIZE):
+    """Counts and examples of invalid, empty, out-of-boundary and duplicate geometries"""
+    import numpy as np
+
+    chunks = []
+    offset = 0
+    for wkb in _wkb_chunks(filepath, chunk_size):
+        chunks.append(pool.submit(_check_chunk, wkb, boundary, offset) if pool else _check_chunk(wkb, boundary, offset))
+        offset += len(wkb)
+    results = [chunk.result() if pool else chunk for chunk in chunks]
+
+    checks = {}
+    for problem in ('invalid', 'empty', 'outside_boundary'):
+        positions = np.concatenate([r[problem] for r in results]) if results else np.zeros(0, dtype=np.int64)
+        checks[problem] = {'count': int(len(positions)), 'examples': positions[:EXAMPLES].tolist()}
+
+    hashes = np.concatenate([r['hashes'] for r in results]) if results else np.zeros(0, dtype=np.uint64)
+    groups = duplicate_groups(hashes)
+    points = np.concatenate([r['points'] for r in results]) if results else np.zeros((0, 2))
+    checks['duplicates'] = {
+        'count': int(sum(len(group) - 1 for group in groups)),
+        'groups': len(groups),
+        'examples': [{'features': group.tolist(), **_location(points[group[0]])} for group in groups[:EXAMPLES]]
+    }
+    return checks, hashes, points
+
+
+def _boundary_polygon(crs):
+    """District boundary as one prepared polygon in ``crs``, None if missing"""
+    import shapely
+
+    from storage import read_layer
+
+    filepath = find_layer(BOUNDARY_LAYER)
+    if not filepath:
+        return None
+    boundary = read_layer(filepath)
+    if crs and boundary.crs is not None and not boundary.crs.equals(crs):
+        boundary = boundary.to_crs(crs)
+    polygon = boundary.union_all()
+    shapely.prepare(polygon)
+    return polygon
+
+
+def _bbox_overlaps(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def check_layer(base, pool=None, geometry=True, boundary_info=None, boundaries=None):
+    """Metadata and geometry report of one layer, with its geometry hashes and first points"""
+    description, required, geometry_types, must_exist = expected_layers.get(
+        base, (os.path.basename(base).replace('_', ' ').title(), [], None, False))
+    filepath = find_layer(base)
+    report = {'layer': base, 'description': description, 'path': filepath, 'issues': []}
+    if not filepath:
+        report['status'] = 'error' if must_exist else 'missing'
+        return report, None, None
+
+    start = time.perf_counter()
+    try:
+        info = layer_info(filepath)
+    except Exception as e:
+        report.update(status='error', issues=[f'Unreadable metadata: {type(e).__name__}: {e}'])
+        return report, None, None
+    report.update(info)
+    issues = report['issues']
+
+    if info['crs'] is None:
+        issues.append('No CRS')
+    elif info['crs'] not in KNOWN_CRS:
+        issues.append(f"Unexpected CRS {info['crs']}")
+    missing_columns = [column for column in required if column not in info['schema']]
+    if missing_columns:
+        issues.append(f"Missing columns: {', '.join(missing_columns)}")
+    if geometry_types and info['geometry_types'] and not set(info['geometry_types']) <= set(geometry_types):
+        issues.append(f"Unexpected geometry types: {', '.join(info['geometry_types'])}")
+    if info['count'] == 0:
+        issues.append('No features')
+    if (boundary_info and base != BOUNDARY_LAYER and info['bbox'] and boundary_info.get('bbox')
+            and info['crs'] == boundary_info['crs'] and not _bbox_overlaps(info['bbox'], boundary_info['bbox'])):
+        issues.append('Layer extent does not overlap the district boundary')
+
+    hashes = points = None
+    if geometry and info['count']:
+        boundary = None
+        if boundaries is not None and base != BOUNDARY_LAYER:
+            if info['crs'] not in boundaries:
+                boundaries[info['crs']] = _boundary_polygon(info['crs'])
+            boundary = boundaries[info['crs']]
+        report['geometry'], hashes, points = validate_geometries(filepath, boundary, pool)
+        for problem, label in [('invalid', 'invalid geometries'), ('empty', 'empty geometries'),
+                               ('outside_boundary', 'features outside the boundary'),
+                               ('duplicates', 'duplicated geometries')]:
+            count = report['geometry'][problem]['count']
+            if count:
+                issues.append(f'{count:,} {label}')
+
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    report['status'] = 'warning' if issues else 'ok'
+    return report, hashes, points
+
+
+def cross_layer_duplicates(layers):
+    """Identical geometries shared between different layers, e.g. two POI layers"""
+    names = [name for name, hashes, _ in layers for _ in range(len(hashes))]
+    if not names:
+        return []
+
+    import numpy as np
+
+    hashes = np.concatenate([hashes for _, hashes, _ in layers])
+    points = np.concatenate([points for _, _, points in layers])
+    duplicates = []
+    for group in duplicate_groups(hashes):
+        group_layers = sorted({names[i] for i in group})
+        if len(group_layers) > 1:
+            duplicates.append({'layers': group_layers, 'features': len(group), **_location(points[group[0]])})
+    return duplicates
+
+
+def _number(value):
+    """Float value of a CSV cell, None when it is empty or not a number"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number
+
+
+def check_census(filepath=CENSUS_FILE):
+    """Columns and totals of the census table
+
+    The table is a few rows, so it is read with the csv module rather than
+    paying for the pandas import.
+    """
+    if not os.path.exists(filepath):
+        return {'path': filepath, 'status': 'error', 'issues': ['Missing']}
+    with open(filepath, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = reader.fieldnames or []
+        census = list(reader)
+    issues = []
+    required = ['Tehsil', 'Population_2023', 'Area_SqKm', 'Population_Density', 'Annual_Growth_Rate']
+    missing = [column for column in required if column not in columns]
+    if missing:
+        issues.append(f"Missing columns: {', '.join(missing)}")
+    total = None
+    if not missing:
+        is_total = ['Total' in (row['Tehsil'] or '') for row in census]
+        population = [_number(row['Population_2023']) or 0 for row in census]
+        if any(is_total):
+            total = int(sum(value for value, total_row in zip(population, is_total) if total_row))
+        tehsil_sum = int(sum(value for value, total_row in zip(population, is_total) if not total_row))
+        if total is not None and abs(tehsil_sum - total) > 0.01 * total:
+            issues.append(f'Tehsils sum to {tehsil_sum:,}, district total is {total:,}')
+        if any(_number(row[column]) is None for row in census for column in required[1:]):
+            issues.append('Missing values')
+    return {'path': filepath, 'records': len(census), 'population_total': total,
+            'status': 'warning' if issues else 'ok', 'issues': issues}
+
+
+def check_outputs(files=output_files):
+    return [{'path': filepath, 'description': description, 'exists': os.path.exists(filepath),
+             'size_kb': round(os.path.getsize(filepath) / 1024, 1) if os.path.exists(filepath) else None}
+            for filepath, description in files]
+
+
+def run_checks(geometry=True, workers=None):
+    """The full report as a dict"""
+    start = time.perf_counter()
+    boundary_file = find_layer(BOUNDARY_LAYER)
+    boundary_info = layer_info(boundary_file) if boundary_file else None
+    boundaries = {}
+
+    layers, poi_hashes = [], []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for base in discover_layers():
+            report, hashes, points = check_layer(base, pool, geometry, boundary_info, boundaries)
+            layers.append(report)
+            if hashes is not None and report.get('geometry_types') == POINTS:
+                poi_hashes.append((os.path.basename(base), hashes, points))
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'census': check_census(),
+        'layers': layers,
+        'cross_layer_duplicates': cross_layer_duplicates(poi_hashes),
+        'outputs': check_outputs(),
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+
+def _print_report(report):
+    census = report['census']
+    print("\n📊 CENSUS DATA:")
+    if census['status'] == 'error':
+        print("❌ Census data missing")
     else:
-        print(f"❌ {description}: Missing")
-
-# Overall assessment
-print("\n🎯 OVERALL ASSESSMENT:")
-if total_infrastructure > 50:
-    print("🟢 EXCELLENT: Rich infrastructure data collected")
-elif total_infrastructure > 20:
-    print("🟡 GOOD: Decent infrastructure data available")
-elif total_infrastructure > 0:
-    print("🟠 LIMITED: Some infrastructure data, may need alternatives")
-else:
-    print("🔴 MINIMAL: Very limited data, focus on creative proxies")
-
-print(f"\nTotal infrastructure points collected: {total_infrastructure}")
-
-print("\n📝 NEXT STEPS:")
-print("1. Open your HTML maps in a browser to review")
-print("2. If data looks good, proceed to economic data collection")
-print("3. If data is limited, focus on proxy indicators")
-print("4. Document any data gaps for your methodology")
-
-print("\n🚀 Ready for Week 2 data collection!")
\ No newline at end of file
+        print(f"{'✅' if census['status'] == 'ok' else '⚠️'} Census data: {census['records']} records")
+        if census['population_total']:
+            print(f"   Total population: {census['population_total']:,}")
+        for issue in census['issues']:
+            print(f"   ⚠️ {issue}")
+
+    print("\n🗺️ LAYERS:")
+    for layer in report['layers']:
+        if layer['status'] == 'missing':
+            print(f"➖ {layer['description']}: Not found")
+            continue
+        if layer['status'] == 'error' and 'count' not in layer:
+            print(f"❌ {layer['description']}: {'; '.join(layer['issues']) or 'Not found'}")
+            continue
+        icon = '✅' if layer['status'] == 'ok' else '⚠️'
+        print(f"{icon} {layer['description']}: {layer['count']:,} features, {layer['crs']}, "
+              f"{'/'.join(layer['geometry_types']) or 'unknown geometry'}")
+        for issue in layer['issues']:
+            print(f"   ⚠️ {issue}")
+        for example in layer.get('geometry', {}).get('duplicates', {}).get('examples', []):
+            if 'lat_lon' in example:
+                print(f"      {example['lat_lon']} x{len(example['features'])}")
+
+    if report['cross_layer_duplicates']:
+        print("\n📍 SAME LOCATION IN SEVERAL LAYERS:")
+        for duplicate in report['cross_layer_duplicates']:
+            print(f"   {duplicate.get('lat_lon', 'geometry')}: {', '.join(duplicate['layers'])}")
+
+    print("\n📋 OUTPUT FILES:")
+    for output in report['outputs']:
+        if output['exists']:
+            print(f"✅ {output['description']}: {output['size_kb']:.1f} KB")
+        else:
+            print(f"❌ {output['description']}: Missing")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the project's data layers")
+    parser.add_argument('--report', default=REPORT_FILE, help="JSON report path")
+    parser.add_argument('--metadata-only', action='store_true', help="Skip geometry validation")
+    parser.add_argument('--workers', type=int, help="Validation threads (default: CPU count)")
+    parser.add_argument('--strict', action='store_true', help="Exit non-zero on any warning")
+    args = parser.parse_args(argv)
+
+    print("🔍 LAHORE EV PROJECT - DATA QUALITY CHECK")
+    print("=" * 50)
+
+    report = run_checks(geometry=not args.metadata_only, workers=args.workers)
+    _print_report(report)
+
+    present = [layer for layer in report['layers'] if 'count' in layer]
+    infrastructure = sum(layer['count'] for layer in present if layer['layer'] != BOUNDARY_LAYER)
+    print("\n🎯 OVERALL ASSESSMENT:")
+    if infrastructure > 50:
+        print("🟢 EXCELLENT: Rich infrastructure data collected")
+    elif infrastructure > 20:
+        print("🟡 GOOD: Decent infrastructure data available")
+    elif infrastructure > 0:
+        print("🟠 LIMITED: Some infrastructure data, may need alternatives")
+    else:
+        print("🔴 MINIMAL: Very limited data, focus on creative proxies")
+    print(f"\nTotal infrastructure features: {infrastructure:,} (checked in {report['seconds']:.2f}s)")
+
+    os.makedirs(os.path.dirname(args.report) or '.', exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Report: {args.report}")
+
+    failed = report['census']['status'] == 'error' or any(layer['status'] == 'error' for layer in report['layers'])
+    warned = report['census']['status'] == 'warning' or any(layer['status'] == 'warning' for layer in report['layers'])
+    return 1 if failed or (args.strict and warned) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
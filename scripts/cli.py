@@ -0,0 +1,39 @@
+import argparse
+import sys
+from importlib import import_module
+
+# One entry point for the project scripts. Each subcommand is a script
+# module whose main(argv) is imported only when that subcommand runs, and
+# the scripts import pandas/geopandas/folium inside main (and folium only
+# when a map is drawn), so `check` and `analyze --no-map` start without
+# paying for libraries they never use. benchmark.py times each command run
+# for real up to its first stage against IMPORT_BUDGET_MS, with the heaviest
+# imports from `python -X importtime`.
+
+COMMANDS = {
+    'census': ('save_census_data', "Save the 2023 census table"),
+    'download': ('download_osm_data', "Build the infrastructure layers (OSM extract or samples)"),
+    'maps': ('create_initial_maps', "Draw the initial infrastructure maps"),
+    'analyze': ('ev_site_analysis', "Run the site selection analysis"),
+    'check': ('check_data_quality', "Validate the data layers"),
+    'batch': ('batch', "Run the analysis for every district in a manifest"),
+}
+
+
+def load(command):
+    """Script module behind a subcommand"""
+    return import_module(COMMANDS[command][0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='cli.py', description="Lahore EV charging site selection")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+    for command, (_, description) in COMMANDS.items():
+        # Options are parsed by the script itself, so its --help is the full one
+        commands.add_parser(command, help=description, add_help=False)
+    args, rest = parser.parse_known_args(argv)
+    return load(args.command).main(rest)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
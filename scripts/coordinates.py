@@ -0,0 +1,61 @@
+from functools import lru_cache
+
+import numpy as np
+
+from study_area import GEOGRAPHIC_CRS, METRIC_CRS
+
+# Coordinate handling shared by every distance computation. Inputs are
+# EPSG:4326 lon/lat; distances, buffers, kernels and catchments are computed
+# in UTM 43N metres (METRIC_CRS). Whole arrays are reprojected in one call
+# through cached pyproj Transformers, point geometries are built in bulk
+# with shapely's vectorised constructors, and tables keep metric x/y columns
+# next to their lon/lat so later stages never reproject the same sites.
+
+
+@lru_cache(maxsize=None)
+def transformer(source_crs, target_crs):
+    """pyproj Transformer between two CRSs (lon/lat axis order), built once per pair"""
+    from pyproj import Transformer
+
+    return Transformer.from_crs(source_crs, target_crs, always_xy=True)
+
+
+def to_metric(lon, lat):
+    """Project lon/lat arrays to the metric CRS in one call"""
+    return transformer(GEOGRAPHIC_CRS, METRIC_CRS).transform(
+        np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    )
+
+
+def to_geographic(x, y):
+    """Metric x/y arrays back to lon/lat"""
+    return transformer(METRIC_CRS, GEOGRAPHIC_CRS).transform(
+        np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    )
+
+
+def points(x, y):
+    """Point geometries for coordinate arrays, without a Python loop"""
+    import shapely
+
+    return shapely.points(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+
+
+def point_frame(data, lon, lat, crs=GEOGRAPHIC_CRS):
+    """GeoDataFrame of ``data`` with points built from the lon/lat arrays"""
+    import geopandas as gpd
+
+    return gpd.GeoDataFrame(data, geometry=points(lon, lat), crs=crs)
+
+
+def add_metric_xy(df, lon='Longitude', lat='Latitude'):
+    """Add metric x/y columns next to a table's lon/lat columns, in place"""
+    df['x'], df['y'] = to_metric(df[lon], df[lat])
+    return df
+
+
+def metric_xy(df, lon='Longitude', lat='Latitude'):
+    """A table's metric x/y: its own columns when present, else projected from lon/lat"""
+    if 'x' in df.columns and 'y' in df.columns:
+        return df['x'].to_numpy(dtype=float), df['y'].to_numpy(dtype=float)
+    return to_metric(df[lon], df[lat])
@@ -1,43 +1,47 @@
-import geopandas as gpd
-import folium
-import pandas as pd
+import argparse
 import os
 
-# Ensure all output directories exist
-os.makedirs('outputs/reports', exist_ok=True)
-os.makedirs('outputs/maps', exist_ok=True)
 
-print("Creating initial maps for Lahore EV project...")
+def main(argv=None):
+    argparse.ArgumentParser(description="Population and infrastructure overview maps").parse_args(argv)
 
-# Load census data
-census_df = pd.read_csv('../data/demographics/lahore_census_2023.csv')
+    import folium
+    import pandas as pd
 
-# Create Lahore center coordinates (approximate)
-lahore_center = [31.5204, 74.3587]
+    from instrumentation import RunLog
+    from spatial_index import InfrastructureIndex
+    from storage import BOUNDARY_LAYER, INFRASTRUCTURE_DIR, find_layer, read_layer
+    from study_area import lahore_center, tehsil_coordinates
+    from web_map import add_points, add_tile_layers, save_map
 
-# STEP 1: Create population density map
-print("\n1. Creating population density map...")
+    # Stage timings go to outputs/logs (see instrumentation.py)
+    run_log = RunLog('create_initial_maps')
 
-# Create base map
-m1 = folium.Map(location=lahore_center, zoom_start=11, tiles='OpenStreetMap')
+    # Ensure all output directories exist
+    os.makedirs('outputs/reports', exist_ok=True)
+    os.makedirs('outputs/maps', exist_ok=True)
 
-# Add census data as markers (we'll improve this when we have shapefiles)
-tehsil_coordinates = {
-    'Lahore City': [31.5204, 74.3587],
-    'Model Town': [31.5204, 74.3287],
-    'Shalimar': [31.5404, 74.3687],
-    'Lahore Cantt': [31.5004, 74.3387],
-    'Raiwind': [31.4204, 74.3887]
-}
+    print("Creating initial maps for Lahore EV project...")
 
-for idx, row in census_df.iterrows():
-    if row['Tehsil'] != 'Lahore District Total':
-        tehsil = row['Tehsil']
-        if tehsil in tehsil_coordinates:
-            lat, lon = tehsil_coordinates[tehsil]
+    # Load census data
+    census_df = pd.read_csv('data/demographics/lahore_census_2023.csv')
 
-            # Create popup with key statistics
-            popup_text = f"""
+    # STEP 1: Create population density map
+    print("\n1. Creating population density map...")
+
+    # Create base map
+    with run_log.stage('population_map') as stage:
+        m1 = folium.Map(location=lahore_center, zoom_start=11, tiles='OpenStreetMap')
+
+        # Add census data as markers (we'll improve this when we have shapefiles)
+        for idx, row in census_df.iterrows():
+            if row['Tehsil'] != 'Lahore District Total':
+                tehsil = row['Tehsil']
+                if tehsil in tehsil_coordinates:
+                    lat, lon = tehsil_coordinates[tehsil]
+
+                    # Create popup with key statistics
+                    popup_text = f"""
             <b>{tehsil}</b><br>
             Population: {row['Population_2023']:,}<br>
             Density: {row['Population_Density']:,.0f}/sq.km<br>
@@ -45,84 +49,87 @@ for idx, row in census_df.iterrows():
             Household Size: {row['Household_Size']}
             """
 
-            # Size marker based on population
-            radius = max(5, min(25, row['Population_2023'] / 200000))
-
-            folium.CircleMarker(
-                location=[lat, lon],
-                radius=radius,
-                popup=folium.Popup(popup_text, max_width=250),
-                color='blue',
-                fill=True,
-                fillColor='lightblue',
-                fillOpacity=0.7
-            ).add_to(m1)
-
-# Save population map
-m1.save('outputs/maps/lahore_population_density.html')
-print("Population density map saved!")
-
-# STEP 2: Create infrastructure overview map (if OSM data exists)
-print("\n2. Creating infrastructure overview map...")
-
-m2 = folium.Map(location=lahore_center, zoom_start=11, tiles='OpenStreetMap')
-
-# Try to load and display infrastructure data
-try:
-    # Load infrastructure files we collected
-    infrastructure_files = [
-        ('commercial_sample.shp', 'Commercial Areas', 'green', 'shopping-cart'),
-        ('education_sample.shp', 'Universities', 'blue', 'graduation-cap'),
-        ('healthcare_sample.shp', 'Hospitals', 'red', 'plus-square'),
-        ('transport_sample.shp', 'Transport', 'purple', 'bus'),
-        ('residential_sample.shp', 'Residential', 'orange', 'home')
-    ]
-
-    total_points = 0
-
-    for filename, label, color, icon in infrastructure_files:
-        filepath = f'data/infrastructure/{filename}'
-
-        if os.path.exists(filepath):
-            try:
-                infrastructure = gpd.read_file(filepath)
-
-                for idx, point in infrastructure.iterrows():
-                    if point.geometry.geom_type == 'Point':
-                        lat, lon = point.geometry.y, point.geometry.x
-
-                        # Create popup text
-                        name = point.get('name', 'Unknown')
-                        poi_type = point.get('type', label)
-
-                        popup_text = f"<b>{name}</b><br>Type: {poi_type}<br>Category: {label}"
-
-                        folium.Marker(
-                            location=[lat, lon],
-                            popup=folium.Popup(popup_text, max_width=200),
-                            icon=folium.Icon(color=color, icon=icon, prefix='fa')
-                        ).add_to(m2)
-
-                        total_points += 1
-
-                print(f"Added {len(infrastructure)} {label} points to map")
-
-            except Exception as e:
-                print(f"Could not load {filename}: {e}")
-        else:
-            print(f"File not found: {filename}")
-
-except Exception as e:
-    print(f"Error loading infrastructure data: {e}")
-
-# Save infrastructure map
-m2.save('outputs/maps/lahore_infrastructure_overview.html')
-print("Infrastructure overview map saved!")
-
-# STEP 3: Create summary report (without emojis)
-print("\n3. Creating data summary report...")
-
-summary_report = f"""# Lahore EV Charging Station Analysis - Data Summary
+                    # Size marker based on population
+                    radius = max(5, min(25, row['Population_2023'] / 200000))
+
+                    folium.CircleMarker(
+                        location=[lat, lon],
+                        radius=radius,
+                        popup=folium.Popup(popup_text, max_width=250),
+                        color='blue',
+                        fill=True,
+                        fillColor='lightblue',
+                        fillOpacity=0.7
+                    ).add_to(m1)
+
+        # Save population map
+        save_map(m1, 'outputs/maps/lahore_population_density.html')
+        stage.count(features=len(census_df))
+    print("Population density map saved!")
+
+    # STEP 2: Create infrastructure overview map (if OSM data exists)
+    print("\n2. Creating infrastructure overview map...")
+
+    with run_log.stage('infrastructure_map') as stage:
+        m2 = folium.Map(location=lahore_center, zoom_start=11, tiles='OpenStreetMap')
+
+        # Try to load and display infrastructure data
+        try:
+            # Load infrastructure files we collected
+            # OSM extract layers (osm_extract.py) where present, otherwise the samples
+            infrastructure_files = [
+                ('commercial', 'Commercial Areas', 'green', 'shopping-cart'),
+                ('education', 'Universities', 'blue', 'graduation-cap'),
+                ('healthcare', 'Hospitals', 'red', 'plus-square'),
+                ('transport', 'Transport', 'purple', 'bus'),
+                ('residential', 'Residential', 'orange', 'home'),
+                ('charging_stations', 'Charging Stations', 'darkblue', 'bolt')
+            ]
+
+            total_points = 0
+
+            for filename, label, color, icon in infrastructure_files:
+                filepath = InfrastructureIndex().path(filename)
+
+                if filepath:
+                    try:
+                        infrastructure = read_layer(filepath)
+                        points = infrastructure[infrastructure.geom_type == 'Point']
+
+                        # Large layers are clustered or drawn on a canvas (see web_map.py)
+                        popups = pd.DataFrame({
+                            'name': points['name'] if 'name' in points else 'Unknown',
+                            'Type': points['type'] if 'type' in points else label,
+                            'Category': label
+                        }, index=points.index)
+                        mode = add_points(m2, points.geometry.y.to_numpy(), points.geometry.x.to_numpy(), popups,
+                                          color=color, icon=icon, prefix='fa', name=label, max_width=200)
+                        total_points += len(points)
+
+                        print(f"Added {len(points)} {label} points to map ({mode})")
+
+                    except Exception as e:
+                        print(f"Could not load {filename}: {e}")
+                else:
+                    print(f"File not found: {filename}")
+
+        except Exception as e:
+            print(f"Error loading infrastructure data: {e}")
+
+        # Road and suitability tiles (tiles.py) instead of inline geometry
+        if add_tile_layers(m2, 'outputs/maps/lahore_infrastructure_overview.html'):
+            folium.LayerControl().add_to(m2)
+
+        # Save infrastructure map
+        save_map(m2, 'outputs/maps/lahore_infrastructure_overview.html')
+        stage.count(features=total_points)
+    print("Infrastructure overview map saved!")
+
+    # STEP 3: Create summary report (without emojis)
+    print("\n3. Creating data summary report...")
+
+    with run_log.stage('report') as stage:
+        summary_report = f"""# Lahore EV Charging Station Analysis - Data Summary
 
 ## Population Analysis (2023 Census)
 - **Total Population**: {census_df.loc[0, 'Population_2023']:,}
@@ -133,9 +140,9 @@ summary_report = f"""# Lahore EV Charging Station Analysis - Data Summary
 ## Tehsil Analysis
 """
 
-for idx, row in census_df.iterrows():
-    if row['Tehsil'] != 'Lahore District Total':
-        summary_report += f"""
+        for idx, row in census_df.iterrows():
+            if row['Tehsil'] != 'Lahore District Total':
+                summary_report += f"""
 ### {row['Tehsil']}
 - Population: {row['Population_2023']:,} ({row['Population_2023'] / census_df.loc[0, 'Population_2023'] * 100:.1f}% of district)
 - Density: {row['Population_Density']:,.0f} people/sq.km
@@ -143,29 +150,29 @@ for idx, row in census_df.iterrows():
 - Household Size: {row['Household_Size']} people
 """
 
-# Count available data files
-data_files_count = 0
-infrastructure_count = 0
-
-# Check what files exist
-file_checks = [
-    'data/boundaries/lahore_boundary.shp',
-    'data/infrastructure/commercial_sample.shp',
-    'data/infrastructure/education_sample.shp',
-    'data/infrastructure/healthcare_sample.shp',
-    'data/infrastructure/transport_sample.shp',
-    'data/infrastructure/residential_sample.shp'
-]
-
-available_files = []
-for file_path in file_checks:
-    if os.path.exists(file_path):
-        available_files.append(file_path)
-        data_files_count += 1
-        if 'infrastructure' in file_path:
-            infrastructure_count += 1
-
-summary_report += f"""
+        # Count available data files
+        data_files_count = 0
+        infrastructure_count = 0
+
+        # Check what files exist
+        file_checks = [
+            BOUNDARY_LAYER,
+            f'{INFRASTRUCTURE_DIR}/commercial',
+            f'{INFRASTRUCTURE_DIR}/education',
+            f'{INFRASTRUCTURE_DIR}/healthcare',
+            f'{INFRASTRUCTURE_DIR}/transport',
+            f'{INFRASTRUCTURE_DIR}/residential'
+        ]
+
+        available_files = []
+        for file_path in file_checks:
+            if find_layer(file_path) or find_layer(f'{file_path}_sample'):
+                available_files.append(file_path)
+                data_files_count += 1
+                if 'infrastructure' in file_path:
+                    infrastructure_count += 1
+
+        summary_report += f"""
 ## Data Collection Status
 - Census demographics (2017 & 2023): Available
 - Administrative boundaries: Available
@@ -188,7 +195,7 @@ summary_report += f"""
 - Population density map: outputs/maps/lahore_population_density.html
 - Infrastructure overview: outputs/maps/lahore_infrastructure_overview.html
 - Census data: data/demographics/lahore_census_2023.csv
-- Boundary data: data/boundaries/lahore_boundary.shp
+- Boundary data: {BOUNDARY_LAYER}.parquet
 - Infrastructure data: {infrastructure_count} categories in data/infrastructure/
 
 ## Portfolio Value
@@ -200,22 +207,27 @@ This project demonstrates:
 - Professional GIS workflow development
 """
 
-# Save report with UTF-8 encoding
-try:
-    with open('outputs/reports/data_summary.md', 'w', encoding='utf-8') as f:
-        f.write(summary_report)
-    print("Summary report saved!")
-except Exception as e:
-    # Fallback: save without special characters
-    clean_report = summary_report.replace('✅', '[OK]').replace('❌', '[MISSING]').replace('📊', '').replace('🗺️', '')
-    with open('outputs/reports/data_summary.md', 'w') as f:
-        f.write(clean_report)
-    print("Summary report saved (cleaned version)!")
-
-print("\nCOMPLETE! All maps and reports created successfully!")
-print("=" * 50)
-print("Your files are ready:")
-print("- Population density map: outputs/maps/lahore_population_density.html")
-print("- Infrastructure overview: outputs/maps/lahore_infrastructure_overview.html")
-print("- Data summary report: outputs/reports/data_summary.md")
-print("\nOpen the HTML files in your browser to see your maps!")
\ No newline at end of file
+        # Save report with UTF-8 encoding
+        try:
+            with open('outputs/reports/data_summary.md', 'w', encoding='utf-8') as f:
+                f.write(summary_report)
+            print("Summary report saved!")
+        except Exception as e:
+            # Fallback: save without special characters
+            clean_report = summary_report.replace('✅', '[OK]').replace('❌', '[MISSING]').replace('📊', '').replace('🗺️', '')
+            with open('outputs/reports/data_summary.md', 'w') as f:
+                f.write(clean_report)
+            print("Summary report saved (cleaned version)!")
+        stage.count(files=data_files_count)
+
+    print("\nCOMPLETE! All maps and reports created successfully!")
+    print("=" * 50)
+    print("Your files are ready:")
+    print("- Population density map: outputs/maps/lahore_population_density.html")
+    print("- Infrastructure overview: outputs/maps/lahore_infrastructure_overview.html")
+    print("- Data summary report: outputs/reports/data_summary.md")
+    print("\nOpen the HTML files in your browser to see your maps!")
+
+
+if __name__ == '__main__':
+    main()
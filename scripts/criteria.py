@@ -0,0 +1,44 @@
+# EV site selection criteria shared by the analysis scripts
+
+criteria_weights = {
+    'population_density': 0.30,  # High density = more potential users
+    'growth_rate': 0.20,  # Future demand potential
+    'accessibility': 0.25,  # Easy to reach
+    'economic_activity': 0.15,  # Commercial activity level
+    'infrastructure': 0.10  # Existing infrastructure
+}
+
+# Normalized (0-100) column written to tehsil_analysis.csv for each criterion
+score_columns = {
+    'population_density': 'density_score',
+    'growth_rate': 'growth_score',
+    'accessibility': 'accessibility_score',
+    'economic_activity': 'economic_score',
+    'infrastructure': 'infrastructure_score'
+}
+
+# Site-level criteria: column in the site table -> weight
+site_criteria_weights = {
+    'Tehsil_Score': 0.45,  # Demographic suitability of the surrounding tehsil
+    'Nearest_Commercial_Km': 0.15,  # Close to shopping/commercial destinations
+    'POIs_Within_1Km': 0.10,  # Trip generators within walking distance
+    'Road_Distance_Km': 0.15,  # Reachable from the major road network
+    'Population_15Min': 0.15  # Residents within a 15 minute drive
+}
+
+# None = already a 0-100 score, used without re-normalizing
+site_criteria_directions = {
+    'Tehsil_Score': None,
+    'Nearest_Commercial_Km': 'cost',
+    'POIs_Within_1Km': 'benefit',
+    'Road_Distance_Km': 'cost',
+    'Population_15Min': 'benefit'
+}
+
+# Raster mode (raster.py): criterion -> weight over per-pixel criteria
+raster_criteria_weights = {
+    'population_density': 0.35,  # Residents around the pixel
+    'accessibility': 0.30,  # Distance to the nearest major road
+    'economic_activity': 0.20,  # Kernel density of POIs
+    'land_cover': 0.15  # Built-up land suits chargers, water/vegetation does not
+}
@@ -0,0 +1,109 @@
+import numpy as np
+
+# Dasymetric disaggregation of census totals to grid cells. Each tehsil's
+# population is spread over its cells in proportion to an ancillary weight,
+# road length per cell, as a proxy for built-up land; a small share is spread by
+# area so cells without mapped roads are not empty. Every step is a
+# bincount or sparse product over the cell arrays, so a million cells need
+# no Python loops, and zone totals are preserved.
+
+# Share of every zone's population spread evenly by area rather than by roads
+AREA_SHARE = 0.1
+
+# Roads are cut into pieces at most this long (m) before their length is
+# assigned to cells
+ROAD_PIECE_LENGTH = 50
+
+
+def road_length(cells, roads, piece_length=ROAD_PIECE_LENGTH):
+    """Metres of road in every grid cell (``roads`` are metric line geometries)"""
+    import shapely
+
+    from grid import CellLocator
+
+    lines = shapely.segmentize(shapely.get_parts(np.asarray(roads)), piece_length)
+    coords, index = shapely.get_coordinates(lines, return_index=True)
+    same = index[1:] == index[:-1]
+    start, end = coords[:-1][same], coords[1:][same]
+    middle = (start + end) / 2
+    cell = CellLocator(cells)(middle[:, 0], middle[:, 1])
+    inside = cell >= 0
+    return np.bincount(cell[inside], weights=np.hypot(*(end - start)[inside].T), minlength=len(cells))
+
+
+def _largest_remainder(values, zones, totals):
+    """Round values to integers that still sum to each zone's total"""
+    rounded = np.floor(values)
+    missing = np.rint(totals - np.bincount(zones, weights=rounded, minlength=len(totals))).astype(np.int64)
+    # Within each zone, cells with the largest fractional part get the +1s
+    order = np.lexsort((rounded - values, zones))
+    sorted_zones = zones[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_zones, sorted_zones)
+    rounded[order[rank < missing[sorted_zones]]] += 1
+    return rounded.astype(np.int64)
+
+
+def disaggregate(zones, totals, weights, area_share=AREA_SHARE, integer=False):
+    """Spread zone totals over cells in proportion to cell weights
+
+    ``zones`` is each cell's zone code (an index into ``totals``, -1 for
+    none) and ``weights`` are non-negative. ``area_share`` of every total is
+    spread evenly over the zone's cells, all of it when the zone's weights
+    are all zero. The cells of each zone sum to its total; with
+    ``integer=True`` they are whole numbers (largest remainder rounding).
+    """
+    zones = np.asarray(zones, dtype=np.int64)
+    totals = np.asarray(totals, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    if np.any(weights < 0):
+        raise ValueError("Disaggregation weights must be non-negative")
+
+    valid = zones >= 0
+    zone = np.where(valid, zones, 0)
+    cell_count = np.bincount(zones[valid], minlength=len(totals))
+    weight_sum = np.bincount(zones[valid], weights=weights[valid], minlength=len(totals))
+
+    by_weight = np.where(weight_sum > 0, 1 - area_share, 0.0)[zone]
+    share = (by_weight * weights / np.where(weight_sum > 0, weight_sum, 1.0)[zone]
+             + (1 - by_weight) / np.maximum(cell_count, 1)[zone])
+    values = np.where(valid, totals[zone] * share, 0.0)
+    if integer:
+        result = np.zeros(len(values), dtype=np.int64)
+        result[valid] = _largest_remainder(values[valid], zones[valid], totals)
+        return result
+    return values
+
+
+def cell_population(cells, tehsils, roads=None, area_share=AREA_SHARE, integer=False):
+    """Population_2023 of every tehsil spread over its grid cells
+
+    ``cells`` come from grid.cell_criteria (a categorical Tehsil column);
+    ``roads`` are metric line geometries, without them each tehsil is
+    spread evenly by area.
+    """
+    weights = road_length(cells, roads) if roads is not None and len(roads) else np.ones(len(cells))
+    categories = cells['Tehsil'].cat.categories
+    totals = tehsils.set_index('Tehsil')['Population_2023'].reindex(categories).fillna(0).to_numpy(dtype=float)
+    return disaggregate(cells['Tehsil'].cat.codes.to_numpy(), totals, weights, area_share, integer)
+
+
+def catchment_matrix(site_xy, cells, radius):
+    """Sparse boolean (sites x cells) matrix: cell centre within radius of the site"""
+    from facility_location import coverage_matrix
+
+    return coverage_matrix(site_xy, cells[['x', 'y']].to_numpy(), radius)
+
+
+def served_population(catchment, population, shared=True):
+    """Population in every site's catchment, one sparse matrix product
+
+    With ``shared`` a cell in several catchments is split equally between
+    those sites, so site totals add up to the covered population instead
+    of counting overlaps once per site.
+    """
+    catchment = catchment.tocsr().astype(float)
+    population = np.asarray(population, dtype=float)
+    if shared:
+        sites_per_cell = np.bincount(catchment.indices, minlength=catchment.shape[1])
+        population = population / np.maximum(sites_per_cell, 1)
+    return catchment @ population
@@ -0,0 +1,209 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from raster import RASTER_DIR, RasterGrid, create_raster
+
+# Continuous demand surfaces by kernel density estimation. Points are binned
+# onto a regular grid (optionally weighted, e.g. by population) and the
+# histogram is convolved once with a discretised kernel by FFT, so the cost
+# depends on the grid size rather than points x cells. Every layer has its
+# own kernel and bandwidth; layers sharing both are convolved together.
+
+KERNELS = ('gaussian', 'epanechnikov')
+DEFAULT_RESOLUTION = 100  # m
+
+# Gaussian kernels are cut off at this many bandwidths (sigma)
+GAUSSIAN_TRUNCATE = 3.0
+
+# POI category -> (kernel, bandwidth in m, weight) for economic activity
+activity_layers = {
+    'commercial': ('gaussian', 500, 1.0),  # Shops and markets draw trips from nearby streets
+    'transport': ('gaussian', 750, 0.8),
+    'healthcare': ('epanechnikov', 1500, 0.6),  # Hospitals draw from a wider, bounded area
+    'education': ('epanechnikov', 1500, 0.6),
+    'residential': ('gaussian', 1000, 0.3)
+}
+
+# Residents are spread with a wide kernel to smooth tehsil/cell edges
+POPULATION_KERNEL = ('gaussian', 1000)
+
+
+def kernel(name, bandwidth, resolution):
+    """Discretised kernel on pixels of ``resolution`` m, an odd square summing to 1
+
+    ``bandwidth`` is the Gaussian sigma or the Epanechnikov support radius.
+    """
+    if name not in KERNELS:
+        raise ValueError(f"Unknown kernel: {name!r}")
+    scale = max(bandwidth / resolution, 1e-9)
+    radius = max(int(np.ceil(kernel_reach(name, scale))), 1)
+    offsets = np.arange(-radius, radius + 1)
+    r2 = (offsets[:, None] ** 2 + offsets[None, :] ** 2) / scale ** 2
+    if name == 'gaussian':
+        weights = np.where(r2 <= GAUSSIAN_TRUNCATE ** 2, np.exp(-r2 / 2), 0.0)
+    else:
+        weights = np.clip(1 - r2, 0, None)
+    return weights / weights.sum()
+
+
+def kernel_reach(name, bandwidth):
+    """Distance in m beyond which a kernel gives no weight"""
+    return bandwidth * (GAUSSIAN_TRUNCATE if name == 'gaussian' else 1)
+
+
+def bin_points(grid, x, y, weights=None):
+    """Sum of point weights (counts if None) in every pixel; points off the grid are dropped"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    cols = np.floor((x - grid.x0) / grid.resolution).astype(np.int64)
+    rows = np.floor((grid.y0 - y) / grid.resolution).astype(np.int64)
+    keep = (cols >= 0) & (cols < grid.width) & (rows >= 0) & (rows < grid.height)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)[keep]
+    counts = np.bincount(rows[keep] * grid.width + cols[keep], weights=weights, minlength=grid.width * grid.height)
+    return counts.reshape(grid.shape).astype(float)
+
+
+def smooth(counts, kernel_name, bandwidth, resolution):
+    """Convolve a binned grid with a kernel, giving density per km²"""
+    from scipy.signal import fftconvolve
+
+    density = fftconvolve(counts, kernel(kernel_name, bandwidth, resolution), mode='same')
+    # FFT round-off leaves tiny negative values away from any point
+    np.maximum(density, 0, out=density)
+    return density / (resolution ** 2 / 1e6)
+
+
+def kde(grid, x, y, kernel_name='gaussian', bandwidth=500, weights=None):
+    """Kernel density of points (weight per km²) on a raster.RasterGrid"""
+    return smooth(bin_points(grid, x, y, weights), kernel_name, bandwidth, grid.resolution)
+
+
+def demand_surface(grid, layers):
+    """Weighted sum of the kernel densities of several point layers
+
+    ``layers`` maps names to (x, y, point weights or None, kernel,
+    bandwidth, layer weight). Layers with the same kernel and bandwidth are
+    binned into one histogram and convolved once.
+    """
+    groups = {}
+    for x, y, weights, kernel_name, bandwidth, layer_weight in layers.values():
+        counts = bin_points(grid, x, y, weights) * layer_weight
+        key = (kernel_name, bandwidth)
+        groups[key] = groups[key] + counts if key in groups else counts
+
+    surface = np.zeros(grid.shape)
+    for (kernel_name, bandwidth), counts in groups.items():
+        surface += smooth(counts, kernel_name, bandwidth, grid.resolution)
+    return surface
+
+
+def sample(surface, grid, x, y):
+    """Value of the pixel under every point, NaN off the grid"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    cols = np.floor((x - grid.x0) / grid.resolution).astype(np.int64)
+    rows = np.floor((grid.y0 - y) / grid.resolution).astype(np.int64)
+    inside = (cols >= 0) & (cols < grid.width) & (rows >= 0) & (rows < grid.height)
+    values = np.full(len(x), np.nan)
+    values[inside] = surface[rows[inside], cols[inside]]
+    return values
+
+
+def surface_grid(x, y, resolution=DEFAULT_RESOLUTION, margin=0):
+    """Grid over the extent of the points, padded by ``margin`` m
+
+    One more pixel is added on the max-x and min-y sides, so points lying
+    exactly on those edges still fall inside a pixel.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    return RasterGrid.from_bounds((x.min() - margin, y.min() - margin - resolution,
+                                   x.max() + margin + resolution, y.max() + margin), resolution)
+
+
+def _activity_inputs(pois, layers):
+    inputs = {}
+    for category in np.unique(pois.categories):
+        if category in layers:
+            coords = pois.coords[pois.categories == category]
+            inputs[category] = (coords[:, 0], coords[:, 1], None, *layers[category])
+    return inputs
+
+
+def activity_surface(grid, pois, layers=activity_layers):
+    """Economic activity (weighted POIs per km²) from an InfrastructureIndex.pois() index"""
+    return demand_surface(grid, _activity_inputs(pois, layers))
+
+
+def economic_activity(pois, x, y, resolution=DEFAULT_RESOLUTION, layers=activity_layers):
+    """Economic activity at metric points, from a surface covering them
+
+    The surface reaches past the points by the widest kernel, so POIs just
+    outside their extent still count towards the density near its edge.
+    """
+    margin = max((kernel_reach(name, bandwidth) for name, bandwidth, _ in layers.values()), default=0)
+    grid = surface_grid(x, y, resolution, margin)
+    return sample(activity_surface(grid, pois, layers), grid, x, y)
+
+
+def population_surface(grid, x, y, population, kernel_name=POPULATION_KERNEL[0], bandwidth=POPULATION_KERNEL[1]):
+    """Residents per km² from population totals at points (e.g. grid cells)"""
+    return kde(grid, x, y, kernel_name, bandwidth, weights=population)
+
+
+def main():
+    import pandas as pd
+
+    import grid as cell_grid
+    from dasymetric import cell_population
+    from spatial_index import InfrastructureIndex
+    from storage import BOUNDARY_LAYER, find_layer, read_layer
+    from study_area import approximate_boundary, tehsil_coordinates
+
+    parser = argparse.ArgumentParser(description="Kernel density demand surfaces for Lahore")
+    parser.add_argument('--resolution', type=float, default=DEFAULT_RESOLUTION, help="Pixel size in metres")
+    parser.add_argument('--census', default='data/demographics/lahore_census_2023.csv')
+    parser.add_argument('--output-dir', default=RASTER_DIR)
+    args = parser.parse_args()
+
+    print("⚡ BUILDING DEMAND SURFACES")
+    print("=" * 60)
+
+    boundary_file = find_layer(BOUNDARY_LAYER)
+    boundary = read_layer(boundary_file) if boundary_file else approximate_boundary()
+    polygon = cell_grid._boundary_geometry(boundary)
+    grid = RasterGrid.from_bounds(polygon.bounds, args.resolution)
+    print(f"✅ Grid: {grid.width:,} x {grid.height:,} pixels at {args.resolution:g} m")
+
+    surfaces = {}
+    infrastructure = InfrastructureIndex()
+    pois = infrastructure.pois()
+    if pois:
+        start = time.perf_counter()
+        surfaces['economic_activity'] = activity_surface(grid, pois)
+        print(f"✅ Economic activity from {len(pois):,} POIs in {time.perf_counter() - start:.2f}s")
+    else:
+        print("⚠️ No POI layers found, economic activity surface skipped")
+
+    census_df = pd.read_csv(args.census)
+    tehsils = census_df[census_df['Tehsil'].isin(tehsil_coordinates)].reset_index(drop=True)
+    tehsils['Lat'] = [tehsil_coordinates[name][0] for name in tehsils['Tehsil']]
+    tehsils['Lon'] = [tehsil_coordinates[name][1] for name in tehsils['Tehsil']]
+    cells = cell_grid.cell_criteria(cell_grid.make_grid(boundary, cell_size=500), tehsils)
+    roads = infrastructure.roads()
+    start = time.perf_counter()
+    surfaces['population'] = population_surface(grid, cells['x'], cells['y'],
+                                                cell_population(cells, tehsils, roads.geometry.values if roads else None))
+    print(f"✅ Population from {len(cells):,} cells in {time.perf_counter() - start:.2f}s")
+
+    for name, surface in surfaces.items():
+        base = os.path.join(args.output_dir, name)
+        raster = create_raster(base, grid, min=float(surface.min()), max=float(surface.max()))
+        raster[:] = surface
+        raster.flush()
+        print(f"✅ {name}: max {surface.max():,.1f}/km², saved {base}.npy")
+
+
+if __name__ == '__main__':
+    main()
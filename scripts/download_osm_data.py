@@ -1,75 +1,8 @@
-import osmnx as ox
-import geopandas as gpd
-import pandas as pd
+import argparse
 import os
-from shapely.geometry import Point
-
-print("⚡ Creating minimal dataset for Lahore EV analysis...")
-
-# Ensure directories exist
-os.makedirs('data/boundaries', exist_ok=True)
-os.makedirs('data/infrastructure', exist_ok=True)
-
-# Step 1: Check if we have boundary, if not create it
-print("\n1️⃣ Checking Lahore boundary...")
-if os.path.exists('data/boundaries/lahore_boundary.shp'):
-    print("✅ Boundary already exists!")
-    boundary = gpd.read_file('data/boundaries/lahore_boundary.shp')
-else:
-    print("Creating approximate boundary...")
-    from shapely.geometry import Polygon
-
-    # Create simple Lahore boundary
-    lahore_coords = [
-        (74.007, 31.201),  # SW
-        (74.655, 31.201),  # SE
-        (74.655, 31.713),  # NE
-        (74.007, 31.713),  # NW
-        (74.007, 31.201)  # Close
-    ]
-
-    lahore_polygon = Polygon(lahore_coords)
-    boundary = gpd.GeoDataFrame(
-        {'name': ['Lahore District'], 'type': ['district']},
-        geometry=[lahore_polygon],
-        crs='EPSG:4326'
-    )
-    boundary.to_file('data/boundaries/lahore_boundary.shp')
-    print("✅ Boundary created!")
-
-# Step 2: Try quick road download (with timeout)
-print("\n2️⃣ Quick road network attempt...")
-try:
-    print("   Downloading main roads only (this should be faster)...")
-
-    # Just get major roads to speed things up
-    roads = ox.graph_from_place("Lahore, Pakistan",
-                                network_type='drive',
-                                truncate_by_edge=True)
-
-    nodes, edges = ox.graph_to_gdfs(roads)
-
-    # Keep only major roads for speed
-    major_roads = edges[edges['highway'].isin(['motorway', 'trunk', 'primary', 'secondary'])].copy()
-
-    if len(major_roads) > 0:
-        # Simplify columns
-        simple_roads = major_roads[['geometry', 'highway']].copy()
-        simple_roads.to_file('data/infrastructure/major_roads.shp')
-        print(f"✅ Major roads saved: {len(simple_roads)} segments")
-    else:
-        print("⚠️ No major roads found, using all roads...")
-        simple_roads = edges[['geometry', 'highway']].copy()
-        simple_roads.to_file('data/infrastructure/lahore_roads.shp')
-        print(f"✅ All roads saved: {len(simple_roads)} segments")
 
-except Exception as e:
-    print(f"❌ Road download failed: {e}")
-
-# Step 3: Create sample POI data (manual approach)
-print("\n3️⃣ Creating sample POI data...")
-
-# Sample known locations in Lahore (you can add more)
+# Sample known locations in Lahore (you can add more); stand-ins for the
+# POI layers when there is no OSM extract (see osm_extract.py)
 sample_pois = {
     'name': [
         'Liberty Market', 'Anarkali Bazaar', 'Fortress Stadium',
@@ -105,85 +38,192 @@ sample_pois = {
     ]
 }
 
-# Create GeoDataFrame
-geometry = [Point(lon, lat) for lat, lon in zip(sample_pois['lat'], sample_pois['lon'])]
-sample_gdf = gpd.GeoDataFrame(sample_pois, geometry=geometry, crs='EPSG:4326')
-
-# Save different categories
-categories = {
-    'commercial': ['mall', 'market', 'commercial'],
-    'education': ['university'],
-    'healthcare': ['hospital'],
-    'transport': ['transport'],
-    'residential': ['residential']
-}
 
-for category, types in categories.items():
-    category_data = sample_gdf[sample_gdf['type'].isin(types)].copy()
-    if len(category_data) > 0:
-        category_data.to_file(f'data/infrastructure/{category}_sample.shp')
-        print(f"✅ {category.title()}: {len(category_data)} sample locations")
-
-# Step 4: Create data summary
-print("\n4️⃣ Creating data summary...")
-
-# Count all files
-total_files = 0
-total_features = 0
-
-summary_data = []
-
-# Check what we have
-data_check = [
-    ('boundaries/lahore_boundary.shp', 'District Boundary'),
-    ('infrastructure/major_roads.shp', 'Major Roads'),
-    ('infrastructure/lahore_roads.shp', 'All Roads'),
-    ('infrastructure/commercial_sample.shp', 'Commercial Areas'),
-    ('infrastructure/education_sample.shp', 'Universities'),
-    ('infrastructure/healthcare_sample.shp', 'Hospitals'),
-    ('infrastructure/transport_sample.shp', 'Transport Hubs'),
-    ('infrastructure/residential_sample.shp', 'Residential Areas')
-]
-
-for filepath, description in data_check:
-    full_path = f'data/{filepath}'
-    if os.path.exists(full_path):
-        try:
-            gdf = gpd.read_file(full_path)
-            count = len(gdf)
-            summary_data.append([description, count, '✅ Available'])
-            total_files += 1
-            total_features += count
-            print(f"✅ {description}: {count} features")
-        except:
-            summary_data.append([description, 0, '⚠️ Error'])
-            print(f"⚠️ {description}: File error")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Boundary, roads and POIs for the Lahore EV analysis")
+    parser.add_argument('--extract', help="Local .osm.pbf extract (default: newest in data/osm)")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    from coordinates import point_frame
+    from instrumentation import RunLog
+    from network import NETWORK_FILE, RoadNetwork, _first
+    from osm_cache import OSMCache
+    from osm_extract import find_extract, ingest, study_area_bbox
+    from storage import BOUNDARY_LAYER, INFRASTRUCTURE_DIR, find_layer, read_layer, write_layer
+    from study_area import approximate_boundary
+
+    # Stage timings go to outputs/logs (see instrumentation.py)
+    run_log = RunLog('download_osm_data')
+
+    print("⚡ Creating minimal dataset for Lahore EV analysis...")
+
+    # Ensure directories exist
+    os.makedirs('data/boundaries', exist_ok=True)
+    os.makedirs('data/infrastructure', exist_ok=True)
+
+    # Step 1: Check if we have boundary, if not create it
+    print("\n1️⃣ Checking Lahore boundary...")
+    with run_log.stage('boundary') as stage:
+        if find_layer(BOUNDARY_LAYER):
+            print("✅ Boundary already exists!")
+            boundary = read_layer(find_layer(BOUNDARY_LAYER))
+        else:
+            print("Creating approximate boundary...")
+            boundary = approximate_boundary()
+            write_layer(boundary, BOUNDARY_LAYER)
+            print("✅ Boundary created!")
+        stage.count(features=len(boundary))
+
+    # Step 2: Roads (and real POIs) from a local .osm.pbf extract if there is one,
+    # otherwise try quick road download (with timeout)
+    extract = args.extract or find_extract()
+    if extract:
+        print(f"\n2️⃣ Reading roads and POIs from {extract}...")
+        with run_log.stage('extract') as stage:
+            # One streaming pass, clipped to the boundary (see osm_extract.py)
+            extract_counts = ingest(extract, bbox=study_area_bbox())
+            for layer, count in extract_counts.items():
+                print(f"{'✅' if count else '➖'} {layer}: {count:,}")
+            stage.count(**extract_counts)
     else:
-        summary_data.append([description, 0, '❌ Not found'])
-
-# Save summary
-summary_df = pd.DataFrame(summary_data, columns=['Dataset', 'Features', 'Status'])
-summary_df.to_csv('data/quick_data_summary.csv', index=False)
-
-print(f"\n📊 QUICK DATA COLLECTION SUMMARY")
-print("=" * 40)
-print(f"Total Files: {total_files}")
-print(f"Total Features: {total_features}")
-print(f"Status: {'🟢 Ready for analysis!' if total_features > 10 else '🟡 Basic dataset ready'}")
-
-print(f"\n📋 What you have:")
-print(f"✅ Lahore district boundary")
-print(f"✅ Census demographic data (from earlier)")
-print(f"✅ Sample point locations for key areas")
-print(
-    f"{'✅ Road network data' if any('road' in f for f in os.listdir('data/infrastructure') if f.endswith('.shp')) else '⚠️ Limited road data'}")
-
-print(f"\n🚀 This is enough to build a great EV analysis!")
-print(f"📋 Next steps:")
-print(f"1. Run: python scripts/create_initial_maps.py")
-print(f"2. Start your multi-criteria analysis")
-print(f"3. Focus on demographic-based site selection")
-
-print(f"\n💡 Professional insight:")
-print(f"   Real GIS projects often work with limited data")
-print(f"   Your creative approach will impress employers!")
\ No newline at end of file
+        print("\n2️⃣ Quick road network attempt...")
+        with run_log.stage('roads') as stage:
+            try:
+                print("   Downloading main roads only (this should be faster)...")
+
+                # Just get major roads to speed things up
+                # Served from the local cache when possible (set EV_OSM_OFFLINE=1 to never download)
+                nodes, edges = OSMCache().graph_gdfs_from_place("Lahore, Pakistan",
+                                                                network_type='drive',
+                                                                truncate_by_edge=True)
+
+                # Keep the graph topology as CSR arrays for drive-time analysis
+                road_network = RoadNetwork.from_gdfs(nodes, edges)
+                road_network.save(NETWORK_FILE)
+                print(f"✅ Road network saved: {len(road_network):,} nodes, {len(road_network.indices):,} edges")
+
+                # Keep only major roads for speed
+                major_roads = edges[edges['highway'].isin(['motorway', 'trunk', 'primary', 'secondary'])].copy()
+
+                # Road layers are stored as Feather so the spatial index can memory-map them
+                if len(major_roads) > 0:
+                    # Simplify columns
+                    simple_roads = major_roads[['geometry', 'highway']].copy()
+                    simple_roads['highway'] = simple_roads['highway'].map(_first)
+                    write_layer(simple_roads, f'{INFRASTRUCTURE_DIR}/major_roads', fmt='feather')
+                    print(f"✅ Major roads saved: {len(simple_roads)} segments")
+                else:
+                    print("⚠️ No major roads found, using all roads...")
+                    simple_roads = edges[['geometry', 'highway']].copy()
+                    simple_roads['highway'] = simple_roads['highway'].map(_first)
+                    write_layer(simple_roads, f'{INFRASTRUCTURE_DIR}/lahore_roads', fmt='feather')
+                    print(f"✅ All roads saved: {len(simple_roads)} segments")
+                stage.count(nodes=len(road_network), edges=len(road_network.indices), roads=len(simple_roads))
+
+            except Exception as e:
+                print(f"❌ Road download failed: {e}")
+
+    # Step 3: Create sample POI data (manual approach)
+    print("\n3️⃣ Creating sample POI data...")
+
+    # Create GeoDataFrame
+    with run_log.stage('sample_pois') as stage:
+        sample_gdf = point_frame(sample_pois, sample_pois['lon'], sample_pois['lat'])
+
+        # Save different categories
+        categories = {
+            'commercial': ['mall', 'market', 'commercial'],
+            'education': ['university'],
+            'healthcare': ['hospital'],
+            'transport': ['transport'],
+            'residential': ['residential']
+        }
+
+        for category, types in categories.items():
+            # Real POIs from an extract take precedence (spatial_index.InfrastructureIndex.path)
+            if find_layer(f'{INFRASTRUCTURE_DIR}/{category}'):
+                print(f"➖ {category.title()}: using the OSM extract layer")
+                continue
+            category_data = sample_gdf[sample_gdf['type'].isin(types)].copy()
+            if len(category_data) > 0:
+                write_layer(category_data, f'{INFRASTRUCTURE_DIR}/{category}_sample')
+                print(f"✅ {category.title()}: {len(category_data)} sample locations")
+        stage.count(features=len(sample_gdf))
+
+    # Step 4: Create data summary
+    print("\n4️⃣ Creating data summary...")
+
+    # Count all files
+    with run_log.stage('summary') as stage:
+        total_files = 0
+        total_features = 0
+
+        summary_data = []
+
+        # Check what we have
+        data_check = [
+            ('boundaries/lahore_boundary', 'District Boundary'),
+            ('infrastructure/major_roads', 'Major Roads'),
+            ('infrastructure/lahore_roads', 'All Roads'),
+            ('infrastructure/commercial', 'Commercial Areas (OSM)'),
+            ('infrastructure/education', 'Universities (OSM)'),
+            ('infrastructure/healthcare', 'Hospitals (OSM)'),
+            ('infrastructure/transport', 'Fuel, Parking and Bus Stations (OSM)'),
+            ('infrastructure/charging_stations', 'Charging Stations (OSM)'),
+            ('infrastructure/commercial_sample', 'Commercial Areas'),
+            ('infrastructure/education_sample', 'Universities'),
+            ('infrastructure/healthcare_sample', 'Hospitals'),
+            ('infrastructure/transport_sample', 'Transport Hubs'),
+            ('infrastructure/residential_sample', 'Residential Areas')
+        ]
+
+        for layer, description in data_check:
+            full_path = find_layer(f'data/{layer}')
+            if full_path:
+                try:
+                    # Geometry only, the count is all we need
+                    gdf = read_layer(full_path, columns=[])
+                    count = len(gdf)
+                    summary_data.append([description, count, '✅ Available'])
+                    total_files += 1
+                    total_features += count
+                    print(f"✅ {description}: {count} features")
+                except:
+                    summary_data.append([description, 0, '⚠️ Error'])
+                    print(f"⚠️ {description}: File error")
+            else:
+                summary_data.append([description, 0, '❌ Not found'])
+
+        # Save summary
+        summary_df = pd.DataFrame(summary_data, columns=['Dataset', 'Features', 'Status'])
+        summary_df.to_csv('data/quick_data_summary.csv', index=False)
+        stage.count(files=total_files, features=total_features)
+
+    print(f"\n📊 QUICK DATA COLLECTION SUMMARY")
+    print("=" * 40)
+    print(f"Total Files: {total_files}")
+    print(f"Total Features: {total_features}")
+    print(f"Status: {'🟢 Ready for analysis!' if total_features > 10 else '🟡 Basic dataset ready'}")
+
+    print(f"\n📋 What you have:")
+    print(f"✅ Lahore district boundary")
+    print(f"✅ Census demographic data (from earlier)")
+    print(f"✅ Sample point locations for key areas")
+    print(
+        f"{'✅ Road network data' if any(find_layer(f'{INFRASTRUCTURE_DIR}/{name}') for name in ['major_roads', 'lahore_roads']) else '⚠️ Limited road data'}")
+
+    print(f"\n🚀 This is enough to build a great EV analysis!")
+    print(f"📋 Next steps:")
+    print(f"1. Run: python scripts/cli.py maps")
+    print(f"2. Start your multi-criteria analysis")
+    print(f"3. Focus on demographic-based site selection")
+
+    print(f"\n💡 Professional insight:")
+    print(f"   Real GIS projects often work with limited data")
+    print(f"   Your creative approach will impress employers!")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,23 @@
-import pandas as pd
-import numpy as np
-import folium
-import geopandas as gpd
-from shapely.geometry import Point
+import argparse
+import json
 import os
 
-# Ensure output directory exists
-os.makedirs('outputs/analysis', exist_ok=True)
-os.makedirs('outputs/maps', exist_ok=True)
+# Seed for every Monte Carlo component, so reruns are reproducible
+RANDOM_SEED = 42
+MONTE_CARLO_SAMPLES = 1000
 
-print("⚡ LAHORE EV CHARGING STATION SITE SELECTION ANALYSIS")
-print("=" * 60)
+# Stations to place and the distance a station serves
+N_STATIONS = 5
+COVERAGE_RADIUS_M = 3000
+
+# Raw inputs and results of the analysis. The parameters are module constants,
+# so hashing the code with these files covers everything a run depends on.
+INPUT_FILES = ['data/demographics/lahore_census_2023.csv', 'data/boundaries/lahore_boundary.*',
+               'data/infrastructure/*', 'outputs/tiles/tiles.json']
+OUTPUT_FILES = ['outputs/analysis/tehsil_analysis.csv', 'outputs/analysis/site_recommendations.csv',
+                'outputs/analysis/site_projection.csv']
+MAP_FILE = 'outputs/maps/ev_site_analysis_branded.html'
+DIGEST_FILE = 'outputs/analysis/ev_site_analysis.sha256'
 
 # Lahore Census Data (embedded for reliability)
 lahore_data = {
@@ -24,77 +31,6 @@ lahore_data = {
     'Lon': [74.3587, 74.3287, 74.3687, 74.3387, 74.3887]
 }
 
-census_df = pd.DataFrame(lahore_data)
-
-print("\n📊 DEMOGRAPHIC FOUNDATION:")
-for _, row in census_df.iterrows():
-    print(f"🏛️ {row['Tehsil']}: {row['Population_2023']:,} people, {row['Population_Density']:,.0f}/sq.km")
-
-# Step 1: Define EV Site Selection Criteria
-print("\n⚡ STEP 1: DEFINING SITE SELECTION CRITERIA")
-print("-" * 40)
-
-criteria_weights = {
-    'population_density': 0.30,  # High density = more potential users
-    'growth_rate': 0.20,  # Future demand potential
-    'accessibility': 0.25,  # Easy to reach
-    'economic_activity': 0.15,  # Commercial activity level
-    'infrastructure': 0.10  # Existing infrastructure
-}
-
-print("📋 Criteria and Weights:")
-for criterion, weight in criteria_weights.items():
-    print(f"   {criterion.replace('_', ' ').title()}: {weight:.0%}")
-
-# Step 2: Score each tehsil on criteria
-print("\n⚡ STEP 2: SCORING TEHSILS")
-print("-" * 40)
-
-
-def normalize_score(values, higher_is_better=True):
-    """Normalize values to 0-100 scale"""
-    min_val, max_val = min(values), max(values)
-    if higher_is_better:
-        return [(val - min_val) / (max_val - min_val) * 100 for val in values]
-    else:
-        return [(max_val - val) / (max_val - min_val) * 100 for val in values]
-
-
-# Calculate scores for each criterion
-census_df['density_score'] = normalize_score(census_df['Population_Density'])
-census_df['growth_score'] = normalize_score(census_df['Annual_Growth_Rate'])
-
-# Accessibility score (inverse of area - smaller area = more accessible)
-census_df['accessibility_score'] = normalize_score(census_df['Area_SqKm'], higher_is_better=False)
-
-# Economic activity score (based on density + size)
-economic_activity = census_df['Population_2023'] * census_df['Population_Density'] / 1000000
-census_df['economic_score'] = normalize_score(economic_activity)
-
-# Infrastructure score (based on existing development - higher density areas)
-census_df['infrastructure_score'] = census_df['density_score']
-
-# Calculate weighted composite score
-census_df['composite_score'] = (
-        census_df['density_score'] * criteria_weights['population_density'] +
-        census_df['growth_score'] * criteria_weights['growth_rate'] +
-        census_df['accessibility_score'] * criteria_weights['accessibility'] +
-        census_df['economic_score'] * criteria_weights['economic_activity'] +
-        census_df['infrastructure_score'] * criteria_weights['infrastructure']
-)
-
-# Rank by composite score
-census_df = census_df.sort_values('composite_score', ascending=False).reset_index(drop=True)
-census_df['priority_rank'] = range(1, len(census_df) + 1)
-
-print("🏆 TEHSIL RANKINGS:")
-for _, row in census_df.iterrows():
-    print(f"#{row['priority_rank']}: {row['Tehsil']} - Score: {row['composite_score']:.1f}")
-
-# Step 3: Recommend specific site locations
-print("\n⚡ STEP 3: SPECIFIC SITE RECOMMENDATIONS")
-print("-" * 40)
-
 # Define potential EV charging locations based on known Lahore landmarks
 potential_sites = {
     'Lahore City': [
@@ -119,58 +55,28 @@ potential_sites = {
     ]
 }
 
-# Create detailed site analysis
-site_recommendations = []
-
-for _, tehsil_row in census_df.iterrows():
-    tehsil_name = tehsil_row['Tehsil']
-    tehsil_score = tehsil_row['composite_score']
-    tehsil_rank = tehsil_row['priority_rank']
-
-    if tehsil_name in potential_sites:
-        for site in potential_sites[tehsil_name]:
-            site_score = tehsil_score + np.random.uniform(-5, 5)  # Add site-specific variation
-
-            site_recommendations.append({
-                'Site_Name': site['name'],
-                'Tehsil': tehsil_name,
-                'Priority_Rank': tehsil_rank,
-                'Site_Type': site['type'],
-                'Latitude': site['lat'],
-                'Longitude': site['lon'],
-                'Tehsil_Score': tehsil_score,
-                'Site_Score': max(0, site_score),
-                'Population_Served': tehsil_row['Population_2023'],
-                'Growth_Potential': tehsil_row['Annual_Growth_Rate'],
-                'Recommendation': 'High Priority' if site_score > 70 else 'Medium Priority' if site_score > 50 else 'Future Consideration'
-            })
-
-sites_df = pd.DataFrame(site_recommendations)
-sites_df = sites_df.sort_values('Site_Score', ascending=False).reset_index(drop=True)
-
-print("🎯 TOP 5 RECOMMENDED SITES:")
-for i, row in sites_df.head().iterrows():
-    print(f"{i + 1}. {row['Site_Name']} ({row['Tehsil']})")
-    print(f"   Score: {row['Site_Score']:.1f} | Type: {row['Site_Type']} | {row['Recommendation']}")
-
-# Step 4: Create detailed analysis map with branding
-print("\n⚡ STEP 4: CREATING BRANDED ANALYSIS MAP")
-print("-" * 40)
-
-# Create map
-m = folium.Map(location=[31.5204, 74.3587], zoom_start=11, tiles='OpenStreetMap')
-
-# Add tehsil boundaries (approximate circles)
-for _, row in census_df.iterrows():
-    # Size circle based on composite score
-    radius = max(2000, row['composite_score'] * 100)
-
-    color = ['red', 'orange', 'yellow', 'lightgreen', 'lightblue'][row['priority_rank'] - 1]
-
-    folium.Circle(
-        location=[row['Lat'], row['Lon']],
-        radius=radius,
-        popup=f"""
+
+def create_map(census_df, sites_df, phase_windows):
+    """Branded analysis map: tehsil priority circles, sites by rollout phase and tile layers"""
+    import folium
+    import numpy as np
+    import pandas as pd
+
+    from web_map import add_points, add_tile_layers, save_map
+
+    m = folium.Map(location=[31.5204, 74.3587], zoom_start=11, tiles='OpenStreetMap')
+
+    # Add tehsil boundaries (approximate circles)
+    for _, row in census_df.iterrows():
+        # Circle with the tehsil's area, so its radius is a true distance in metres
+        radius = np.sqrt(row['Area_SqKm'] * 1e6 / np.pi)
+
+        color = ['red', 'orange', 'yellow', 'lightgreen', 'lightblue'][row['priority_rank'] - 1]
+
+        folium.Circle(
+            location=[row['Lat'], row['Lon']],
+            radius=radius,
+            popup=f"""
         <b>{row['Tehsil']}</b><br>
         Priority Rank: #{row['priority_rank']}<br>
         Composite Score: {row['composite_score']:.1f}<br>
@@ -178,41 +84,32 @@ for _, row in census_df.iterrows():
         Density: {row['Population_Density']:,.0f}/sq.km<br>
         Growth Rate: {row['Annual_Growth_Rate']:.1f}%
         """,
-        color='black',
-        fill=True,
-        fillColor=color,
-        fillOpacity=0.3
-    ).add_to(m)
-
-# Add recommended sites
-for _, row in sites_df.iterrows():
-    # Color based on recommendation level
-    if row['Recommendation'] == 'High Priority':
-        icon_color = 'red'
-        icon = 'star'
-    elif row['Recommendation'] == 'Medium Priority':
-        icon_color = 'orange'
-        icon = 'bolt'
-    else:
-        icon_color = 'blue'
-        icon = 'info-sign'
-
-    folium.Marker(
-        location=[row['Latitude'], row['Longitude']],
-        popup=f"""
-        <b>{row['Site_Name']}</b><br>
-        Tehsil: {row['Tehsil']}<br>
-        Site Score: {row['Site_Score']:.1f}<br>
-        Type: {row['Site_Type']}<br>
-        Priority: {row['Recommendation']}<br>
-        Population Served: {row['Population_Served']:,}<br>
-        Growth Rate: {row['Growth_Potential']:.1f}%
-        """,
-        icon=folium.Icon(color=icon_color, icon=icon)
-    ).add_to(m)
-
-# NOW add branded title (after sites_df is created)
-title_html = f'''
+            color='black',
+            fill=True,
+            fillColor=color,
+            fillOpacity=0.3
+        ).add_to(m)
+
+    # Add recommended sites, colored by rollout phase
+    phase_labels = list(phase_windows)
+    levels = [sites_df['Rollout_Phase'] == phase_labels[0], sites_df['Rollout_Phase'] == phase_labels[1]]
+    icon_color = np.select(levels, ['red', 'orange'], 'blue')
+    icon = np.select(levels, ['star', 'bolt'], 'info-sign')
+    site_popups = pd.DataFrame({
+        'Site_Name': sites_df['Site_Name'],
+        'Tehsil': sites_df['Tehsil'],
+        'Site Score': sites_df['Site_Score'].map('{:.1f}'.format),
+        'Type': sites_df['Site_Type'],
+        'Priority': sites_df['Recommendation'],
+        'Rollout': sites_df['Rollout_Phase'],
+        'Population Served': sites_df['Population_Served'].map('{:,}'.format),
+        'Growth Rate': sites_df['Growth_Potential'].map('{:.1f}%'.format)
+    })
+    add_points(m, sites_df['Latitude'].to_numpy(), sites_df['Longitude'].to_numpy(), site_popups,
+               color=icon_color, icon=icon, name='Recommended Sites')
+
+    # NOW add branded title (after sites_df is created)
+    title_html = f'''
 <div style="position: fixed; 
             top: 10px; left: 50%; transform: translateX(-50%);
             background-color: white; border:2px solid grey; z-index:9999; 
@@ -225,10 +122,10 @@ title_html = f'''
 </p>
 </div>
 '''
-m.get_root().html.add_child(folium.Element(title_html))
+    m.get_root().html.add_child(folium.Element(title_html))
 
-# Add professional branding and copyright
-branding_html = '''
+    # Add professional branding and copyright
+    branding_html = '''
 <div style="position: fixed; 
             bottom: 10px; right: 10px; 
             background-color: rgba(255,255,255,0.95); border:1px solid #ccc; z-index:9999; 
@@ -252,10 +149,10 @@ branding_html = '''
 </div>
 </div>
 '''
-m.get_root().html.add_child(folium.Element(branding_html))
+    m.get_root().html.add_child(folium.Element(branding_html))
 
-# Add legend
-legend_html = '''
+    # Add legend
+    legend_html = f'''
 <div style="position: fixed; 
             bottom: 50px; left: 50px; width: 300px; height: 220px; 
             background-color: white; border:2px solid grey; z-index:9999; 
@@ -269,15 +166,15 @@ legend_html = '''
 <b style="color:#333;">📍 Recommended Sites:</b><br>
 <div style="margin: 3px 0;">
     <i class="fa fa-star" style="color:red; width: 15px;"></i> 
-    <span style="margin-left: 5px;">High Priority (Phase 1: 0-6 months)</span>
+    <span style="margin-left: 5px;">{phase_labels[0]}: {phase_windows[phase_labels[0]]}</span>
 </div>
 <div style="margin: 3px 0;">
     <i class="fa fa-bolt" style="color:orange; width: 15px;"></i> 
-    <span style="margin-left: 5px;">Medium Priority (Phase 2: 6-18 months)</span>
+    <span style="margin-left: 5px;">{phase_labels[1]}: {phase_windows[phase_labels[1]]}</span>
 </div>
 <div style="margin: 3px 0;">
     <i class="fa fa-info" style="color:blue; width: 15px;"></i> 
-    <span style="margin-left: 5px;">Future Consideration (Phase 3: 18+ months)</span>
+    <span style="margin-left: 5px;">{phase_labels[2]}: {phase_windows[phase_labels[2]]}</span>
 </div>
 </div>
 
@@ -306,20 +203,342 @@ legend_html = '''
 </div>
 </div>
 '''
-m.get_root().html.add_child(folium.Element(legend_html))
-
-# Save map
-m.save('outputs/maps/ev_site_analysis_branded.html')
-print("✅ Branded analysis map saved: outputs/maps/ev_site_analysis_branded.html")
-
-# Generate reports (same as before)
-print("\n⚡ STEP 5: GENERATING ANALYSIS REPORT")
-print("-" * 40)
-
-# Save detailed results
-census_df.to_csv('outputs/analysis/tehsil_analysis.csv', index=False)
-sites_df.to_csv('outputs/analysis/site_recommendations.csv', index=False)
-
-print("✅ Analysis complete with professional branding!")
-print("📁 Branded map: outputs/maps/ev_site_analysis_branded.html")
-print("📊 Data files: outputs/analysis/")
\ No newline at end of file
+    m.get_root().html.add_child(folium.Element(legend_html))
+
+    # Suitability surface and roads as static tiles (tiles.py), loaded as the map pans
+    if add_tile_layers(m, 'outputs/maps/ev_site_analysis_branded.html'):
+        folium.LayerControl().add_to(m)
+
+    # Save map
+    save_map(m, MAP_FILE)
+
+
+def load_digest():
+    """Digest record of the last complete run, or None"""
+    try:
+        with open(DIGEST_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def inputs_digest(record=None):
+    """Hash of the analysis code and raw input files, plus the caches to record with it
+
+    File hashes and module imports from the last run's record are reused
+    while a file's size and mtime are unchanged, so large layers are not
+    read and modules not parsed again.
+    """
+    from pipeline import FileHashes, ModuleImports, Task, task_digest
+
+    record = record or {}
+    file_hash = FileHashes(record.get('files'))
+    imports = ModuleImports(file_hash, record.get('imports'))
+    digest = task_digest(Task('analyze', 'ev_site_analysis.py', inputs=INPUT_FILES), file_hash, root='.',
+                         imports=imports)
+    return digest, {'files': file_hash.used, 'imports': imports.known}
+
+
+def up_to_date(record, digest, with_map):
+    """Whether the last run had the same inputs and left every output we need"""
+    if record is None or record.get('digest') != digest:
+        return False
+    if with_map and not (record.get('map') and os.path.exists(MAP_FILE)):
+        return False
+    return all(os.path.exists(filepath) for filepath in OUTPUT_FILES)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lahore EV charging station site selection analysis")
+    parser.add_argument('--no-map', action='store_true', help="Skip the branded analysis map")
+    parser.add_argument('--force', action='store_true', help="Rerun even if the inputs are unchanged")
+    args = parser.parse_args(argv)
+
+    # Identical inputs give identical outputs, so check before any work is done
+    record = load_digest()
+    digest, caches = inputs_digest(record)
+    if not args.force and up_to_date(record, digest, not args.no_map):
+        print("♻️ Inputs unchanged, outputs in outputs/analysis are current (--force reruns)")
+        return
+
+    import numpy as np
+    import pandas as pd
+
+    import catchment
+    import dasymetric
+    import demand
+    import facility_location
+    import grid
+    import mcda
+    import projection
+    import site_scoring
+    import sizing
+    from coordinates import add_metric_xy, metric_xy, to_metric
+    from criteria import criteria_weights, score_columns, site_criteria_weights, site_criteria_directions
+    from instrumentation import RunLog
+    from network import NETWORK_FILE, RoadNetwork, reach_matrix, reachable_totals, site_accessibility
+    from spatial_index import InfrastructureIndex
+    from storage import BOUNDARY_LAYER, find_layer, read_layer
+    from study_area import approximate_boundary
+
+    # Stage timings go to outputs/logs (see instrumentation.py)
+    run_log = RunLog('ev_site_analysis')
+
+    # Ensure output directory exists
+    os.makedirs('outputs/analysis', exist_ok=True)
+    os.makedirs('outputs/maps', exist_ok=True)
+
+    print("⚡ LAHORE EV CHARGING STATION SITE SELECTION ANALYSIS")
+    print("=" * 60)
+
+    census_df = pd.DataFrame(lahore_data)
+
+    print("\n📊 DEMOGRAPHIC FOUNDATION:")
+    for _, row in census_df.iterrows():
+        print(f"🏛️ {row['Tehsil']}: {row['Population_2023']:,} people, {row['Population_Density']:,.0f}/sq.km")
+
+    # Step 1: Define EV Site Selection Criteria
+    print("\n⚡ STEP 1: DEFINING SITE SELECTION CRITERIA")
+    print("-" * 40)
+
+    print("📋 Criteria and Weights:")
+    for criterion, weight in criteria_weights.items():
+        print(f"   {criterion.replace('_', ' ').title()}: {weight:.0%}")
+
+    # Step 2: Score each tehsil on criteria
+    print("\n⚡ STEP 2: SCORING TEHSILS")
+    print("-" * 40)
+
+    # Population surface on a 500 m grid: each tehsil's census population
+    # spread over its cells by road length (dasymetric.py), used as demand for
+    # accessibility, served population and station placement
+    with run_log.stage('population_grid') as stage:
+        infrastructure = InfrastructureIndex()
+        roads = infrastructure.roads()
+        boundary_file = find_layer(BOUNDARY_LAYER)
+        boundary = read_layer(boundary_file) if boundary_file else approximate_boundary()
+        population_cells = grid.cell_criteria(grid.make_grid(boundary, cell_size=500), census_df)
+        population_cells['Population'] = dasymetric.cell_population(population_cells, census_df,
+                                                                    roads.geometry.values if roads else None)
+        stage.count(cells=len(population_cells), roads=len(roads) if roads else 0)
+
+    # Economic activity = POI kernel density (demand.py) averaged over each
+    # tehsil's cells, falling back to a size x density proxy without POI data
+    with run_log.stage('economic_activity') as stage:
+        pois = infrastructure.pois()
+        if pois:
+            population_cells['Economic_Activity'] = demand.economic_activity(pois, population_cells['x'],
+                                                                             population_cells['y'])
+            tehsil_activity = population_cells.groupby('Tehsil', observed=True)['Economic_Activity'].mean()
+            economic_activity = census_df['Tehsil'].map(tehsil_activity).fillna(0).to_numpy()
+            print(f"🏪 Economic activity: kernel density of {len(pois):,} POIs")
+        else:
+            economic_activity = census_df['Population_2023'] * census_df['Population_Density'] / 1000000
+            print("⚠️ POI layers not found, economic activity approximated from tehsil size and density")
+        stage.count(pois=len(pois) if pois else 0)
+
+    # Drive-time accessibility needs the road network saved by download_osm_data.py
+    with run_log.stage('accessibility') as stage:
+        road_network = RoadNetwork.load() if os.path.exists(NETWORK_FILE) else None
+        if road_network is not None:
+            node_population = road_network.node_totals(population_cells['x'], population_cells['y'],
+                                                       population_cells['Population'])
+
+            # Accessibility = residents within a 15 minute drive of the tehsil centre
+            tehsil_x, tehsil_y = to_metric(census_df['Lon'], census_df['Lat'])
+            accessibility = reachable_totals(road_network, road_network.snap(tehsil_x, tehsil_y),
+                                             node_population, [15])[:, 0]
+            accessibility_direction = mcda.BENEFIT
+            print("🚗 Accessibility: population within 15 min drive (road network)")
+        else:
+            # No road network: smaller area = more accessible
+            accessibility = census_df['Area_SqKm']
+            accessibility_direction = mcda.COST
+            print("⚠️ Road network not found, accessibility approximated from tehsil area")
+        stage.count(nodes=len(road_network) if road_network is not None else 0)
+
+    # Raw criterion values, in the same order as criteria_weights
+    # Infrastructure is based on existing development (higher density areas)
+    with run_log.stage('tehsil_scoring') as stage:
+        criteria_matrix = np.column_stack([
+            census_df['Population_Density'],
+            census_df['Annual_Growth_Rate'],
+            accessibility,
+            economic_activity,
+            census_df['Population_Density']
+        ])
+        criteria_directions = [mcda.BENEFIT, mcda.BENEFIT, accessibility_direction, mcda.BENEFIT, mcda.BENEFIT]
+
+        tehsil_scores = mcda.score(criteria_matrix, mcda.weight_vector(criteria_weights),
+                                   directions=criteria_directions)
+
+        census_df[list(score_columns.values())] = tehsil_scores.normalized
+        census_df['composite_score'] = tehsil_scores.composite
+        census_df['priority_rank'] = tehsil_scores.ranks
+
+        # Rank by composite score
+        census_df = census_df.sort_values('priority_rank').reset_index(drop=True)
+        stage.count(rows=len(census_df))
+
+    print("🏆 TEHSIL RANKINGS:")
+    for _, row in census_df.iterrows():
+        print(f"#{row['priority_rank']}: {row['Tehsil']} - Score: {row['composite_score']:.1f}")
+
+    # Step 3: Recommend specific site locations
+    print("\n⚡ STEP 3: SPECIFIC SITE RECOMMENDATIONS")
+    print("-" * 40)
+
+    # Candidate site table: one row per site with its parent tehsil's scores
+    with run_log.stage('site_features') as stage:
+        site_table = pd.DataFrame([
+            {'Site_Name': site['name'], 'Tehsil': tehsil, 'Site_Type': site['type'],
+             'Latitude': site['lat'], 'Longitude': site['lon']}
+            for tehsil, sites in potential_sites.items() for site in sites
+        ])
+        tehsil_columns = census_df[['Tehsil', 'priority_rank', 'composite_score', 'Annual_Growth_Rate']]
+        site_table = site_table.merge(tehsil_columns.rename(columns={
+            'priority_rank': 'Priority_Rank',
+            'composite_score': 'Tehsil_Score',
+            'Annual_Growth_Rate': 'Growth_Potential'
+        }), on='Tehsil', how='inner')
+
+        # Metric x/y kept next to lon/lat, so no later stage reprojects the sites
+        add_metric_xy(site_table)
+
+        # Residents within the coverage radius; cells reached by several sites are
+        # shared between them instead of counted once per site
+        site_catchments = dasymetric.catchment_matrix(site_table[['x', 'y']].to_numpy(), population_cells,
+                                                      COVERAGE_RADIUS_M)
+        site_table['Population_Served'] = np.rint(
+            dasymetric.served_population(site_catchments, population_cells['Population'])).astype(np.int64)
+
+        # Site-specific attributes from the infrastructure layers
+        site_table = site_table.join(site_scoring.site_features(site_table, infrastructure))
+        if road_network is not None:
+            site_table = site_table.join(site_accessibility(road_network, site_table, population_cells))
+        else:
+            site_table['Population_15Min'] = np.nan
+        stage.count(rows=len(site_table))
+
+    with run_log.stage('site_scoring') as stage:
+        sites_df = site_scoring.score_sites(site_table, site_criteria_weights, site_criteria_directions,
+                                            monte_carlo_samples=MONTE_CARLO_SAMPLES, seed=RANDOM_SEED)
+        sites_df = sites_df.sort_values('Site_Score', ascending=False, kind='stable').reset_index(drop=True)
+
+        # Choose stations jointly (maximal covering of population) so two
+        # stations are never planned on the same spot
+        site_x, site_y = metric_xy(sites_df)
+        coverage = facility_location.coverage_matrix(np.column_stack([site_x, site_y]),
+                                                     population_cells[['x', 'y']].to_numpy(), COVERAGE_RADIUS_M)
+        plan = facility_location.max_coverage(coverage, population_cells['Population'], N_STATIONS)
+        sites_df['Selection_Order'] = pd.array([pd.NA] * len(sites_df), dtype='Int64')
+        sites_df.loc[plan.selected, 'Selection_Order'] = np.arange(1, len(plan.selected) + 1)
+        sites_df['Population_Covered'] = 0.0
+        sites_df.loc[plan.selected, 'Population_Covered'] = plan.gains
+        stage.count(rows=len(sites_df))
+
+    # Demand split among competing sites: every cell goes to its nearest site
+    # (by drive time when the road network is available)
+    with run_log.stage('catchments') as stage:
+        site_x, site_y = metric_xy(sites_df)
+        catchments = catchment.Catchments(population_cells[['x', 'y']].to_numpy(), population_cells['Population'],
+                                          network=road_network)
+        site_loads = catchments.set_sites(np.column_stack([site_x, site_y])).site_loads()
+        for column in ['Catchment_Population', 'Sessions_Per_Day', 'Utilization', 'Overloaded']:
+            sites_df[column] = site_loads[column].to_numpy()
+        stage.count(rows=len(sites_df), cells=len(population_cells))
+
+    # Chargers each site needs for its catchment's sessions: Erlang C on the
+    # peak hour, then a seeded Monte Carlo day for utilization and waits
+    with run_log.stage('sizing') as stage:
+        site_sizing = sizing.size_sites(sites_df['Sessions_Per_Day'], seed=RANDOM_SEED)
+        for column in site_sizing.columns:
+            sites_df[column] = site_sizing[column].to_numpy()
+        stage.count(rows=len(sites_df), replications=sizing.REPLICATIONS)
+
+    # Project cell populations and EV adoption over the horizon; each site's
+    # catchment demand and drive-time population are re-scored for every year
+    # in one batch, and the rollout phase is when the site becomes viable
+    with run_log.stage('projection') as stage:
+        steps = projection.time_steps()
+        cell_projection = projection.project(population_cells['Population'],
+                                             projection.cell_growth_rates(population_cells, census_df), steps)
+        catchment_projection = projection.site_totals(catchments.membership(), cell_projection)
+        sessions_projection = (catchment_projection
+                               * projection.sessions_per_resident(projection.BASE_YEAR + steps)[:, None])
+        if road_network is not None:
+            reach = reach_matrix(road_network, road_network.snap(site_x, site_y),
+                                 population_cells['x'], population_cells['y'], 15)
+            reach_projection = projection.site_totals(reach, cell_projection)
+        else:
+            reach_projection = np.full(sessions_projection.shape, np.nan)
+        projected_scores, projected_ranks = site_scoring.scores_over_time(
+            sites_df, site_criteria_weights, site_criteria_directions, 'Population_15Min', reach_projection)
+        years_to_viable = projection.first_viable(sessions_projection, steps)
+        sites_df['Viable_Year'] = projection.BASE_YEAR + years_to_viable
+        sites_df['Rollout_Phase'] = projection.rollout_phases(years_to_viable)
+        sites_df[f'Rank_{projection.BASE_YEAR + projection.HORIZON_YEARS}'] = projected_ranks[-1]
+        projection.projection_table(sites_df['Site_Name'], steps, catchment_projection, sessions_projection,
+                                    projected_scores, projected_ranks).to_csv('outputs/analysis/site_projection.csv',
+                                                                              index=False)
+        stage.count(rows=len(sites_df) * len(steps))
+
+    print("🎯 TOP 5 RECOMMENDED SITES:")
+    for i, row in sites_df.head().iterrows():
+        print(f"{i + 1}. {row['Site_Name']} ({row['Tehsil']})")
+        print(f"   Score: {row['Site_Score']:.1f} | Type: {row['Site_Type']} | {row['Recommendation']}")
+
+    print(f"\n📍 OPTIMIZED {N_STATIONS}-STATION PLAN (coverage radius {COVERAGE_RADIUS_M / 1000:g} km):")
+    for _, row in sites_df.dropna(subset=['Selection_Order']).sort_values('Selection_Order').iterrows():
+        print(f"{int(row['Selection_Order'])}. {row['Site_Name']} (+{row['Population_Covered']:,.0f} people covered)")
+
+    print(f"\n🔌 CATCHMENT LOAD ({'drive time' if road_network is not None else 'straight-line distance'}):")
+    for _, row in sites_df.iterrows():
+        flag = ' ⚠️ OVERLOADED' if row['Overloaded'] else ''
+        print(f"   {row['Site_Name']}: {row['Catchment_Population']:,.0f} residents, "
+              f"{row['Sessions_Per_Day']:.0f} sessions/day ({row['Utilization']:.0%}){flag}")
+
+    print(f"\n🔋 CHARGERS NEEDED (peak-hour mean wait under {sizing.WAIT_TARGET_MINUTES:g} min):")
+    for _, row in sites_df.iterrows():
+        print(f"   {row['Site_Name']}: {row['Chargers']} chargers, {row['Expected_Utilization']:.0%} utilized, "
+              f"{row['Simulated_Wait_Minutes']:.1f} min average wait")
+
+    phase_windows = projection.phase_windows()
+    print(f"\n📅 ROLLOUT PHASES (viable at {projection.VIABLE_SESSIONS_PER_DAY:g} sessions/day, "
+          f"{projection.BASE_YEAR}-{projection.BASE_YEAR + projection.HORIZON_YEARS}):")
+    for phase, window in phase_windows.items():
+        names = sites_df.loc[sites_df['Rollout_Phase'] == phase, 'Site_Name']
+        print(f"   {phase} ({window}): {len(names)} sites" + (f" - {', '.join(names)}" if len(names) else ''))
+
+    # Step 4: Create detailed analysis map with branding
+    print("\n⚡ STEP 4: CREATING BRANDED ANALYSIS MAP")
+    print("-" * 40)
+    if args.no_map:
+        print("➖ Map skipped (--no-map)")
+    else:
+        with run_log.stage('map') as stage:
+            create_map(census_df, sites_df, phase_windows)
+            stage.count(features=len(census_df) + len(sites_df))
+        print("✅ Branded analysis map saved: outputs/maps/ev_site_analysis_branded.html")
+
+    # Generate reports (same as before)
+    print("\n⚡ STEP 5: GENERATING ANALYSIS REPORT")
+    print("-" * 40)
+
+    # Save detailed results
+    with run_log.stage('report') as stage:
+        census_df.to_csv('outputs/analysis/tehsil_analysis.csv', index=False)
+        sites_df.to_csv('outputs/analysis/site_recommendations.csv', index=False)
+        # Recorded last, so an interrupted run is never taken as current
+        with open(DIGEST_FILE, 'w') as f:
+            json.dump({'digest': digest, 'map': not args.no_map, **caches}, f)
+        stage.count(rows=len(census_df) + len(sites_df))
+
+    print("✅ Analysis complete with professional branding!")
+    if not args.no_map:
+        print(f"📁 Branded map: {MAP_FILE}")
+    print("📊 Data files: outputs/analysis/")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import heapq
+from collections import namedtuple
+
+import numpy as np
+
+# Facility location for choosing N charging sites together instead of
+# ranking them one by one. Candidate/demand relations are sparse matrices
+# (only pairs within a cut-off distance), so the solvers scale to 10k
+# candidates x 1M demand points. Large instances use lazy greedy (the
+# objectives are submodular, so stale gains are valid upper bounds); small
+# ones can be solved exactly as a MILP with the HiGHS solver bundled in SciPy.
+
+# selected: candidate indices in the order they were picked
+# objective: covered demand (MCLP) or total weighted distance (p-median)
+# gains: objective improvement contributed by each selected site
+LocationResult = namedtuple('LocationResult', ['selected', 'objective', 'gains'])
+
+
+def distance_matrix(site_xy, demand_xy, max_distance):
+    """Sparse (sites x demand) matrix of distances up to max_distance metres
+
+    Pairs further apart are not stored. Zero distances are kept as a tiny
+    positive value so they are not dropped from the sparse structure.
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.spatial import cKDTree
+
+    site_xy = np.asarray(site_xy, dtype=float)
+    demand_xy = np.asarray(demand_xy, dtype=float)
+    neighbours = cKDTree(demand_xy).query_ball_point(site_xy, max_distance, workers=-1)
+    lengths = np.fromiter((len(n) for n in neighbours), dtype=np.int64, count=len(neighbours))
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    indices = np.concatenate([np.asarray(n, dtype=np.int64) for n in neighbours]) if indptr[-1] else np.zeros(0, np.int64)
+    rows = np.repeat(np.arange(len(site_xy)), lengths)
+    distances = np.hypot(*(site_xy[rows] - demand_xy[indices]).T)
+    return csr_matrix((np.maximum(distances, 1e-9), indices, indptr), shape=(len(site_xy), len(demand_xy)))
+
+
+def coverage_matrix(site_xy, demand_xy, radius):
+    """Sparse boolean (sites x demand) matrix: demand point within radius"""
+    matrix = distance_matrix(site_xy, demand_xy, radius)
+    matrix.data = np.ones_like(matrix.data, dtype=bool)
+    return matrix
+
+
+def _lazy_greedy(n_candidates, gain, n_sites, costs=None, budget=None):
+    """Yield candidates in lazy greedy order, driven by a gain(j) callback
+
+    The caller updates its state after each yielded candidate so that later
+    gain(j) calls see the sites selected so far. Gains are cached in a
+    max-heap and only recomputed when a candidate reaches the top, which is
+    valid because the gains never increase as more sites are selected
+    (submodularity). With costs and a budget the heap is ordered by gain per
+    unit cost.
+    """
+    costs = np.ones(n_candidates) if costs is None else np.asarray(costs, dtype=float)
+    budget = np.inf if budget is None else budget
+    n_sites = n_candidates if n_sites is None else n_sites
+
+    heap = [(-gain(j) / costs[j], j) for j in range(n_candidates)]
+    heapq.heapify(heap)
+    fresh = np.zeros(n_candidates, dtype=np.int64)  # selection round each cached gain belongs to
+
+    picked, spent = 0, 0.0
+    while heap and picked < n_sites:
+        priority, j = heapq.heappop(heap)
+        if spent + costs[j] > budget:
+            continue
+        if fresh[j] != picked:
+            fresh[j] = picked
+            heapq.heappush(heap, (-gain(j) / costs[j], j))
+            continue
+        if priority >= 0:
+            break  # Nothing left adds any value
+        picked += 1
+        spent += costs[j]
+        yield j
+
+
+def max_coverage(coverage, weights, n_sites, costs=None, budget=None):
+    """Maximal covering location (MCLP) by lazy greedy
+
+    ``coverage`` is a sparse (candidates x demand) boolean matrix, ``weights``
+    the demand at each point. Co-located candidates cover the same demand,
+    so the second one adds nothing and is not picked.
+    """
+    coverage = coverage.tocsr()
+    weights = np.asarray(weights, dtype=float)
+    uncovered = np.ones(coverage.shape[1], dtype=bool)
+
+    def gain(j):
+        cells = coverage.indices[coverage.indptr[j]:coverage.indptr[j + 1]]
+        return weights[cells[uncovered[cells]]].sum()
+
+    selected, gains = [], []
+    for j in _lazy_greedy(coverage.shape[0], gain, n_sites, costs, budget):
+        cells = coverage.indices[coverage.indptr[j]:coverage.indptr[j + 1]]
+        gains.append(gain(j))
+        uncovered[cells] = False
+        selected.append(j)
+    return LocationResult(np.asarray(selected, dtype=np.int64), float(sum(gains)), np.asarray(gains))
+
+
+def p_median(distances, weights, n_sites, max_distance, costs=None, budget=None):
+    """Greedy p-median: minimise demand-weighted distance to the nearest site
+
+    ``distances`` is a sparse (candidates x demand) matrix from
+    distance_matrix; demand further than max_distance from every selected
+    site is charged max_distance.
+    """
+    distances = distances.tocsr()
+    weights = np.asarray(weights, dtype=float)
+    current = np.full(distances.shape[1], float(max_distance))
+
+    def gain(j):
+        row = slice(distances.indptr[j], distances.indptr[j + 1])
+        cells = distances.indices[row]
+        return (weights[cells] * np.maximum(current[cells] - distances.data[row], 0)).sum()
+
+    selected, gains = [], []
+    for j in _lazy_greedy(distances.shape[0], gain, n_sites, costs, budget):
+        row = slice(distances.indptr[j], distances.indptr[j + 1])
+        cells = distances.indices[row]
+        gains.append(gain(j))
+        current[cells] = np.minimum(current[cells], distances.data[row])
+        selected.append(j)
+    return LocationResult(np.asarray(selected, dtype=np.int64), float(weights @ current), np.asarray(gains))
+
+
+def _solve_milp(objective, constraints, n_binary, n_total):
+    from scipy.optimize import Bounds, milp
+
+    integrality = np.zeros(n_total)
+    integrality[:n_binary] = 1
+    result = milp(objective, constraints=constraints, integrality=integrality, bounds=Bounds(0, 1))
+    if not result.success:
+        raise RuntimeError(f"MILP solver failed: {result.message}")
+    return result
+
+
+def max_coverage_exact(coverage, weights, n_sites):
+    """Exact MCLP as a MILP (HiGHS via scipy.optimize.milp), for small instances
+
+    Variables are x_j (open candidate j) and y_i (demand i covered):
+    maximise sum w_i y_i subject to y_i <= sum_j a_ij x_j and sum x_j <= n_sites.
+    """
+    from scipy.optimize import LinearConstraint
+    from scipy.sparse import hstack, identity, csr_matrix
+
+    coverage = coverage.tocsr().astype(float)
+    weights = np.asarray(weights, dtype=float)
+    m, n = coverage.shape
+
+    objective = np.concatenate([np.zeros(m), -weights])
+    link = hstack([-coverage.T, identity(n)])
+    count = csr_matrix(np.concatenate([np.ones(m), np.zeros(n)])[None, :])
+    result = _solve_milp(objective, [LinearConstraint(link, -np.inf, 0),
+                                     LinearConstraint(count, 0, n_sites)], m, m + n)
+
+    selected = np.flatnonzero(result.x[:m] > 0.5)
+    covered = np.asarray(coverage[selected].sum(axis=0)).ravel() > 0
+    return LocationResult(selected, float(weights[covered].sum()), None)
+
+
+def p_median_exact(distances, weights, n_sites, max_distance):
+    """Exact p-median as a MILP over the sparse candidate/demand pairs
+
+    Each demand point is assigned to one open candidate within range or
+    left unserved at cost max_distance.
+    """
+    from scipy.optimize import LinearConstraint
+    from scipy.sparse import coo_matrix, csr_matrix, hstack, identity
+
+    distances = distances.tocoo()
+    weights = np.asarray(weights, dtype=float)
+    m, n = distances.shape
+    pairs = len(distances.data)
+
+    # Variables: x_j (m), z_ij per stored pair (pairs), u_i unserved (n)
+    objective = np.concatenate([np.zeros(m), weights[distances.col] * distances.data,
+                                weights * max_distance])
+    pair_ids = np.arange(pairs)
+    assign = hstack([csr_matrix((n, m)), coo_matrix((np.ones(pairs), (distances.col, pair_ids)), shape=(n, pairs)),
+                     identity(n)])
+    link = hstack([coo_matrix((-np.ones(pairs), (pair_ids, distances.row)), shape=(pairs, m)),
+                   identity(pairs), csr_matrix((pairs, n))])
+    count = csr_matrix(np.concatenate([np.ones(m), np.zeros(pairs + n)])[None, :])
+    result = _solve_milp(objective, [LinearConstraint(assign, 1, 1), LinearConstraint(link, -np.inf, 0),
+                                     LinearConstraint(count, 0, n_sites)], m, m + pairs + n)
+
+    selected = np.flatnonzero(result.x[:m] > 0.5)
+    return LocationResult(selected, float(result.fun), None)
@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import demand
+import mcda
+from criteria import criteria_weights
+from coordinates import to_geographic, to_metric
+from spatial_index import InfrastructureIndex, LayerIndex
+from storage import BOUNDARY_LAYER, find_layer, read_layer
+from study_area import GEOGRAPHIC_CRS, METRIC_CRS, lahore_center, tehsil_coordinates
+
+# Regular hexagon/square candidate grid over the district boundary. Cells are
+# kept as plain columns (centre coordinates + criteria) in a DataFrame, with
+# polygons only built on demand, so a 100 m grid of the whole district stays
+# a few tens of MB.
+
+CELL_SHAPES = ('hex', 'square')
+
+# Criterion -> (cell column, direction); the first column that exists is used
+cell_criteria_columns = {
+    'population_density': [('Population_Density', mcda.BENEFIT)],
+    'growth_rate': [('Annual_Growth_Rate', mcda.BENEFIT)],
+    'accessibility': [('Road_Distance_M', mcda.COST), ('Center_Distance_M', mcda.COST)],
+    'economic_activity': [('Economic_Activity', mcda.BENEFIT), ('POIs_Within_1Km', mcda.BENEFIT)],
+    'infrastructure': [('Population_Density', mcda.BENEFIT)]
+}
+
+
+def _boundary_geometry(boundary):
+    """Single boundary polygon in the metric CRS"""
+    import geopandas as gpd
+
+    if not isinstance(boundary, (gpd.GeoDataFrame, gpd.GeoSeries)):
+        boundary = gpd.GeoSeries([boundary], crs=GEOGRAPHIC_CRS)
+    return boundary.to_crs(METRIC_CRS).union_all()
+
+
+def make_grid(boundary, cell_size=500, shape='hex', rows_per_chunk=512):
+    """Tessellate the boundary into cells of ``cell_size`` metres
+
+    ``cell_size`` is the centre-to-centre spacing. Rows of candidate centres
+    are generated and clipped to the polygon a band at a time, so the full
+    bounding-box lattice is never held in memory.
+    """
+    import shapely
+
+    if shape not in CELL_SHAPES:
+        raise ValueError(f"Unknown cell shape: {shape!r}")
+
+    polygon = _boundary_geometry(boundary)
+    shapely.prepare(polygon)
+    minx, miny, maxx, maxy = polygon.bounds
+
+    if shape == 'hex':
+        # Pointy-top hexagons: rows sqrt(3)/2 apart, odd rows shifted by half
+        dy = cell_size * np.sqrt(3) / 2
+        area = cell_size ** 2 * np.sqrt(3) / 2
+    else:
+        dy = cell_size
+        area = cell_size ** 2
+
+    xs = np.arange(minx + cell_size / 2, maxx + cell_size, cell_size)
+    ys = np.arange(miny + dy / 2, maxy + dy, dy)
+
+    chunks_x, chunks_y = [], []
+    for start in range(0, len(ys), rows_per_chunk):
+        rows = np.arange(start, min(start + rows_per_chunk, len(ys)))
+        x = xs[None, :] + (cell_size / 2 if shape == 'hex' else 0) * (rows[:, None] % 2)
+        y = np.broadcast_to(ys[rows][:, None], x.shape)
+        x, y = x.ravel(), y.ravel()
+        inside = shapely.contains_xy(polygon, x, y)
+        chunks_x.append(x[inside])
+        chunks_y.append(y[inside])
+
+    x = np.concatenate(chunks_x)
+    y = np.concatenate(chunks_y)
+    lon, lat = to_geographic(x, y)
+
+    cells = pd.DataFrame({'x': x, 'y': y, 'lon': lon, 'lat': lat})
+    cells.attrs.update({'cell_size': cell_size, 'shape': shape, 'crs': METRIC_CRS, 'cell_area': area})
+    return cells
+
+
+def cell_polygons(cells):
+    """Cell outlines as a GeoSeries in the metric CRS (built on demand)"""
+    import geopandas as gpd
+    import shapely
+
+    size = cells.attrs['cell_size']
+    x = cells['x'].to_numpy()[:, None]
+    y = cells['y'].to_numpy()[:, None]
+    if cells.attrs['shape'] == 'hex':
+        # Circumradius of a hexagon with flat-to-flat width = cell_size
+        radius = size / np.sqrt(3)
+        angles = np.radians(np.arange(30, 390, 60))
+        coords = np.stack([x + radius * np.cos(angles), y + radius * np.sin(angles)], axis=-1)
+        geometry = shapely.polygons(coords)
+    else:
+        half = size / 2
+        geometry = shapely.box(x[:, 0] - half, y[:, 0] - half, x[:, 0] + half, y[:, 0] + half)
+    return gpd.GeoSeries(geometry, index=cells.index, crs=cells.attrs['crs'])
+
+
+class CellLocator:
+    """Index of the cell containing each point, from the lattice arithmetic
+
+    Much faster than a nearest-neighbour query for dense inputs such as
+    raster pixels. Points outside the grid (or in cells clipped away by the
+    boundary) get -1.
+    """
+
+    def __init__(self, cells):
+        self.size = cells.attrs['cell_size']
+        self.hex = cells.attrs['shape'] == 'hex'
+        self.dy = self.size * np.sqrt(3) / 2 if self.hex else self.size
+        x, y = cells['x'].to_numpy(), cells['y'].to_numpy()
+
+        self.y0 = y.min()
+        rows = np.rint((y - self.y0) / self.dy).astype(np.int64)
+        self.x0 = x[rows == 0].min()
+        # Adjacent rows of a hex grid are offset by half a cell
+        self.odd_shift = self.size / 2 if self.hex else 0.0
+        cols = np.rint((x - self.x0 - self.odd_shift * (rows % 2)) / self.size).astype(np.int64)
+        self.col0 = cols.min()
+
+        self.table = np.full((rows.max() + 1, cols.max() - self.col0 + 1), -1, dtype=np.int64)
+        self.table[rows, cols - self.col0] = np.arange(len(cells))
+
+    def _in_row(self, x, y, rows):
+        """Nearest lattice point within the given rows: cell index and distance"""
+        shift = self.odd_shift * (rows % 2)
+        cols = np.rint((x - self.x0 - shift) / self.size).astype(np.int64)
+        distance = np.hypot(x - (self.x0 + shift + cols * self.size), y - (self.y0 + rows * self.dy))
+        cols -= self.col0
+        valid = (rows >= 0) & (rows < self.table.shape[0]) & (cols >= 0) & (cols < self.table.shape[1])
+        index = np.full(len(x), -1, dtype=np.int64)
+        index[valid] = self.table[rows[valid], cols[valid]]
+        return index, distance
+
+    def __call__(self, x, y):
+        x, y = np.asarray(x, dtype=float).ravel(), np.asarray(y, dtype=float).ravel()
+        if not self.hex:
+            return self._in_row(x, y, np.rint((y - self.y0) / self.dy).astype(np.int64))[0]
+        # The containing hexagon's centre is in the row just below or just above
+        below = np.floor((y - self.y0) / self.dy).astype(np.int64)
+        lower, lower_distance = self._in_row(x, y, below)
+        upper, upper_distance = self._in_row(x, y, below + 1)
+        return np.where(upper_distance < lower_distance, upper, lower)
+
+
+def cell_criteria(cells, tehsils, infrastructure=None, radius_m=1000):
+    """Add per-cell criterion columns computed in bulk
+
+    ``tehsils`` needs Tehsil, Lat, Lon, Population_Density and
+    Annual_Growth_Rate columns; each cell takes the attributes of its nearest
+    tehsil centre. POI (including the demand.py economic activity density)
+    and road columns are added when ``infrastructure`` (a
+    spatial_index.InfrastructureIndex) has those layers.
+    """
+    import geopandas as gpd
+
+    cells = cells.copy()
+    x, y = cells['x'].to_numpy(), cells['y'].to_numpy()
+
+    tehsil_x, tehsil_y = to_metric(tehsils['Lon'], tehsils['Lat'])
+    tehsil_index = LayerIndex(gpd.GeoSeries(gpd.points_from_xy(tehsil_x, tehsil_y)), name='tehsils')
+    _, nearest = tehsil_index.nearest(x, y)
+    cells['Tehsil'] = pd.Categorical.from_codes(nearest, categories=list(tehsils['Tehsil']))
+    for column in ['Population_Density', 'Annual_Growth_Rate']:
+        cells[column] = tehsils[column].to_numpy()[nearest]
+
+    center_x, center_y = to_metric(lahore_center[1], lahore_center[0])
+    cells['Center_Distance_M'] = np.hypot(x - center_x, y - center_y)
+
+    pois = infrastructure.pois() if infrastructure else None
+    if pois:
+        cells['Nearest_POI_M'] = pois.nearest(x, y)[0]
+        cells[f'POIs_Within_{radius_m / 1000:g}Km'] = pois.count_within(x, y, radius_m)
+        cells['Economic_Activity'] = demand.economic_activity(pois, x, y)
+
+    roads = infrastructure.roads() if infrastructure else None
+    if roads:
+        cells['Road_Distance_M'] = roads.nearest(x, y)[0]
+
+    return cells
+
+
+def suitability(cells, weights=criteria_weights):
+    """Composite suitability score and rank for every cell
+
+    Criteria whose columns are missing are dropped and the remaining weights
+    re-normalized.
+    """
+    names, columns, directions = [], [], []
+    for name in weights:
+        for column, direction in cell_criteria_columns[name]:
+            if column in cells:
+                names.append(name)
+                columns.append(column)
+                directions.append(direction)
+                break
+
+    result = mcda.score(cells[columns].to_numpy(dtype=float),
+                        mcda.weight_vector(weights, names), directions=directions)
+    cells = cells.copy()
+    cells['composite_score'] = result.composite.astype(np.float32)
+    cells['priority_rank'] = result.ranks
+    return cells
+
+
+def save_grid(cells, filepath):
+    """Write the cell table as compressed columns plus JSON metadata"""
+    arrays = {}
+    for column in cells.columns:
+        values = cells[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            arrays[column] = values.cat.codes.to_numpy()
+            arrays[f'{column}__categories'] = np.asarray(values.cat.categories, dtype=str)
+        else:
+            arrays[column] = values.to_numpy()
+    meta = {'columns': list(cells.columns), 'attrs': cells.attrs}
+    np.savez_compressed(filepath, __meta__=np.asarray(json.dumps(meta)), **arrays)
+
+
+def load_grid(filepath, columns=None):
+    """Read a cell table written by save_grid, optionally only some columns"""
+    with np.load(filepath, allow_pickle=False) as data:
+        meta = json.loads(str(data['__meta__']))
+        frame = {}
+        for column in columns or meta['columns']:
+            if f'{column}__categories' in data:
+                frame[column] = pd.Categorical.from_codes(data[column], categories=list(data[f'{column}__categories']))
+            else:
+                frame[column] = data[column]
+    cells = pd.DataFrame(frame)
+    cells.attrs.update(meta['attrs'])
+    return cells
+
+
+def main():
+    from study_area import approximate_boundary
+
+    parser = argparse.ArgumentParser(description="Generate a suitability grid over the Lahore boundary")
+    parser.add_argument('--cell-size', type=float, default=500, help="Cell spacing in metres")
+    parser.add_argument('--shape', choices=CELL_SHAPES, default='hex')
+    parser.add_argument('--boundary', default=BOUNDARY_LAYER, help="Boundary layer path without extension")
+    parser.add_argument('--census', default='data/demographics/lahore_census_2023.csv')
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    print("⚡ GENERATING SUITABILITY GRID")
+    print("=" * 60)
+
+    boundary_file = find_layer(args.boundary)
+    if boundary_file:
+        boundary = read_layer(boundary_file)
+    else:
+        print("⚠️ Boundary file not found, using approximate boundary")
+        boundary = approximate_boundary()
+
+    census_df = pd.read_csv(args.census)
+    tehsils = census_df[census_df['Tehsil'].isin(tehsil_coordinates)].reset_index(drop=True)
+    tehsils['Lat'] = [tehsil_coordinates[name][0] for name in tehsils['Tehsil']]
+    tehsils['Lon'] = [tehsil_coordinates[name][1] for name in tehsils['Tehsil']]
+
+    cells = make_grid(boundary, cell_size=args.cell_size, shape=args.shape)
+    print(f"✅ {len(cells):,} {args.shape} cells at {args.cell_size:g} m")
+
+    cells = suitability(cell_criteria(cells, tehsils, InfrastructureIndex()))
+    print(f"✅ Scored cells: mean {cells['composite_score'].mean():.1f}, max {cells['composite_score'].max():.1f}")
+
+    output = args.output or f'data/grid/lahore_grid_{args.shape}_{args.cell_size:g}m.npz'
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    save_grid(cells, output)
+    print(f"✅ Grid saved: {output} ({os.path.getsize(output) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+import atexit
+import csv
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from functools import wraps
+
+# Per-stage instrumentation for the pipeline scripts. A RunLog times named
+# stages (a context manager or decorator) for wall and CPU time, peak RSS
+# and, optionally, peak Python allocations (tracemalloc), with any row or
+# feature counts the stage reports. Each run is written to a JSON file per
+# script and appended to one CSV log; stages can also be profiled with
+# cProfile into one .prof file each. Switches are environment variables so
+# scripts run by pipeline.py need no extra arguments.
+
+LOG_DIR = 'outputs/logs'
+RUN_LOG_CSV = 'run_log.csv'
+PROFILE_DIR = 'profiles'
+
+# '1' profiles every stage, otherwise a comma-separated list of stage names
+PROFILE_ENV = 'EV_PROFILE'
+# '1' records peak traced Python memory per stage (slows allocation-heavy code)
+TRACEMALLOC_ENV = 'EV_TRACEMALLOC'
+# '1' ends the process when its first stage starts; benchmark.py times a
+# command's start-up this way
+STARTUP_PROBE_ENV = 'EV_STARTUP_PROBE'
+
+CSV_COLUMNS = ['run_id', 'script', 'stage', 'parent', 'status', 'started', 'wall_seconds', 'cpu_seconds',
+               'peak_rss_mb', 'rss_delta_mb', 'peak_traced_mb', 'counts', 'profile']
+
+
+def rss_mb():
+    """Peak resident set size of this process; resettable through /proc on Linux"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is kB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    """Resident set size now (falls back to the peak where /proc is missing)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        return rss_mb()
+
+
+def reset_peak_rss():
+    """Start a new peak RSS window (Linux only), True if it worked"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _switch(name):
+    value = os.environ.get(name, '').strip()
+    if value in ('', '0'):
+        return set()
+    return {'*'} if value == '1' else {part.strip() for part in value.split(',')}
+
+
+class Stage:
+    """A running stage; ``count`` records rows/features it processed"""
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.counts = {}
+        # Peaks of finished child stages, whose resets hide them from this one
+        self.child_rss = 0.0
+        self.child_traced = 0.0
+
+    def count(self, **counts):
+        self.counts.update({key: int(value) for key, value in counts.items()})
+        return self
+
+
+class RunLog:
+    """Stage timings of one script run, saved at exit"""
+
+    def __init__(self, script, log_dir=LOG_DIR, profile=None, trace_memory=None, verbose=True):
+        self.script = script
+        self.log_dir = log_dir
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.profile = _switch(PROFILE_ENV) if profile is None else set(profile)
+        self.trace_memory = bool(_switch(TRACEMALLOC_ENV)) if trace_memory is None else trace_memory
+        self.verbose = verbose
+        self.records = []
+        self._stack = []
+        self._profiling = False
+        self._saved = False
+        atexit.register(self.save)
+
+    def _profiled(self, name):
+        return not self._profiling and ('*' in self.profile or name in self.profile)
+
+    def stage(self, name, **counts):
+        """Context manager timing one stage; yields a Stage for row counts"""
+        return _StageContext(self, name, counts)
+
+    def timed(self, name=None):
+        """Decorator running every call of a function as a stage
+
+        A stage given a ``rows`` count uses the length of the result when
+        the function returns something sized.
+        """
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or function.__name__) as stage:
+                    result = function(*args, **kwargs)
+                    if hasattr(result, '__len__'):
+                        stage.count(rows=len(result))
+                    return result
+            return wrapper
+        return decorator
+
+    def save(self):
+        """Write the run as JSON (latest run per script) and append it to the CSV log"""
+        if self._saved or not self.records:
+            return
+        self._saved = True
+        os.makedirs(self.log_dir, exist_ok=True)
+        run = {
+            'run_id': self.run_id, 'script': self.script, 'started': self.started,
+            'argv': sys.argv[1:], 'python': platform.python_version(),
+            'stages': self.records
+        }
+        with open(os.path.join(self.log_dir, f'{self.script}.json'), 'w') as f:
+            json.dump(run, f, indent=2)
+
+        csv_path = os.path.join(self.log_dir, RUN_LOG_CSV)
+        new_file = not os.path.exists(csv_path)
+        with open(csv_path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            for record in self.records:
+                writer.writerow({**record, 'run_id': self.run_id, 'script': self.script,
+                                 'counts': json.dumps(record['counts'])})
+
+
+class _StageContext:
+    def __init__(self, log, name, counts):
+        self.log = log
+        self.stage = Stage(name, log._stack[-1] if log._stack else None).count(**counts)
+
+    def __enter__(self):
+        log, stage = self.log, self.stage
+        if not log.records and not log._stack and _switch(STARTUP_PROBE_ENV):
+            sys.stdout.flush()
+            os._exit(0)
+        if stage.parent is not None:
+            # Resetting the peaks below would lose the parent's peak so far
+            stage.parent.child_rss = max(stage.parent.child_rss, rss_mb())
+            if log.trace_memory:
+                import tracemalloc
+
+                stage.parent.child_traced = max(stage.parent.child_traced, tracemalloc.get_traced_memory()[1])
+        log._stack.append(stage)
+
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.rss_before = current_rss_mb()
+        reset_peak_rss()
+        if log.trace_memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        self.profiler = None
+        if log._profiled(stage.name):
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            log._profiling = True
+            self.profiler.enable()
+        self.wall, self.cpu = time.perf_counter(), time.process_time()
+        return stage
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall, cpu = time.perf_counter() - self.wall, time.process_time() - self.cpu
+        log, stage = self.log, self.stage
+
+        profile = None
+        if self.profiler is not None:
+            self.profiler.disable()
+            log._profiling = False
+            directory = os.path.join(log.log_dir, PROFILE_DIR)
+            os.makedirs(directory, exist_ok=True)
+            profile = os.path.join(directory, f"{log.script}.{stage.name.replace(' ', '_')}.prof")
+            self.profiler.dump_stats(profile)
+
+        peak_rss = max(rss_mb(), stage.child_rss)
+        peak_traced = None
+        if log.trace_memory:
+            import tracemalloc
+
+            peak_traced = max(tracemalloc.get_traced_memory()[1], stage.child_traced) / 1024 ** 2
+        log._stack.pop()
+        if stage.parent is not None:
+            stage.parent.child_rss = max(stage.parent.child_rss, peak_rss)
+            if peak_traced is not None:
+                stage.parent.child_traced = max(stage.parent.child_traced, peak_traced * 1024 ** 2)
+
+        log.records.append({
+            'stage': stage.name,
+            'parent': stage.parent.name if stage.parent is not None else None,
+            'status': 'ok' if exc_type is None else f'error: {exc_type.__name__}',
+            'started': self.started,
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(cpu, 4),
+            'peak_rss_mb': round(peak_rss, 1),
+            'rss_delta_mb': round(current_rss_mb() - self.rss_before, 1),
+            'peak_traced_mb': None if peak_traced is None else round(peak_traced, 1),
+            'counts': stage.counts,
+            'profile': profile
+        })
+        if log.verbose and stage.parent is None:
+            counts = ''.join(f", {value:,} {key}" for key, value in stage.counts.items())
+            print(f"⏱️ {stage.name}: {wall:.2f}s wall, {cpu:.2f}s CPU, peak {peak_rss:,.0f} MB{counts}")
+        return False
@@ -0,0 +1,141 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Multi-criteria decision analysis (MCDA) scoring engine.
+# Works on an N x K criteria matrix (N candidates, K criteria) in one
+# vectorized pass so the same code scores 5 tehsils or a million grid cells.
+
+NORMALIZATION_METHODS = ('minmax', 'zscore', 'rank')
+BENEFIT = 'benefit'  # Higher raw value = better
+COST = 'cost'  # Lower raw value = better
+
+
+# Normalized criteria, composite scores and ranks for one scoring run
+ScoreResult = namedtuple('ScoreResult', ['normalized', 'composite', 'ranks'])
+
+
+def _direction_signs(directions, k):
+    """Return +1 for benefit and -1 for cost criteria as a length-k array"""
+    if directions is None:
+        return np.ones(k)
+    if isinstance(directions, str):
+        directions = [directions] * k
+    if len(directions) != k:
+        raise ValueError(f"Expected {k} directions, got {len(directions)}")
+    signs = []
+    for direction in directions:
+        if direction in (BENEFIT, True, 1):
+            signs.append(1.0)
+        elif direction in (COST, False, -1):
+            signs.append(-1.0)
+        else:
+            raise ValueError(f"Unknown criterion direction: {direction!r}")
+    return np.asarray(signs)
+
+
+def _rank_columns(matrix):
+    """Average ranks (1 = smallest) of every column, NaNs stay NaN"""
+    from scipy.stats import rankdata
+
+    return rankdata(matrix, axis=0, method='average', nan_policy='omit')
+
+
+def normalize(matrix, method='minmax', directions=None, bounds=None):
+    """Normalize each criterion column of an N x K matrix
+
+    minmax and rank scale every column to 0-100 with 100 the best value;
+    zscore returns standard scores with positive values better than average.
+    A constant column carries no information and gets the neutral value
+    (50 for minmax/rank, 0 for zscore) instead of dividing by zero.
+
+    ``bounds`` is a (low, high) pair of per-column raw values used by minmax
+    instead of the column minimum and maximum, so blocks of a larger
+    dataset are scaled the same way.
+    """
+    if method not in NORMALIZATION_METHODS:
+        raise ValueError(f"Unknown normalization method: {method!r}")
+    if bounds is not None and method != 'minmax':
+        raise ValueError("Fixed bounds are only supported for minmax normalization")
+
+    values = np.asarray(matrix, dtype=float)
+    one_dimensional = values.ndim == 1
+    if one_dimensional:
+        values = values[:, None]
+    signs = _direction_signs(directions, values.shape[1])
+
+    # Flip cost criteria so that higher is always better from here on
+    values = values * signs
+
+    if method == 'minmax':
+        if bounds is None:
+            low, high = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+        else:
+            raw_low, raw_high = (np.broadcast_to(np.asarray(bound, dtype=float), signs.shape) for bound in bounds)
+            low = np.where(signs > 0, raw_low, -raw_high)
+            high = np.where(signs > 0, raw_high, -raw_low)
+        span = high - low
+        constant = span == 0
+        result = (values - low) / np.where(constant, 1.0, span) * 100
+        result[:, constant] = 50.0
+    elif method == 'zscore':
+        std = np.nanstd(values, axis=0)
+        constant = std == 0
+        result = (values - np.nanmean(values, axis=0)) / np.where(constant, 1.0, std)
+        result[:, constant] = 0.0
+    else:
+        ranks = _rank_columns(values)
+        span = np.sum(~np.isnan(values), axis=0) - 1.0
+        constant = np.nanmax(values, axis=0) == np.nanmin(values, axis=0)
+        result = (ranks - 1) / np.where(constant, 1.0, span) * 100
+        result[:, constant] = 50.0
+
+    # Keep missing inputs missing rather than letting them look neutral
+    result[np.isnan(values)] = np.nan
+
+    return result[:, 0] if one_dimensional else result
+
+
+def weight_vector(weights, criteria=None):
+    """Return weights as a float array that sums to one
+
+    ``weights`` may be a dict such as ``criteria_weights``; ``criteria`` then
+    fixes the column order of the matrix being scored.
+    """
+    if isinstance(weights, dict):
+        criteria = list(weights) if criteria is None else criteria
+        weights = [weights[name] for name in criteria]
+    vector = np.asarray(weights, dtype=float)
+    if np.any(vector < 0):
+        raise ValueError("Criterion weights must be non-negative")
+    total = vector.sum(axis=-1, keepdims=True)
+    if np.any(total == 0):
+        raise ValueError("Criterion weights must not all be zero")
+    return vector / total
+
+
+def rank_scores(composite):
+    """Rank composite scores (1 = best), ties keep their input order"""
+    composite = np.asarray(composite, dtype=float)
+    # NaN scores sort last
+    order = np.argsort(-np.nan_to_num(composite, nan=-np.inf), kind='stable')
+    ranks = np.empty(len(composite), dtype=np.int64)
+    ranks[order] = np.arange(1, len(composite) + 1)
+    return ranks
+
+
+def score(matrix, weights, directions=None, method='minmax', normalized=None):
+    """Normalize criteria, combine them with weights and rank the rows
+
+    Pass ``normalized`` to skip normalization when the same criteria are
+    scored again with different weights.
+    """
+    if normalized is None:
+        normalized = normalize(matrix, method=method, directions=directions)
+    weights = weight_vector(weights)
+    if weights.shape[-1] != normalized.shape[1]:
+        raise ValueError(
+            f"Got {weights.shape[-1]} weights for {normalized.shape[1]} criteria"
+        )
+    composite = normalized @ weights
+    return ScoreResult(normalized, composite, rank_scores(composite))
@@ -0,0 +1,289 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from coordinates import metric_xy, to_metric
+from spatial_index import LayerIndex
+from storage import BOUNDARY_LAYER, find_layer, read_layer
+from study_area import GEOGRAPHIC_CRS, METRIC_CRS
+
+# Road-network accessibility. The drive graph is stored as CSR adjacency
+# arrays with travel-time weights, and all shortest paths run through
+# scipy.sparse.csgraph (C) in batches of sources instead of one networkx
+# call per site.
+
+NETWORK_FILE = 'data/infrastructure/road_network.npz'
+
+# Drive-time thresholds in minutes
+ISOCHRONE_MINUTES = [5, 10, 15]
+
+# Free-flow speeds (km/h) for edges without a maxspeed tag
+DEFAULT_SPEEDS_KPH = {
+    'motorway': 100, 'trunk': 80, 'primary': 60, 'secondary': 50,
+    'tertiary': 40, 'unclassified': 30, 'residential': 25, 'living_street': 15
+}
+DEFAULT_SPEED_KPH = 30
+
+# Sources per Dijkstra batch, bounds the batch x nodes distance matrix
+SOURCE_CHUNK = 256
+
+
+def _first(value):
+    """OSM tags can hold lists (e.g. ['primary', 'secondary']), take the first"""
+    return value[0] if isinstance(value, list) else value
+
+
+def edge_speeds_kph(edges):
+    """Posted maxspeed where tagged, otherwise a default for the road class"""
+    default = edges['highway'].map(_first).map(DEFAULT_SPEEDS_KPH).fillna(DEFAULT_SPEED_KPH)
+    if 'maxspeed' not in edges.columns:
+        return default.to_numpy(dtype=float)
+    posted = pd.to_numeric(edges['maxspeed'].map(_first).astype(str).str.extract(r'(\d+)')[0], errors='coerce')
+    return posted.where(posted > 0, default).to_numpy(dtype=float)
+
+
+class RoadNetwork:
+    """Directed road graph as CSR arrays with travel times in seconds"""
+
+    def __init__(self, indptr, indices, travel_time, node_ids, x, y):
+        self.indptr = indptr
+        self.indices = indices
+        self.travel_time = travel_time
+        self.node_ids = node_ids
+        self.x = x
+        self.y = y
+        self._matrix = None
+        self._node_index = None
+
+    @classmethod
+    def from_gdfs(cls, nodes, edges):
+        """Build from osmnx node/edge GeoDataFrames (ox.graph_to_gdfs)"""
+        nodes = nodes if 'osmid' in nodes.columns else nodes.rename_axis('osmid').reset_index()
+        edges = edges if 'u' in edges.columns else edges.reset_index()
+
+        if 'travel_time' in edges.columns:
+            seconds = edges['travel_time'].to_numpy(dtype=float)
+        else:
+            seconds = edges['length'].to_numpy(dtype=float) / (edge_speeds_kph(edges) / 3.6)
+        return cls.from_edges(edges['u'].to_numpy(dtype=np.int64), edges['v'].to_numpy(dtype=np.int64), seconds,
+                              nodes['osmid'].to_numpy(dtype=np.int64), nodes['x'], nodes['y'])
+
+    @classmethod
+    def from_edges(cls, u_ids, v_ids, seconds, node_ids, lon, lat):
+        """Build from directed edge arrays (node ids, travel seconds) and node lon/lat"""
+        from scipy.sparse import csr_matrix
+
+        lookup = pd.Index(node_ids)
+        u = lookup.get_indexer(u_ids)
+        v = lookup.get_indexer(v_ids)
+        seconds = np.asarray(seconds, dtype=float)
+
+        # Keep the fastest of parallel edges; csr_matrix would sum duplicates
+        order = np.lexsort((seconds, v, u))
+        u, v, seconds = u[order], v[order], seconds[order]
+        first = np.ones(len(u), dtype=bool)
+        first[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+        u, v, seconds = u[first], v[first], seconds[first]
+        # csgraph treats explicit zeros as missing edges
+        seconds = np.maximum(seconds, 1e-3)
+
+        matrix = csr_matrix((seconds.astype(np.float32), (u, v)), shape=(len(node_ids), len(node_ids)))
+        x, y = to_metric(lon, lat)
+        return cls(matrix.indptr, matrix.indices, matrix.data, np.asarray(node_ids), x, y)
+
+    def save(self, filepath=NETWORK_FILE):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        np.savez(filepath, indptr=self.indptr, indices=self.indices, travel_time=self.travel_time,
+                 node_ids=self.node_ids, x=self.x, y=self.y, crs=np.asarray(METRIC_CRS))
+
+    @classmethod
+    def load(cls, filepath=NETWORK_FILE):
+        with np.load(filepath) as data:
+            return cls(data['indptr'], data['indices'], data['travel_time'],
+                       data['node_ids'], data['x'], data['y'])
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def subgraph(self, keep):
+        """Network of the nodes where ``keep`` is True and the edges between them"""
+        keep = np.asarray(keep, dtype=bool)
+        matrix = self.matrix[keep][:, keep].tocsr()
+        return RoadNetwork(matrix.indptr, matrix.indices, matrix.data,
+                           self.node_ids[keep], self.x[keep], self.y[keep])
+
+    @property
+    def matrix(self):
+        from scipy.sparse import csr_matrix
+
+        if self._matrix is None:
+            self._matrix = csr_matrix((self.travel_time, self.indices, self.indptr), shape=(len(self), len(self)))
+        return self._matrix
+
+    def snap(self, x, y):
+        """Index of the nearest graph node for every point"""
+        if self._node_index is None:
+            import geopandas as gpd
+
+            self._node_index = LayerIndex(gpd.GeoSeries(gpd.points_from_xy(self.x, self.y)), name='nodes')
+        return self._node_index.nearest(x, y)[1]
+
+    def node_totals(self, x, y, weights):
+        """Sum point weights (e.g. cell population) onto their nearest nodes"""
+        return np.bincount(self.snap(x, y), weights=np.asarray(weights, dtype=float), minlength=len(self))
+
+    def travel_times(self, sources, limit=None):
+        """Seconds from each source node to every node, yielded in batches
+
+        Yields (batch_slice, times) with times of shape (batch, nodes);
+        nodes further than limit seconds are inf.
+        """
+        from scipy.sparse.csgraph import dijkstra
+
+        sources = np.asarray(sources)
+        for start in range(0, len(sources), SOURCE_CHUNK):
+            batch = slice(start, min(start + SOURCE_CHUNK, len(sources)))
+            times = dijkstra(self.matrix, directed=True, indices=sources[batch],
+                             limit=np.inf if limit is None else limit)
+            yield batch, np.atleast_2d(times)
+
+    def nearest_source(self, sources, limit=None):
+        """Multi-source Dijkstra: time to and index of the closest source per node
+
+        One csgraph call for all sources; unreachable nodes get inf / -1.
+        """
+        from scipy.sparse.csgraph import dijkstra
+
+        sources = np.asarray(sources)
+        times, _, origin = dijkstra(self.matrix, directed=True, indices=sources, min_only=True,
+                                    return_predecessors=True, limit=np.inf if limit is None else limit)
+        # origin holds node ids of the winning source, map back to positions
+        position = np.full(len(self), -1, dtype=np.int64)
+        position[sources[::-1]] = np.arange(len(sources))[::-1]
+        return times, np.where(origin >= 0, position[np.maximum(origin, 0)], -1)
+
+
+def reachable_totals(network, sources, node_weights, minutes=ISOCHRONE_MINUTES):
+    """Weight (e.g. population) reachable from each source within each time
+
+    Returns a (sources x thresholds) array.
+    """
+    thresholds = np.asarray(minutes, dtype=float) * 60
+    totals = np.zeros((len(sources), len(thresholds)))
+    for batch, times in network.travel_times(sources, limit=thresholds.max()):
+        for j, threshold in enumerate(thresholds):
+            totals[batch, j] = (times <= threshold) @ node_weights
+    return totals
+
+
+def reach_matrix(network, sources, x, y, minutes):
+    """Sparse boolean (sources x points) matrix: point's nearest node within ``minutes``
+
+    Unlike reachable_totals the weights can be applied later, e.g. to
+    populations for many years at once.
+    """
+    from scipy.sparse import csr_matrix, vstack
+
+    nodes = network.snap(x, y)
+    blocks = [csr_matrix(times <= minutes * 60)[:, nodes]
+              for _, times in network.travel_times(sources, limit=minutes * 60)]
+    return vstack(blocks, format='csr') if blocks else csr_matrix((0, len(nodes)), dtype=bool)
+
+
+def isochrones(network, sources, minutes=ISOCHRONE_MINUTES, ratio=0.3):
+    """Drive-time polygons (concave hulls of reachable nodes) per source
+
+    Returns a GeoDataFrame with Source (position in ``sources``), Minutes
+    and geometry in the metric CRS.
+    """
+    import geopandas as gpd
+    import shapely
+
+    thresholds = np.asarray(minutes, dtype=float) * 60
+    records, geometries = [], []
+    for batch, times in network.travel_times(sources, limit=thresholds.max()):
+        for threshold, minute in zip(thresholds, minutes):
+            site, node = np.nonzero(times <= threshold)
+            present, site = np.unique(site, return_inverse=True)
+            points = shapely.multipoints(np.column_stack([network.x[node], network.y[node]]), indices=site)
+            hulls = shapely.concave_hull(points, ratio=ratio)
+            records.append(pd.DataFrame({'Source': present + batch.start, 'Minutes': minute}))
+            geometries.append(hulls)
+    if not records:
+        return gpd.GeoDataFrame({'Source': [], 'Minutes': []}, geometry=[], crs=METRIC_CRS)
+    frame = pd.concat(records, ignore_index=True)
+    return gpd.GeoDataFrame(frame, geometry=np.concatenate(geometries), crs=METRIC_CRS)
+
+
+def site_accessibility(network, sites_df, cells, minutes=ISOCHRONE_MINUTES):
+    """Population reachable within each drive time for every site
+
+    ``cells`` needs metric x/y and a Population column (see grid.py).
+    """
+    site_x, site_y = metric_xy(sites_df)
+    sources = network.snap(site_x, site_y)
+    population = network.node_totals(cells['x'], cells['y'], cells['Population'])
+    totals = reachable_totals(network, sources, population, minutes)
+    return pd.DataFrame(totals, index=sites_df.index, columns=[f'Population_{m}Min' for m in minutes])
+
+
+def main():
+    import grid
+    from dasymetric import cell_population
+    from spatial_index import InfrastructureIndex
+    from study_area import approximate_boundary, tehsil_coordinates
+
+    parser = argparse.ArgumentParser(description="Drive-time accessibility of candidate sites")
+    parser.add_argument('--network', default=NETWORK_FILE)
+    parser.add_argument('--sites', default='outputs/analysis/site_recommendations.csv')
+    parser.add_argument('--census', default='data/demographics/lahore_census_2023.csv')
+    parser.add_argument('--boundary', default=BOUNDARY_LAYER, help="Boundary layer path without extension")
+    parser.add_argument('--cell-size', type=float, default=250)
+    parser.add_argument('--isochrones', default='outputs/analysis/site_isochrones.geojson')
+    parser.add_argument('--output', default='outputs/analysis/site_accessibility.csv')
+    args = parser.parse_args()
+
+    print("⚡ ROAD NETWORK ACCESSIBILITY")
+    print("=" * 60)
+
+    if not os.path.exists(args.network):
+        print(f"❌ Road network not found: {args.network} (run download_osm_data.py)")
+        return
+
+    network = RoadNetwork.load(args.network)
+    print(f"✅ Road network: {len(network):,} nodes, {len(network.indices):,} edges")
+
+    boundary_file = find_layer(args.boundary)
+    boundary = read_layer(boundary_file) if boundary_file else approximate_boundary()
+    census_df = pd.read_csv(args.census)
+    tehsils = census_df[census_df['Tehsil'].isin(tehsil_coordinates)].reset_index(drop=True)
+    tehsils['Lat'] = [tehsil_coordinates[name][0] for name in tehsils['Tehsil']]
+    tehsils['Lon'] = [tehsil_coordinates[name][1] for name in tehsils['Tehsil']]
+    cells = grid.cell_criteria(grid.make_grid(boundary, cell_size=args.cell_size), tehsils)
+    roads = InfrastructureIndex().roads()
+    cells['Population'] = cell_population(cells, tehsils, roads.geometry.values if roads else None)
+
+    sites_df = pd.read_csv(args.sites)
+    accessibility = site_accessibility(network, sites_df, cells)
+    result = pd.concat([sites_df[['Site_Name', 'Tehsil']], accessibility], axis=1)
+
+    print("🚗 POPULATION WITHIN DRIVE TIME:")
+    for _, row in result.iterrows():
+        reach = ' | '.join(f"{m} min: {row[f'Population_{m}Min']:,.0f}" for m in ISOCHRONE_MINUTES)
+        print(f"   {row['Site_Name']}: {reach}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    result.to_csv(args.output, index=False)
+    print(f"✅ Accessibility saved: {args.output}")
+
+    site_x, site_y = metric_xy(sites_df)
+    polygons = isochrones(network, network.snap(site_x, site_y))
+    polygons['Site_Name'] = sites_df['Site_Name'].to_numpy()[polygons['Source'].to_numpy()]
+    polygons.to_crs(GEOGRAPHIC_CRS).to_file(args.isochrones, driver='GeoJSON')
+    print(f"✅ Isochrones saved: {args.isochrones}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+# Local on-disk cache for OSM graph downloads. Entries are keyed by the query
+# parameters plus the osmnx/pandas/geopandas/shapely versions and hold the
+# graph's node and edge GeoDataFrames as a binary pickle (columnar arrays,
+# geometries as WKB, far faster to load than a pickled networkx graph or
+# GraphML) with a SHA-256 content hash. Entries expire after a TTL. Offline mode (EV_OSM_OFFLINE=1)
+# never touches the network and replays whatever is cached, stale or not.
+
+CACHE_DIR = 'data/cache/osm'
+DEFAULT_TTL_DAYS = 30
+OFFLINE_ENV = 'EV_OSM_OFFLINE'
+
+# Packages whose versions key an entry: osmnx builds the graph, the others
+# pickle and unpickle its GeoDataFrames
+KEY_PACKAGES = ['osmnx', 'pandas', 'geopandas', 'shapely']
+
+
+class CacheMiss(LookupError):
+    """Raised in offline mode when a query has no cached graph"""
+
+
+def package_version(name):
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def package_versions():
+    return {name: package_version(name) for name in KEY_PACKAGES}
+
+
+def cache_key(query):
+    """Stable hash of the query parameters and the KEY_PACKAGES versions"""
+    key = dict(query, versions=package_versions())
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class OSMCache:
+    """Graph cache directory: one <key>.pickle + <key>.json pair per query
+
+    Cached values are (nodes, edges) tuples as returned by ox.graph_to_gdfs.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl_days=DEFAULT_TTL_DAYS, offline=None):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = None if ttl_days is None else ttl_days * 86400
+        if offline is None:
+            offline = os.environ.get(OFFLINE_ENV, '').lower() in ('1', 'true', 'yes')
+        self.offline = offline
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.pickle', base + '.json'
+
+    def entries(self):
+        """Metadata of every cached graph"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for filename in sorted(os.listdir(self.cache_dir)):
+            if filename.endswith('.json'):
+                with open(os.path.join(self.cache_dir, filename)) as f:
+                    entries.append(json.load(f))
+        return entries
+
+    def is_stale(self, meta):
+        return self.ttl_seconds is not None and time.time() - meta['created'] > self.ttl_seconds
+
+    def get(self, query):
+        """Cached (nodes, edges) for the query, or None if missing, stale or corrupt"""
+        graph_path, meta_path = self._paths(cache_key(query))
+        if not (os.path.exists(graph_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if self.is_stale(meta) and not self.offline:
+            return None
+        if _sha256(graph_path) != meta['sha256']:
+            print(f"⚠️ Cached graph {os.path.basename(graph_path)} failed its content hash, ignoring it")
+            return None
+        try:
+            with open(graph_path, 'rb') as f:
+                return pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError) as error:
+            print(f"⚠️ Cached graph {os.path.basename(graph_path)} could not be loaded ({error}), ignoring it")
+            return None
+
+    def put(self, query, gdfs):
+        """Store (nodes, edges) for the query, replacing any previous entry"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        key = cache_key(query)
+        graph_path, meta_path = self._paths(key)
+        # Write then rename so an interrupted run never leaves a partial entry
+        with open(graph_path + '.tmp', 'wb') as f:
+            pickle.dump(tuple(gdfs), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(graph_path + '.tmp', graph_path)
+        meta = {
+            'key': key,
+            'query': query,
+            'osmnx_version': package_version('osmnx'),
+            'versions': package_versions(),
+            'created': time.time(),
+            'sha256': _sha256(graph_path),
+            'bytes': os.path.getsize(graph_path)
+        }
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f, indent=2, default=str)
+        return meta
+
+    def invalidate(self, query=None):
+        """Drop one query's entry, or the whole cache when query is None"""
+        if query is None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            return
+        for filepath in self._paths(cache_key(query)):
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    def prune(self):
+        """Remove entries older than the TTL, returns how many were removed"""
+        removed = 0
+        for meta in self.entries():
+            if self.is_stale(meta):
+                for filepath in self._paths(meta['key']):
+                    if os.path.exists(filepath):
+                        os.remove(filepath)
+                removed += 1
+        return removed
+
+    def graph_gdfs_from_place(self, place, **kwargs):
+        """ox.graph_to_gdfs(ox.graph_from_place(...)) through the cache"""
+        query = dict(kwargs, place=place)
+        gdfs = self.get(query)
+        if gdfs is not None:
+            return gdfs
+        if self.offline:
+            raise CacheMiss(f"No cached graph for {query} and offline mode is on")
+
+        import osmnx as ox
+
+        gdfs = ox.graph_to_gdfs(ox.graph_from_place(place, **kwargs))
+        self.put(query, gdfs)
+        return gdfs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local OSM download cache")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--ttl-days', type=float, default=DEFAULT_TTL_DAYS)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="Show cached graphs")
+    commands.add_parser('prune', help="Remove entries older than the TTL")
+    commands.add_parser('clear', help="Remove every cached graph")
+    fixture = commands.add_parser('import', help="Store a local graph file (GraphML) as a cached query")
+    fixture.add_argument('graphml')
+    fixture.add_argument('--place', default='Lahore, Pakistan')
+    fixture.add_argument('--network-type', default='drive')
+    fixture.add_argument('--no-truncate-by-edge', dest='truncate_by_edge', action='store_false')
+    args = parser.parse_args()
+
+    cache = OSMCache(args.cache_dir, ttl_days=args.ttl_days)
+
+    if args.command == 'list':
+        for meta in cache.entries():
+            age_days = (time.time() - meta['created']) / 86400
+            status = 'stale' if cache.is_stale(meta) else 'fresh'
+            print(f"{meta['key']}  {meta['query']}  osmnx {meta['osmnx_version']}  "
+                  f"{meta['bytes'] / 1024 / 1024:.1f} MB  {age_days:.1f} days ({status})")
+    elif args.command == 'prune':
+        print(f"✅ Removed {cache.prune()} stale entries")
+    elif args.command == 'clear':
+        cache.invalidate()
+        print("✅ OSM cache cleared")
+    else:
+        import osmnx as ox
+
+        query = {'place': args.place, 'network_type': args.network_type,
+                 'truncate_by_edge': args.truncate_by_edge}
+        meta = cache.put(query, ox.graph_to_gdfs(ox.load_graphml(args.graphml)))
+        print(f"✅ Imported {args.graphml} as {meta['key']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from network import NETWORK_FILE, RoadNetwork, edge_speeds_kph
+from storage import BOUNDARY_LAYER, INFRASTRUCTURE_DIR, READ_ORDER, LayerWriter, find_layer, layer_info, remove_layer
+
+# Offline ingestion from a local OpenStreetMap extract (.osm.pbf, e.g. the
+# Geofabrik Pakistan file) instead of Overpass/Nominatim. One streaming pass
+# through pyosmium keeps only objects with the tags below (the tag filter
+# runs in C++), clips them to the study area and writes POIs and roads to
+# columnar layers in fixed-size batches, so memory stays flat however large
+# the extract is. Drive-network edges are spilled to disk in the same
+# batches and read back once at the end to build the CSR road network
+# (network.py); that last step, and the node location store below, grow
+# with the roads kept, so clip to the study area for a bounded graph.
+
+EXTRACT_DIR = 'data/osm'
+# Path of an extract to use instead of the newest one in EXTRACT_DIR
+EXTRACT_ENV = 'EV_OSM_EXTRACT'
+
+# Features buffered per layer before a batch is written
+BATCH_SIZE = 50_000
+
+# Node location store for way geometries: 'flex_mem' suits city and country
+# extracts, 'sparse_file_array,<path>' keeps it on disk for continents
+LOCATION_INDEX = 'flex_mem'
+
+# (key, value) -> POI layer; layers named like spatial_index.POI_CATEGORIES
+# feed the demand model, existing chargers are kept apart as competition
+poi_tags = {
+    ('shop', 'mall'): 'commercial',
+    ('amenity', 'marketplace'): 'commercial',
+    ('amenity', 'university'): 'education',
+    ('amenity', 'hospital'): 'healthcare',
+    ('amenity', 'fuel'): 'transport',
+    ('amenity', 'parking'): 'transport',
+    ('amenity', 'bus_station'): 'transport',
+    ('amenity', 'charging_station'): 'charging_stations'
+}
+
+# Road classes written to major_roads, as download_osm_data.py keeps from the osmnx graph
+MAJOR_HIGHWAYS = ['motorway', 'trunk', 'primary', 'secondary']
+# Road classes of the drive network and the lahore_roads layer
+DRIVE_HIGHWAYS = ['motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'unclassified', 'residential',
+                  'living_street', 'motorway_link', 'trunk_link', 'primary_link', 'secondary_link', 'tertiary_link']
+
+ONEWAY_FORWARD = {'yes', 'true', '1'}
+
+POI_FIELDS = ['name', 'type', 'osm_id', 'osm_type', 'lat', 'lon']
+ROAD_FIELDS = ['highway', 'name', 'osm_id']
+
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def find_extract(extract_dir=EXTRACT_DIR):
+    """Extract to ingest: $EV_OSM_EXTRACT, else the newest .osm.pbf in extract_dir, else None"""
+    if os.environ.get(EXTRACT_ENV):
+        return os.environ[EXTRACT_ENV]
+    extracts = glob.glob(os.path.join(extract_dir, '*.osm.pbf'))
+    return max(extracts, key=os.path.getmtime) if extracts else None
+
+
+def study_area_bbox():
+    """Boundary bbox from the layer metadata, None if there is no boundary yet"""
+    filepath = find_layer(BOUNDARY_LAYER)
+    return layer_info(filepath)['bbox'] if filepath else None
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+class _BatchedLayer:
+    """Row buffer for one output layer, flushed to a LayerWriter every batch_size rows"""
+
+    def __init__(self, base, fields, geometry_type, fmt, batch_size):
+        import pyarrow as pa
+
+        self.base = base
+        self.types = {field: pa.float64() if field in ('lat', 'lon') else
+                      pa.int64() if field == 'osm_id' else pa.string() for field in fields}
+        self.geometry_type = geometry_type
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.rows = {field: [] for field in fields}
+        self.coords = []
+        self.writer = None
+
+    def add(self, coords, **values):
+        for field, column in self.rows.items():
+            column.append(values.get(field))
+        self.coords.append(coords)
+        if len(self.coords) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        import shapely
+
+        if not self.coords:
+            return
+        if self.writer is None:
+            self.writer = LayerWriter(self.base, self.types, self.geometry_type, fmt=self.fmt)
+        if self.geometry_type == 'Point':
+            xy = np.asarray(self.coords)
+            geometries = shapely.points(xy[:, 0], xy[:, 1])
+        else:
+            lengths = [len(coords) for coords in self.coords]
+            indices = np.repeat(np.arange(len(lengths)), lengths)
+            geometries = shapely.linestrings(np.concatenate(self.coords), indices=indices)
+        self.writer.write(self.rows, geometries)
+        self.rows = {field: [] for field in self.rows}
+        self.coords = []
+
+    def close(self):
+        """Write the last batch and finish the file, returns the feature count
+
+        A layer without features is removed, so no layer from an earlier
+        ingest is left behind as current data.
+        """
+        self.flush()
+        if self.writer is None:
+            for fmt in READ_ORDER:
+                remove_layer(self.base, fmt)
+            return 0
+        self.writer.close()
+        return self.writer.count
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.abort()
+
+
+class _DriveEdges:
+    """Directed drive-network edges collected way by way, spilled to disk per batch
+
+    Every flushed batch is saved as an .npz of edge node ids and travel
+    seconds plus its nodes' lon/lat in a temporary directory, so the stream
+    only holds the ways of one batch; network() reads the batches back to
+    build the CSR graph.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, spill_dir=None):
+        import tempfile
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.batch_size = batch_size
+        self._dir = tempfile.TemporaryDirectory(prefix='osm_edges_', dir=spill_dir or None)
+        self.batches = []
+        self._pending = []
+
+    def add(self, node_ids, coords, highway, maxspeed, oneway):
+        self._pending.append((node_ids, coords, highway, maxspeed, oneway))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        node_ids = np.concatenate([ids for ids, _, _, _, _ in self._pending])
+        coords = np.concatenate([coords for _, coords, _, _, _ in self._pending])
+        lengths = np.array([len(ids) for ids, _, _, _, _ in self._pending])
+        ways = pd.DataFrame([(highway, maxspeed) for _, _, highway, maxspeed, _ in self._pending],
+                            columns=['highway', 'maxspeed'])
+        # Segments join consecutive nodes of the same way
+        ends = np.cumsum(lengths)
+        segment = np.ones(len(node_ids), dtype=bool)
+        segment[ends - 1] = False
+        start = np.flatnonzero(segment)
+        speed = np.repeat(edge_speeds_kph(ways), lengths)[start]
+        oneway = np.repeat([oneway for _, _, _, _, oneway in self._pending], lengths)[start]
+        seconds = haversine_m(coords[start, 0], coords[start, 1], coords[start + 1, 0], coords[start + 1, 1]) / (
+            speed / 3.6)
+
+        forward, backward = oneway >= 0, oneway <= 0
+        nodes, first = np.unique(node_ids, return_index=True)
+        filepath = os.path.join(self._dir.name, f'{len(self.batches):06d}.npz')
+        np.savez(filepath,
+                 u=np.concatenate([node_ids[start][forward], node_ids[start + 1][backward]]),
+                 v=np.concatenate([node_ids[start + 1][forward], node_ids[start][backward]]),
+                 seconds=np.concatenate([seconds[forward], seconds[backward]]),
+                 node_ids=nodes, lon=coords[first, 0], lat=coords[first, 1])
+        self.batches.append(filepath)
+        self._pending = []
+
+    def network(self):
+        """RoadNetwork of every collected edge, None if there are none
+
+        Holds the edges of the whole (clipped) graph while the CSR arrays are
+        built, so this is the one step whose memory grows with the road network.
+        """
+        self.flush()
+        if not self.batches:
+            return None
+        parts = {key: [] for key in ('u', 'v', 'seconds', 'node_ids', 'lon', 'lat')}
+        for filepath in self.batches:
+            with np.load(filepath) as batch:
+                for key, values in parts.items():
+                    values.append(batch[key])
+        arrays = {key: np.concatenate(values) for key, values in parts.items()}
+        node_ids, first = np.unique(arrays['node_ids'], return_index=True)
+        return RoadNetwork.from_edges(arrays['u'], arrays['v'], arrays['seconds'],
+                                      node_ids, arrays['lon'][first], arrays['lat'][first])
+
+    def close(self):
+        """Delete the spilled batches"""
+        self._dir.cleanup()
+
+
+def _tag_filter():
+    import osmium
+
+    return osmium.filter.TagFilter(*poi_tags, *[('highway', highway) for highway in DRIVE_HIGHWAYS])
+
+
+def _way_nodes(way):
+    """Node ids and lon/lat of a way, skipping nodes missing from a clipped extract"""
+    ids, coords = [], []
+    for node in way.nodes:
+        if node.location.valid():
+            ids.append(node.ref)
+            coords.append((node.location.lon, node.location.lat))
+    return np.array(ids, dtype=np.int64), np.array(coords, dtype=float).reshape(-1, 2)
+
+
+def ingest(filepath, bbox=None, infrastructure_dir=INFRASTRUCTURE_DIR, network_file=NETWORK_FILE,
+           batch_size=BATCH_SIZE, network=True):
+    """Stream an extract into POI layers, road layers and the road network
+
+    ``bbox`` (minx, miny, maxx, maxy in lon/lat) keeps POIs inside it and
+    ways with at least one node inside it. Returns feature counts per layer.
+    """
+    import osmium
+
+    poi_layers = {layer: _BatchedLayer(os.path.join(infrastructure_dir, layer), POI_FIELDS, 'Point',
+                                       'parquet', batch_size)
+                  for layer in dict.fromkeys(poi_tags.values())}
+    # Road layers are Feather so the spatial index can memory-map them
+    road_layers = {name: _BatchedLayer(os.path.join(infrastructure_dir, name), ROAD_FIELDS, 'LineString',
+                                       'feather', batch_size)
+                   for name in ['major_roads', 'lahore_roads']}
+    edges = _DriveEdges(batch_size, spill_dir=os.path.dirname(network_file)) if network else None
+    minx, miny, maxx, maxy = bbox if bbox is not None else (-180, -90, 180, 90)
+
+    def inside(lon, lat):
+        return (minx <= lon) & (lon <= maxx) & (miny <= lat) & (lat <= maxy)
+
+    processor = (osmium.FileProcessor(filepath, osmium.osm.NODE | osmium.osm.WAY)
+                 .with_locations(LOCATION_INDEX).with_filter(_tag_filter()))
+    layers = [*poi_layers.values(), *road_layers.values()]
+    try:
+        for obj in processor:
+            tags = obj.tags
+            poi = next(((key, value, layer) for (key, value), layer in poi_tags.items()
+                        if tags.get(key) == value), None)
+
+            if obj.is_node():
+                if poi and obj.location.valid() and inside(obj.location.lon, obj.location.lat):
+                    poi_layers[poi[2]].add((obj.location.lon, obj.location.lat), name=tags.get('name'), type=poi[1],
+                                           osm_id=obj.id, osm_type='node',
+                                           lat=obj.location.lat, lon=obj.location.lon)
+                continue
+
+            node_ids, coords = _way_nodes(obj)
+            if len(node_ids) < 2 or not inside(coords[:, 0], coords[:, 1]).any():
+                continue
+            if poi:
+                # Mapped as an area: its vertex mean stands in for the centroid
+                lon, lat = coords[:-1].mean(axis=0) if obj.is_closed() else coords.mean(axis=0)
+                poi_layers[poi[2]].add((lon, lat), name=tags.get('name'), type=poi[1], osm_id=obj.id,
+                                       osm_type='way', lat=lat, lon=lon)
+            highway = tags.get('highway')
+            if highway in DRIVE_HIGHWAYS:
+                values = {'highway': highway, 'name': tags.get('name'), 'osm_id': obj.id}
+                road_layers['lahore_roads'].add(coords, **values)
+                if highway in MAJOR_HIGHWAYS:
+                    road_layers['major_roads'].add(coords, **values)
+                if edges is not None:
+                    oneway = tags.get('oneway', 'yes' if highway == 'motorway' else 'no')
+                    edges.add(node_ids, coords, highway, tags.get('maxspeed'),
+                              1 if oneway in ONEWAY_FORWARD else -1 if oneway == '-1' else 0)
+    except BaseException:
+        for layer in layers:
+            layer.abort()
+        if edges is not None:
+            edges.close()
+        raise
+
+    counts = {os.path.basename(layer.base): layer.close() for layer in layers}
+    if edges is not None:
+        try:
+            road_network = edges.network()
+        finally:
+            edges.close()
+        if road_network is not None:
+            road_network.save(network_file)
+            counts['road_network_nodes'] = len(road_network)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest POIs and roads from a local .osm.pbf extract")
+    parser.add_argument('extract', nargs='?', help=f"Extract path (default: ${EXTRACT_ENV} or newest in {EXTRACT_DIR})")
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('MINX', 'MINY', 'MAXX', 'MAXY'),
+                        help="Clip to this lon/lat box (default: the district boundary's bbox)")
+    parser.add_argument('--no-clip', action='store_true', help="Keep the whole extract")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--no-network', action='store_true', help="Skip building the road network")
+    args = parser.parse_args()
+
+    extract = args.extract or find_extract()
+    if not extract:
+        parser.error(f"No extract given and none found in {EXTRACT_DIR}")
+    bbox = None if args.no_clip else args.bbox or study_area_bbox()
+
+    print(f"🗺️ Reading {extract}" + (f" clipped to {', '.join(f'{v:.3f}' for v in bbox)}" if bbox else ''))
+    start = time.perf_counter()
+    counts = ingest(extract, bbox=bbox, batch_size=args.batch_size, network=not args.no_network)
+    for layer, count in counts.items():
+        print(f"{'✅' if count else '➖'} {layer}: {count:,}")
+    print(f"⏱️ {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from glob import glob
+
+# Single entry point for the project workflow. Each script is a task with
+# declared input and output files; a task reruns only when the hash of its
+# inputs (data files, its own source and every local module it imports) has
+# changed or an output is missing. Independent tasks run in parallel as
+# subprocesses from the project root, so every script sees the same
+# relative data/ and outputs/ paths.
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SCRIPTS_DIR)
+STATE_FILE = 'data/cache/pipeline/state.json'
+LOG_DIR = 'data/cache/pipeline/logs'
+
+
+class Task:
+    """One script run: inputs/outputs are paths or glob patterns under the project root"""
+
+    def __init__(self, name, script, inputs=(), outputs=(), deps=(), args=()):
+        self.name = name
+        self.script = script
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.args = list(args)
+
+    def __repr__(self):
+        return f'Task({self.name!r}, {self.script!r})'
+
+
+TASKS = [
+    Task('census', 'save_census_data.py',
+         outputs=['data/demographics/lahore_census_2023.csv']),
+    # Reruns when the cached OSM graph or a local extract changes (see osm_cache.py, osm_extract.py)
+    Task('download', 'download_osm_data.py',
+         inputs=['data/cache/osm/*.json', 'data/osm/*.osm.pbf'],
+         outputs=['data/boundaries/lahore_boundary.*', 'data/infrastructure/*_sample.*',
+                  'data/quick_data_summary.csv']),
+    Task('grid', 'grid.py',
+         inputs=['data/demographics/lahore_census_2023.csv', 'data/boundaries/lahore_boundary.*',
+                 'data/infrastructure/*'],
+         outputs=['data/grid/lahore_grid_hex_500m.npz'],
+         deps=['census', 'download']),
+    Task('tiles', 'tiles.py',
+         inputs=['data/grid/lahore_grid_hex_500m.npz', 'data/infrastructure/*_roads.*'],
+         outputs=['outputs/tiles/tiles.json'],
+         deps=['grid']),
+    Task('raster', 'raster.py',
+         inputs=['data/demographics/lahore_census_2023.csv', 'data/boundaries/lahore_boundary.*',
+                 'data/infrastructure/*', 'data/satellite/land_cover.*'],
+         outputs=['data/satellite/rasters/suitability.npy', 'outputs/maps/raster_suitability.png'],
+         deps=['census', 'download']),
+    Task('demand', 'demand.py',
+         inputs=['data/demographics/lahore_census_2023.csv', 'data/boundaries/lahore_boundary.*',
+                 'data/infrastructure/*.parquet'],
+         outputs=['data/satellite/rasters/population.npy'],
+         deps=['census', 'download']),
+    Task('maps', 'create_initial_maps.py',
+         inputs=['data/demographics/lahore_census_2023.csv', 'data/boundaries/lahore_boundary.*',
+                 'data/infrastructure/*.parquet', 'outputs/tiles/tiles.json'],
+         outputs=['outputs/maps/lahore_population_density.html',
+                  'outputs/maps/lahore_infrastructure_overview.html',
+                  'outputs/reports/data_summary.md'],
+         deps=['census', 'download', 'tiles']),
+    Task('analyze', 'ev_site_analysis.py',
+         inputs=['data/demographics/lahore_census_2023.csv', 'data/boundaries/lahore_boundary.*',
+                 'data/infrastructure/*', 'outputs/tiles/tiles.json'],
+         outputs=['outputs/analysis/tehsil_analysis.csv', 'outputs/analysis/site_recommendations.csv',
+                  'outputs/maps/ev_site_analysis_branded.html'],
+         deps=['census', 'download', 'tiles']),
+    Task('catchments', 'catchment.py',
+         inputs=['outputs/analysis/site_recommendations.csv', 'data/demographics/lahore_census_2023.csv',
+                 'data/boundaries/lahore_boundary.*', 'data/infrastructure/*'],
+         outputs=['outputs/analysis/site_catchments.csv'],
+         deps=['analyze']),
+    Task('check', 'check_data_quality.py',
+         inputs=['data/demographics/*', 'data/boundaries/*', 'data/infrastructure/*',
+                 'outputs/maps/*.html', 'outputs/reports/data_summary.md', 'outputs/analysis/site_recommendations.csv'],
+         outputs=['outputs/reports/data_quality.json'],
+         deps=['census', 'download', 'maps', 'analyze']),
+]
+
+
+def imported_modules(filepath, scripts_dir=SCRIPTS_DIR):
+    """Modules from scripts_dir that one source file imports directly"""
+    with open(filepath, 'rb') as f:
+        tree = ast.parse(f.read(), filename=filepath)
+    found = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            module = name.split('.')[0] + '.py'
+            if os.path.exists(os.path.join(scripts_dir, module)):
+                found.add(module)
+    return sorted(found)
+
+
+def local_modules(script, scripts_dir=SCRIPTS_DIR, imports=None):
+    """The script plus every module from scripts_dir it imports, transitively
+
+    ``imports`` maps a module file name to its direct local imports (e.g. a
+    ModuleImports); by default every module is parsed.
+    """
+    imports = imports or (lambda filename: imported_modules(os.path.join(scripts_dir, filename), scripts_dir))
+    seen, stack = set(), [script]
+    while stack:
+        filename = stack.pop()
+        if filename not in seen:
+            seen.add(filename)
+            stack.extend(imports(filename))
+    return sorted(seen)
+
+
+class ModuleImports:
+    """Direct local imports per module, parsed again only when the module's hash changes"""
+
+    def __init__(self, file_hash, known=None, scripts_dir=SCRIPTS_DIR):
+        self.file_hash = file_hash
+        self.known = known or {}
+        self.scripts_dir = scripts_dir
+
+    def __call__(self, filename):
+        filepath = os.path.join(self.scripts_dir, filename)
+        digest = self.file_hash(filepath)
+        entry = self.known.get(filename)
+        if entry is None or entry[0] != digest:
+            entry = [digest, imported_modules(filepath, self.scripts_dir)]
+            self.known[filename] = entry
+        return entry[1]
+
+
+class FileHashes:
+    """SHA-256 of files, reused while a file's size and mtime are unchanged"""
+
+    def __init__(self, known=None):
+        self.known = known or {}
+        self.used = {}
+
+    def __call__(self, filepath):
+        stat = os.stat(filepath)
+        entry = self.known.get(filepath)
+        if entry is None or entry[:2] != [stat.st_size, stat.st_mtime_ns]:
+            digest = hashlib.sha256()
+            with open(filepath, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            entry = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+            self.known[filepath] = entry
+        self.used[filepath] = entry
+        return entry[2]
+
+
+def _expand(patterns, root):
+    """Existing files matching the patterns, relative to root and sorted"""
+    found = set()
+    for pattern in patterns:
+        for filepath in glob(os.path.join(root, pattern)):
+            if os.path.isfile(filepath):
+                found.add(os.path.relpath(filepath, root))
+    return sorted(found)
+
+
+def task_digest(task, file_hash, root=PROJECT_DIR, scripts_dir=SCRIPTS_DIR, imports=None):
+    """Hash of everything that determines a task's outputs"""
+    digest = hashlib.sha256(json.dumps({'script': task.script, 'args': task.args}).encode())
+    for module in local_modules(task.script, scripts_dir, imports):
+        digest.update(f'code:{module}:{file_hash(os.path.join(scripts_dir, module))}\n'.encode())
+    for filepath in _expand(task.inputs, root):
+        digest.update(f'input:{filepath}:{file_hash(os.path.join(root, filepath))}\n'.encode())
+    return digest.hexdigest()
+
+
+def outputs_exist(task, root=PROJECT_DIR):
+    return all(glob(os.path.join(root, pattern)) for pattern in task.outputs)
+
+
+def select(tasks, targets=None):
+    """Tasks needed for the targets (all when None), in declaration order"""
+    by_name = {task.name: task for task in tasks}
+    unknown = [name for name in targets or [] if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown task(s): {', '.join(unknown)}")
+    needed, stack = set(), list(targets or by_name)
+    while stack:
+        name = stack.pop()
+        if name not in needed:
+            needed.add(name)
+            stack.extend(by_name[name].deps)
+    return [task for task in tasks if task.name in needed]
+
+
+def _load_state(root):
+    filepath = os.path.join(root, STATE_FILE)
+    if not os.path.exists(filepath):
+        return {'tasks': {}, 'files': {}, 'imports': {}}
+    with open(filepath) as f:
+        return json.load(f)
+
+
+def _save_state(state, root):
+    filepath = os.path.join(root, STATE_FILE)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath + '.tmp', 'w') as f:
+        json.dump(state, f, indent=1)
+    os.replace(filepath + '.tmp', filepath)
+
+
+def _run_task(task, file_hash, imports, recorded, force, root):
+    """Run one task unless it is up to date; returns (status, digest, seconds)"""
+    digest = task_digest(task, file_hash, root, imports=imports)
+    if not force and recorded == digest and outputs_exist(task, root):
+        return 'up to date', digest, 0.0
+
+    log_path = os.path.join(root, LOG_DIR, f'{task.name}.log')
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        process = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, task.script), *task.args],
+                                 cwd=root, stdout=log, stderr=subprocess.STDOUT,
+                                 env=dict(os.environ, PYTHONIOENCODING='utf-8'))
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        return 'failed', None, seconds
+    if not outputs_exist(task, root):
+        return 'missing outputs', None, seconds
+    # Outputs of this task may be inputs of its own digest (e.g. a cache it refreshes)
+    return 'ran', task_digest(task, file_hash, root, imports=imports), seconds
+
+
+def run(tasks=TASKS, targets=None, force=False, jobs=None, root=PROJECT_DIR):
+    """Run the selected tasks in dependency order, independent ones in parallel
+
+    Returns {task name: status}; tasks downstream of a failure are 'blocked'.
+    The state file is only rewritten when a task ran or a hash changed, so
+    a run with everything up to date writes nothing.
+    """
+    selected = select(tasks, targets)
+    names = {task.name for task in selected}
+    state = _load_state(root)
+    saved = json.dumps(state, sort_keys=True)
+    file_hash = FileHashes(dict(state.get('files', {})))
+    imports = ModuleImports(file_hash, dict(state.get('imports', {})))
+    status = {}
+    pending = list(selected)
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        running = {}
+        while pending or running:
+            for task in list(pending):
+                deps = [dep for dep in task.deps if dep in names]
+                if any(status.get(dep) not in (None, 'ran', 'up to date') for dep in deps):
+                    status[task.name] = 'blocked'
+                    pending.remove(task)
+                    print(f"⏭️ {task.name}: skipped, an upstream task failed")
+                elif all(dep in status for dep in deps):
+                    recorded = state['tasks'].get(task.name, {}).get('digest')
+                    running[pool.submit(_run_task, task, file_hash, imports, recorded, force, root)] = task
+                    pending.remove(task)
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                task = running.pop(future)
+                result, digest, seconds = future.result()
+                status[task.name] = result
+                log_path = os.path.join(LOG_DIR, f'{task.name}.log')
+                if result == 'up to date':
+                    print(f"✅ {task.name}: up to date")
+                    continue
+                if digest:
+                    state['tasks'][task.name] = {'digest': digest, 'finished': time.time(), 'seconds': seconds}
+                else:
+                    state['tasks'].pop(task.name, None)
+                if result == 'ran':
+                    print(f"✅ {task.name}: done in {seconds:.1f}s (log: {log_path})")
+                else:
+                    print(f"❌ {task.name}: {result} after {seconds:.1f}s (log: {log_path})")
+                state['files'] = dict(file_hash.known)
+                state['imports'] = dict(imports.known)
+                _save_state(state, root)
+
+    # Only keep hashes of files the tasks still read
+    state['files'] = file_hash.used
+    state['imports'] = {module: entry for module, entry in imports.known.items()
+                        if os.path.join(SCRIPTS_DIR, module) in file_hash.used}
+    if json.dumps(state, sort_keys=True) != saved:
+        _save_state(state, root)
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Lahore EV workflow, skipping up-to-date steps")
+    parser.add_argument('targets', nargs='*', help="Tasks to bring up to date (default: all)")
+    parser.add_argument('--force', action='store_true', help="Rerun tasks even if they are up to date")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="Maximum tasks run at once")
+    parser.add_argument('--list', action='store_true', help="Show tasks and whether they would run")
+    args = parser.parse_args()
+
+    if args.list:
+        state = _load_state(PROJECT_DIR)
+        file_hash = FileHashes(state.get('files'))
+        imports = ModuleImports(file_hash, state.get('imports'))
+        for task in select(TASKS, args.targets):
+            recorded = state['tasks'].get(task.name, {}).get('digest')
+            fresh = recorded == task_digest(task, file_hash, imports=imports) and outputs_exist(task)
+            deps = f" (after {', '.join(task.deps)})" if task.deps else ''
+            print(f"{'✅' if fresh else '🔄'} {task.name}: {task.script}{deps}")
+        return
+
+    start = time.perf_counter()
+    status = run(targets=args.targets or None, force=args.force, jobs=args.jobs)
+    print(f"⏱️ Pipeline finished in {time.perf_counter() - start:.2f}s")
+    if any(result not in ('ran', 'up to date') for result in status.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
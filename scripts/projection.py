@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from catchment import PUBLIC_CHARGING_SHARE, SESSIONS_PER_EV_PER_DAY, SITE_CAPACITY_SESSIONS
+
+# Multi-year demand projection. Populations grow at each tehsil's compound
+# annual rate (per tehsil, or per grid cell with its tehsil's rate), EV
+# ownership follows a logistic adoption curve, and every time step is
+# computed at once as a (times x cells) array: site demand for all years is
+# one sparse product and re-scoring all years is one matrix batch. Rollout
+# phases then follow from when each site's projected demand justifies a
+# station rather than from fixed score thresholds.
+
+BASE_YEAR = 2023
+HORIZON_YEARS = 10
+STEP_YEARS = 0.25  # Quarterly, fine enough for the 6 and 18 month phase ends
+
+# Logistic EV adoption: share of vehicles that are electric
+VEHICLES_PER_1000_RESIDENTS = 100
+ADOPTION_CEILING = 0.3  # Long-run share
+ADOPTION_MIDPOINT = 2032  # Year the share reaches half the ceiling
+ADOPTION_STEEPNESS = 0.45  # Per year; about 0.5% of vehicles in 2023
+
+# A site is worth building once its catchment would keep it half busy (sessions/day)
+VIABLE_SESSIONS_PER_DAY = SITE_CAPACITY_SESSIONS * 0.5
+
+# (years from the base year, phase) by when a site first becomes viable
+ROLLOUT_PHASES = [(0.5, 'Phase 1'), (1.5, 'Phase 2')]
+DEFAULT_PHASE = 'Phase 3'
+
+
+def time_steps(horizon=HORIZON_YEARS, step=STEP_YEARS):
+    """Years since BASE_YEAR at every step up to and including the horizon"""
+    return np.arange(0, horizon + step / 2, step)
+
+
+def growth_rates(tehsils, base_year=BASE_YEAR, previous_year=2017):
+    """Compound annual growth (fraction) of every tehsil
+
+    Implied by the previous census where a Population_2017 column exists,
+    otherwise the published Annual_Growth_Rate (percent).
+    """
+    if f'Population_{previous_year}' in tehsils:
+        ratio = tehsils[f'Population_{base_year}'] / tehsils[f'Population_{previous_year}']
+        return (ratio ** (1 / (base_year - previous_year)) - 1).to_numpy(dtype=float)
+    return tehsils['Annual_Growth_Rate'].to_numpy(dtype=float) / 100
+
+
+def cell_growth_rates(cells, tehsils):
+    """Growth rate of every grid cell, its tehsil's (cells from grid.cell_criteria)"""
+    rates = pd.Series(growth_rates(tehsils), index=tehsils['Tehsil'].to_numpy())
+    return rates.reindex(cells['Tehsil'].cat.categories).fillna(0).to_numpy()[cells['Tehsil'].cat.codes.to_numpy()]
+
+
+def project(values, rates, steps):
+    """Values compounded at their annual rates, a (times x values) array"""
+    values = np.asarray(values, dtype=float)
+    rates = np.broadcast_to(np.asarray(rates, dtype=float), values.shape)
+    return values[None, :] * (1 + rates[None, :]) ** np.asarray(steps, dtype=float)[:, None]
+
+
+def adoption(years, ceiling=ADOPTION_CEILING, midpoint=ADOPTION_MIDPOINT, steepness=ADOPTION_STEEPNESS):
+    """EV share of vehicles in each (possibly fractional) year"""
+    return ceiling / (1 + np.exp(-steepness * (np.asarray(years, dtype=float) - midpoint)))
+
+
+def sessions_per_resident(years, vehicles_per_1000=VEHICLES_PER_1000_RESIDENTS):
+    """Public charging sessions per resident per day in each year"""
+    return (vehicles_per_1000 / 1000 * adoption(years)
+            * SESSIONS_PER_EV_PER_DAY * PUBLIC_CHARGING_SHARE)
+
+
+def site_totals(matrix, values):
+    """Per-site sums of (times x cells) values through a sparse (sites x cells) matrix
+
+    Returns (times x sites); ``matrix`` is e.g. Catchments.membership() or
+    network.reach_matrix().
+    """
+    return np.asarray((matrix.astype(float) @ np.asarray(values, dtype=float).T).T)
+
+
+def first_viable(sessions, steps, threshold=VIABLE_SESSIONS_PER_DAY):
+    """Years until each site's (times x sites) sessions reach the threshold, NaN if never"""
+    viable = np.asarray(sessions) >= threshold
+    first = viable.argmax(axis=0)
+    return np.where(viable.any(axis=0), np.asarray(steps, dtype=float)[first], np.nan)
+
+
+def rollout_phases(years_to_viable, phases=ROLLOUT_PHASES, default=DEFAULT_PHASE):
+    """Phase label for every site from the years until it becomes viable"""
+    years = np.asarray(years_to_viable, dtype=float)
+    # NaN (never viable within the horizon) fails every comparison
+    return np.select([years < end for end, _ in phases], [label for _, label in phases], default)
+
+
+def phase_windows(phases=ROLLOUT_PHASES, default=DEFAULT_PHASE):
+    """Human-readable time window of every phase, e.g. 'Phase 2': '6-18 months'"""
+    windows, start = {}, 0
+    for end, label in phases:
+        windows[label] = f"{start * 12:g}-{end * 12:g} months"
+        start = end
+    windows[default] = f"{start * 12:g}+ months"
+    return windows
+
+
+def projection_table(site_names, steps, population, sessions, scores, ranks, base_year=BASE_YEAR):
+    """Long table (one row per site and time step) of (times x sites) arrays"""
+    steps = np.asarray(steps, dtype=float)
+    n_times, n_sites = np.shape(sessions)
+    return pd.DataFrame({
+        'Year': np.repeat(base_year + steps, n_sites),
+        'Site_Name': np.tile(np.asarray(site_names), n_times),
+        'Catchment_Population': np.ravel(population),
+        'Sessions_Per_Day': np.ravel(sessions),
+        'Site_Score': np.ravel(scores),
+        'Rank': np.ravel(ranks)
+    })
@@ -0,0 +1,466 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import mcda
+from criteria import raster_criteria_weights
+from storage import BOUNDARY_LAYER, find_layer, read_layer
+from study_area import METRIC_CRS, tehsil_coordinates
+
+# Raster mode of the suitability analysis. Every criterion is a float32
+# raster on one north-up grid over the district in the metric CRS, stored as
+# a .npy array that is memory-mapped, with its georeferencing in a JSON
+# sidecar. Criteria and the weighted overlay are computed one block at a
+# time (plus a halo for neighbourhood operations) in a process pool, so
+# memory use depends on the block size rather than the raster size.
+
+RASTER_DIR = 'data/satellite/rasters'
+LAND_COVER_LAYER = 'data/satellite/land_cover'
+SUITABILITY_RASTER = 'suitability'
+DEFAULT_RESOLUTION = 100  # m
+BLOCK_SIZE = 1024  # Pixels per block side
+
+ROAD_DISTANCE_CAP = 2000  # m, anything further counts as equally far
+POI_BANDWIDTH = 500  # m, Gaussian kernel sigma
+
+# ESA WorldCover class -> suitability (0-100) of the land for a charging site
+LAND_COVER_SUITABILITY = {
+    10: 10,  # Tree cover
+    20: 20,  # Shrubland
+    30: 30,  # Grassland
+    40: 20,  # Cropland
+    50: 100,  # Built-up
+    60: 40,  # Bare / sparse vegetation
+    70: 0,  # Snow and ice
+    80: 0,  # Permanent water bodies
+    90: 0,  # Herbaceous wetland
+    95: 0,  # Mangroves
+    100: 0  # Moss and lichen
+}
+
+# Criterion -> (raster name, direction)
+raster_criteria = {
+    'population_density': ('population_density', mcda.BENEFIT),
+    'accessibility': ('road_distance', mcda.COST),
+    'economic_activity': ('poi_density', mcda.BENEFIT),
+    'land_cover': ('land_cover', mcda.BENEFIT)
+}
+
+
+class RasterGrid:
+    """North-up grid of square pixels: top-left corner, pixel size and shape"""
+
+    def __init__(self, x0, y0, resolution, width, height, crs=METRIC_CRS):
+        self.x0 = x0
+        self.y0 = y0
+        self.resolution = resolution
+        self.width = width
+        self.height = height
+        self.crs = crs
+
+    @classmethod
+    def from_bounds(cls, bounds, resolution, crs=METRIC_CRS):
+        """Grid covering (minx, miny, maxx, maxy), corners snapped to the resolution"""
+        minx, miny, maxx, maxy = bounds
+        x0 = float(np.floor(minx / resolution) * resolution)
+        y0 = float(np.ceil(maxy / resolution) * resolution)
+        width = int(np.ceil((maxx - x0) / resolution))
+        height = int(np.ceil((y0 - miny) / resolution))
+        return cls(x0, y0, resolution, width, height, crs)
+
+    @property
+    def shape(self):
+        return (self.height, self.width)
+
+    @property
+    def transform(self):
+        """GDAL-style affine geotransform"""
+        return (self.x0, self.resolution, 0.0, self.y0, 0.0, -self.resolution)
+
+    def blocks(self, block_size=BLOCK_SIZE):
+        """(row0, row1, col0, col1) windows tiling the grid"""
+        return [(row, min(row + block_size, self.height), col, min(col + block_size, self.width))
+                for row in range(0, self.height, block_size)
+                for col in range(0, self.width, block_size)]
+
+    def window_bounds(self, window):
+        """(minx, miny, maxx, maxy) of a window; it may extend past the grid"""
+        row0, row1, col0, col1 = window
+        return (self.x0 + col0 * self.resolution, self.y0 - row1 * self.resolution,
+                self.x0 + col1 * self.resolution, self.y0 - row0 * self.resolution)
+
+    def pixel_centres(self, window):
+        """x of every column and y of every row of a window"""
+        row0, row1, col0, col1 = window
+        x = self.x0 + (np.arange(col0, col1) + 0.5) * self.resolution
+        y = self.y0 - (np.arange(row0, row1) + 0.5) * self.resolution
+        return x, y
+
+    def to_dict(self):
+        return {'x0': self.x0, 'y0': self.y0, 'resolution': self.resolution,
+                'width': self.width, 'height': self.height, 'crs': self.crs}
+
+
+def create_raster(base, grid, dtype=np.float32, **meta):
+    """New zero-filled raster at base.npy (+ base.json), memory-mapped for writing"""
+    os.makedirs(os.path.dirname(base) or '.', exist_ok=True)
+    write_metadata(base, {'grid': grid.to_dict(), 'transform': grid.transform,
+                          'dtype': np.dtype(dtype).name, **meta})
+    return np.lib.format.open_memmap(base + '.npy', mode='w+', dtype=dtype, shape=grid.shape)
+
+
+def open_raster(base, mode='r'):
+    """Memory-mapped raster, its grid and its metadata"""
+    with open(base + '.json') as f:
+        meta = json.load(f)
+    return np.load(base + '.npy', mmap_mode=mode), RasterGrid(**meta['grid']), meta
+
+
+def write_metadata(base, meta):
+    with open(base + '.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def raster_exists(base):
+    return os.path.exists(base + '.npy') and os.path.exists(base + '.json')
+
+
+def _halo_window(window, halo):
+    row0, row1, col0, col1 = window
+    return (row0 - halo, row1 + halo, col0 - halo, col1 + halo)
+
+
+def _crop(values, halo):
+    return values[halo:values.shape[0] - halo, halo:values.shape[1] - halo]
+
+
+def population_density_block(grid, window, tehsil_tree, densities):
+    """Density of the nearest tehsil centre for every pixel"""
+    x, y = grid.pixel_centres(window)
+    xx, yy = np.meshgrid(x, y)
+    _, nearest = tehsil_tree.query(np.column_stack([xx.ravel(), yy.ravel()]))
+    return densities[nearest].reshape(xx.shape)
+
+
+def road_distance_block(grid, window, tree, geometries, cap=ROAD_DISTANCE_CAP):
+    """Distance (m) from every pixel to the nearest road pixel, capped at ``cap``
+
+    Roads within ``cap`` of the window are burned into a halo around it, so
+    a block gives the same result as transforming the whole raster.
+    """
+    import shapely
+    from scipy.ndimage import distance_transform_edt
+
+    from tiles import line_samples
+
+    halo = int(np.ceil(cap / grid.resolution))
+    outer = _halo_window(window, halo)
+    minx, miny, maxx, maxy = grid.window_bounds(outer)
+    shape = (outer[1] - outer[0], outer[3] - outer[2])
+    hits = tree.query(shapely.box(minx, miny, maxx, maxy))
+    if not len(hits):
+        return np.full((shape[0] - 2 * halo, shape[1] - 2 * halo), cap, dtype=np.float32)
+
+    cols, rows = line_samples(geometries[hits], minx, maxy, grid.resolution)
+    cols, rows = np.floor(cols).astype(np.int64), np.floor(rows).astype(np.int64)
+    keep = (cols >= 0) & (cols < shape[1]) & (rows >= 0) & (rows < shape[0])
+    road = np.zeros(shape, dtype=bool)
+    road[rows[keep], cols[keep]] = True
+    distance = distance_transform_edt(~road, sampling=grid.resolution) if road.any() else np.full(shape, np.inf)
+    return np.minimum(_crop(distance, halo), cap)
+
+
+def poi_density_block(grid, window, coords, bandwidth=POI_BANDWIDTH):
+    """Gaussian kernel density of POIs per km² around every pixel
+
+    POIs are binned to pixels and smoothed with a kernel truncated at three
+    sigma; the halo holds every POI that kernel can reach.
+    """
+    from scipy.ndimage import gaussian_filter
+
+    sigma = bandwidth / grid.resolution
+    halo = int(np.ceil(3 * sigma))
+    outer = _halo_window(window, halo)
+    minx, miny, maxx, maxy = grid.window_bounds(outer)
+    shape = (outer[1] - outer[0], outer[3] - outer[2])
+
+    cols = np.floor((coords[:, 0] - minx) / grid.resolution).astype(np.int64)
+    rows = np.floor((maxy - coords[:, 1]) / grid.resolution).astype(np.int64)
+    keep = (cols >= 0) & (cols < shape[1]) & (rows >= 0) & (rows < shape[0])
+    counts = np.bincount(rows[keep] * shape[1] + cols[keep], minlength=shape[0] * shape[1])
+    density = gaussian_filter(counts.reshape(shape).astype(float), sigma, mode='constant', truncate=3.0)
+    return _crop(density, halo) / (grid.resolution ** 2 / 1e6)
+
+
+def land_cover_block(grid, window, classes, class_grid):
+    """Suitability of the land cover class under every pixel (nearest sample)"""
+    lookup = np.full(256, np.nan)
+    for land_class, value in LAND_COVER_SUITABILITY.items():
+        lookup[land_class] = value
+
+    x, y = grid.pixel_centres(window)
+    cols = np.floor((x - class_grid.x0) / class_grid.resolution).astype(np.int64)
+    rows = np.floor((class_grid.y0 - y) / class_grid.resolution).astype(np.int64)
+    valid_cols = (cols >= 0) & (cols < class_grid.width)
+    valid_rows = (rows >= 0) & (rows < class_grid.height)
+    block = np.full((len(y), len(x)), np.nan)
+    if valid_cols.any() and valid_rows.any():
+        sampled = classes[rows[valid_rows][:, None], cols[valid_cols][None, :]]
+        block[np.ix_(valid_rows, valid_cols)] = lookup[sampled]
+    return block
+
+
+# Per-process inputs and memory-mapped rasters, set once by _init_worker
+_context = {}
+
+
+def _init_worker(context):
+    import shapely
+    from scipy.spatial import cKDTree
+
+    _context.clear()
+    _context.update(context)
+    _context['grid'] = RasterGrid(**context['grid'])
+    _context['rasters'] = {name: np.load(base + '.npy', mmap_mode=mode)
+                           for name, (base, mode) in context['rasters'].items()}
+    if context.get('boundary') is not None:
+        boundary = shapely.from_wkb(context['boundary'])
+        shapely.prepare(boundary)
+        _context['boundary'] = boundary
+    if context.get('tehsils') is not None:
+        _context['tehsil_tree'] = cKDTree(context['tehsils']['xy'])
+    if context.get('roads') is not None:
+        geometries = shapely.from_wkb(context['roads'])
+        _context['roads'] = (shapely.STRtree(geometries), geometries)
+    if context.get('land_cover_grid') is not None:
+        _context['land_cover_grid'] = RasterGrid(**context['land_cover_grid'])
+
+
+def _criteria_block(window):
+    """Compute and write every criterion for one block, returns their (min, max)"""
+    import shapely
+
+    grid, rasters = _context['grid'], _context['rasters']
+    x, y = grid.pixel_centres(window)
+    xx, yy = np.meshgrid(x, y)
+    inside = shapely.contains_xy(_context['boundary'], xx, yy)
+
+    blocks = {}
+    if 'population_density' in rasters:
+        blocks['population_density'] = population_density_block(
+            grid, window, _context['tehsil_tree'], _context['tehsils']['density'])
+    if 'road_distance' in rasters:
+        blocks['road_distance'] = road_distance_block(grid, window, *_context['roads'], _context['road_distance_cap'])
+    if 'poi_density' in rasters:
+        blocks['poi_density'] = poi_density_block(grid, window, _context['pois'], _context['poi_bandwidth'])
+    if 'land_cover' in rasters:
+        blocks['land_cover'] = land_cover_block(grid, window, rasters['land_cover_classes'],
+                                                _context['land_cover_grid'])
+
+    row0, row1, col0, col1 = window
+    stats = {}
+    for name, block in blocks.items():
+        block = np.where(inside, block, np.nan).astype(np.float32)
+        rasters[name][row0:row1, col0:col1] = block
+        valid = ~np.isnan(block)
+        stats[name] = (float(block[valid].min()), float(block[valid].max())) if valid.any() else None
+    for raster in rasters.values():
+        if isinstance(raster, np.memmap) and raster.mode == 'r+':
+            raster.flush()
+    return stats
+
+
+def _overlay_block(window):
+    """Weighted sum of the normalized criteria for one block, returns (sum, count, max)"""
+    rasters = _context['rasters']
+    row0, row1, col0, col1 = window
+    matrix = np.stack([rasters[name][row0:row1, col0:col1].ravel() for name in _context['inputs']], axis=1)
+    normalized = mcda.normalize(matrix, directions=_context['directions'], bounds=_context['bounds'])
+    composite = (normalized @ np.asarray(_context['weights'])).reshape(row1 - row0, col1 - col0)
+
+    output = rasters[SUITABILITY_RASTER]
+    output[row0:row1, col0:col1] = composite
+    output.flush()
+    valid = ~np.isnan(composite)
+    return float(composite[valid].sum()), int(valid.sum()), float(composite[valid].max()) if valid.any() else np.nan
+
+
+def _run_blocks(function, windows, context, workers):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(context,)) as pool:
+        return list(pool.map(function, windows))
+
+
+def build_criteria(grid, boundary, tehsils=None, roads=None, pois=None, land_cover=None,
+                   raster_dir=RASTER_DIR, block_size=BLOCK_SIZE, workers=None):
+    """Write a raster for every criterion with input data, block by block
+
+    ``boundary`` is a metric polygon (pixels outside are NaN), ``tehsils``
+    a dict of 'xy' centres and 'density', ``roads`` metric line
+    geometries, ``pois`` an (N, 2) array of metric coordinates and
+    ``land_cover`` the base path of a land cover class raster. Returns
+    {raster name: (min, max)} over the pixels inside the boundary.
+    """
+    import shapely
+
+    context = {
+        'grid': grid.to_dict(),
+        'boundary': shapely.to_wkb(boundary),
+        'road_distance_cap': ROAD_DISTANCE_CAP,
+        'poi_bandwidth': POI_BANDWIDTH,
+        'rasters': {}
+    }
+    names = []
+    if tehsils is not None:
+        context['tehsils'] = tehsils
+        names.append('population_density')
+    if roads is not None and len(roads):
+        context['roads'] = shapely.to_wkb(np.asarray(roads))
+        names.append('road_distance')
+    if pois is not None and len(pois):
+        context['pois'] = np.asarray(pois, dtype=float)
+        names.append('poi_density')
+    if land_cover is not None and raster_exists(land_cover):
+        _, class_grid, _ = open_raster(land_cover)
+        context['land_cover_grid'] = class_grid.to_dict()
+        context['rasters']['land_cover_classes'] = (land_cover, 'r')
+        names.append('land_cover')
+
+    for name in names:
+        base = os.path.join(raster_dir, name)
+        create_raster(base, grid, block_size=block_size)
+        context['rasters'][name] = (base, 'r+')
+
+    results = _run_blocks(_criteria_block, grid.blocks(block_size), context, workers)
+
+    stats = {}
+    for name in names:
+        ranges = [result[name] for result in results if result[name] is not None]
+        stats[name] = (min(low for low, _ in ranges), max(high for _, high in ranges)) if ranges else None
+        base = os.path.join(raster_dir, name)
+        _, _, meta = open_raster(base)
+        write_metadata(base, {**meta, 'min': stats[name] and stats[name][0], 'max': stats[name] and stats[name][1]})
+    return stats
+
+
+def weighted_overlay(stats, weights=raster_criteria_weights, raster_dir=RASTER_DIR,
+                     block_size=BLOCK_SIZE, workers=None):
+    """Composite 0-100 suitability raster from the criterion rasters
+
+    Each criterion is min-max normalized over the whole raster (``stats``
+    from build_criteria) so that blocks are scaled alike. Criteria without
+    a raster are dropped and the remaining weights re-normalized. Returns
+    the criteria used and the mean and maximum score.
+    """
+    names = [name for name in weights if stats.get(raster_criteria[name][0]) is not None]
+    if not names:
+        raise ValueError("No criterion rasters to combine")
+    inputs = [raster_criteria[name][0] for name in names]
+
+    _, grid, _ = open_raster(os.path.join(raster_dir, inputs[0]))
+    output = os.path.join(raster_dir, SUITABILITY_RASTER)
+    create_raster(output, grid, block_size=block_size, criteria=names)
+
+    context = {
+        'grid': grid.to_dict(),
+        'inputs': inputs,
+        'directions': [raster_criteria[name][1] for name in names],
+        'bounds': ([stats[raster][0] for raster in inputs], [stats[raster][1] for raster in inputs]),
+        'weights': mcda.weight_vector(weights, names).tolist(),
+        'rasters': {**{raster: (os.path.join(raster_dir, raster), 'r') for raster in inputs},
+                    SUITABILITY_RASTER: (output, 'r+')}
+    }
+    results = _run_blocks(_overlay_block, grid.blocks(block_size), context, workers)
+    total = sum(result[0] for result in results)
+    count = sum(result[1] for result in results)
+    return {'criteria': names, 'mean': total / count if count else np.nan,
+            'max': np.nanmax([result[2] for result in results])}
+
+
+def preview_png(base, filepath, max_size=1024):
+    """Downsampled colour preview of a 0-100 raster (strided reads only)"""
+    from tiles import encode_png, score_palette
+
+    values, grid, _ = open_raster(base)
+    step = max(1, int(np.ceil(max(grid.shape) / max_size)))
+    sample = np.asarray(values[::step, ::step], dtype=float)
+    image = np.zeros(sample.shape + (4,), dtype=np.uint8)
+    valid = ~np.isnan(sample)
+    image[valid] = score_palette()[np.clip(np.round(sample[valid] * 2.55), 0, 255).astype(np.uint8)]
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    with open(filepath, 'wb') as f:
+        f.write(encode_png(image))
+
+
+def main():
+    import pandas as pd
+
+    from grid import _boundary_geometry
+    from coordinates import to_metric
+    from spatial_index import InfrastructureIndex
+    from study_area import approximate_boundary
+
+    parser = argparse.ArgumentParser(description="Raster suitability analysis over the Lahore boundary")
+    parser.add_argument('--resolution', type=float, default=DEFAULT_RESOLUTION, help="Pixel size in metres")
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help="Pixels per processing block side")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--boundary', default=BOUNDARY_LAYER, help="Boundary layer path without extension")
+    parser.add_argument('--census', default='data/demographics/lahore_census_2023.csv')
+    parser.add_argument('--land-cover', default=LAND_COVER_LAYER,
+                        help="Land cover class raster (ESA WorldCover codes) without extension")
+    parser.add_argument('--output-dir', default=RASTER_DIR)
+    parser.add_argument('--preview', default='outputs/maps/raster_suitability.png')
+    args = parser.parse_args()
+
+    print("⚡ RASTER SUITABILITY ANALYSIS")
+    print("=" * 60)
+
+    boundary_file = find_layer(args.boundary)
+    if boundary_file:
+        boundary = read_layer(boundary_file)
+    else:
+        print("⚠️ Boundary file not found, using approximate boundary")
+        boundary = approximate_boundary()
+    polygon = _boundary_geometry(boundary)
+
+    grid = RasterGrid.from_bounds(polygon.bounds, args.resolution)
+    blocks = grid.blocks(args.block_size)
+    print(f"✅ Grid: {grid.width:,} x {grid.height:,} pixels at {args.resolution:g} m, {len(blocks)} blocks")
+
+    census_df = pd.read_csv(args.census)
+    tehsils = census_df[census_df['Tehsil'].isin(tehsil_coordinates)].reset_index(drop=True)
+    lat, lon = np.array([tehsil_coordinates[name] for name in tehsils['Tehsil']]).T
+    tehsil_x, tehsil_y = to_metric(lon, lat)
+
+    infrastructure = InfrastructureIndex()
+    roads, pois = infrastructure.roads(), infrastructure.pois()
+    if not raster_exists(args.land_cover):
+        print(f"⚠️ No land cover raster at {args.land_cover}.npy, criterion skipped")
+
+    stats = build_criteria(
+        grid, polygon,
+        tehsils={'xy': np.column_stack([tehsil_x, tehsil_y]),
+                 'density': tehsils['Population_Density'].to_numpy(dtype=float)},
+        roads=roads.geometry.values if roads else None,
+        pois=pois.coords if pois else None,
+        land_cover=args.land_cover,
+        raster_dir=args.output_dir, block_size=args.block_size, workers=args.workers
+    )
+    for name, bounds in stats.items():
+        if bounds:
+            print(f"✅ {name}: {bounds[0]:,.1f} - {bounds[1]:,.1f}")
+
+    summary = weighted_overlay(stats, raster_dir=args.output_dir, block_size=args.block_size, workers=args.workers)
+    print(f"✅ Suitability from {', '.join(summary['criteria'])}: "
+          f"mean {summary['mean']:.1f}, max {summary['max']:.1f}")
+    print(f"✅ Rasters saved: {args.output_dir}")
+
+    if args.preview:
+        preview_png(os.path.join(args.output_dir, SUITABILITY_RASTER), args.preview)
+        print(f"✅ Preview saved: {args.preview}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,6 @@
-import pandas as pd
+import argparse
 import os
 
-# Create data directory if it doesn't exist
-os.makedirs('data/demographics', exist_ok=True)
-
 # Lahore Census Data 2023
 lahore_2023_data = {
     'Tehsil': ['Lahore District Total', 'Lahore Cantt', 'Lahore City', 'Model Town', 'Raiwind', 'Shalimar'],
@@ -17,18 +14,31 @@ lahore_2023_data = {
     'Annual_Growth_Rate': [2.65, 2.43, 2.08, 3.04, 4.12, 2.66]
 }
 
-# Create DataFrame and save
-df_census = pd.DataFrame(lahore_2023_data)
-df_census.to_csv('data/demographics/lahore_census_2023.csv', index=False)
-
-print("✅ Census data saved to data/demographics/lahore_census_2023.csv")
-print("\nPreview:")
-print(df_census.head())
-
-# Calculate some basic statistics
-total_pop = df_census.loc[0, 'Population_2023']
-total_area = df_census.loc[0, 'Area_SqKm']
-print(f"\n📊 Key Statistics:")
-print(f"Total Population: {total_pop:,}")
-print(f"Total Area: {total_area:,} sq.km")
-print(f"Average Density: {total_pop/total_area:.0f} people/sq.km")
\ No newline at end of file
+
+def main(argv=None):
+    argparse.ArgumentParser(description="Save the Lahore census tables as CSV").parse_args(argv)
+
+    import pandas as pd
+
+    # Create data directory if it doesn't exist
+    os.makedirs('data/demographics', exist_ok=True)
+
+    # Create DataFrame and save
+    df_census = pd.DataFrame(lahore_2023_data)
+    df_census.to_csv('data/demographics/lahore_census_2023.csv', index=False)
+
+    print("✅ Census data saved to data/demographics/lahore_census_2023.csv")
+    print("\nPreview:")
+    print(df_census.head())
+
+    # Calculate some basic statistics
+    total_pop = df_census.loc[0, 'Population_2023']
+    total_area = df_census.loc[0, 'Area_SqKm']
+    print(f"\n📊 Key Statistics:")
+    print(f"Total Population: {total_pop:,}")
+    print(f"Total Area: {total_area:,} sq.km")
+    print(f"Average Density: {total_pop/total_area:.0f} people/sq.km")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+import argparse
+import os
+import sys
+from collections import namedtuple
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+import mcda
+from criteria import criteria_weights, score_columns
+
+# Weight-sensitivity analysis: score M weight vectors against the same
+# normalized N x K criteria table as one (M x K) @ (K x N) product and
+# summarise how stable each candidate's rank is. Runs over the tehsil table
+# or, with --criteria sites, over the site recommendations.
+
+SensitivityResult = namedtuple('SensitivityResult', ['summary', 'rank_counts', 'reversals'])
+
+# Default table and candidate id column of each --criteria mode
+TABLES = {
+    'tehsils': ('outputs/analysis/tehsil_analysis.csv', 'Tehsil'),
+    'sites': ('outputs/analysis/site_recommendations.csv', 'Site_Name')
+}
+
+
+def sample_dirichlet(n_samples, base_weights, concentration=50.0, seed=None):
+    """Sample weight vectors from a Dirichlet distribution around base_weights
+
+    Larger concentration keeps samples closer to the base weights; pass
+    concentration=None for a uniform draw over the whole weight simplex.
+    """
+    base = mcda.weight_vector(base_weights)
+    alpha = np.ones_like(base) if concentration is None else base * concentration
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(alpha, size=n_samples)
+
+
+def weight_grid(n_criteria, steps=10):
+    """All weight vectors on a regular simplex lattice with 1/steps spacing"""
+    # Stars and bars: choosing n_criteria - 1 bar positions among
+    # steps + n_criteria - 1 slots enumerates every composition of steps
+    slots = steps + n_criteria - 1
+    bars = np.array(list(combinations(range(slots), n_criteria - 1)))
+    bounds = np.column_stack([
+        np.full(len(bars), -1), bars, np.full(len(bars), slots)
+    ])
+    return (np.diff(bounds, axis=1) - 1) / steps
+
+
+def batch_scores(normalized, weights):
+    """Composite scores for every weight vector: an (M x N) array"""
+    weights = mcda.weight_vector(np.atleast_2d(weights))
+    return weights @ np.asarray(normalized, dtype=float).T
+
+
+def batch_ranks(scores):
+    """Rank every row of an (M x N) score array (1 = best), ties in column order"""
+    scores = -np.asarray(scores, dtype=float)
+    # Quicksort is several times faster; the few rows with tied scores are
+    # sorted again stably so ties keep their column order
+    order = np.argsort(scores, axis=1)
+    in_order = np.take_along_axis(scores, order, axis=1)
+    tied = (in_order[:, 1:] == in_order[:, :-1]).any(axis=1)
+    if tied.any():
+        order[tied] = np.argsort(scores[tied], axis=1, kind='stable')
+    ranks = np.empty(order.shape, dtype=np.int32)
+    np.put_along_axis(ranks, order, np.arange(1, scores.shape[1] + 1, dtype=np.int32)[None, :], axis=1)
+    return ranks
+
+
+def rank_sensitivity(normalized, weights, base_weights, top_k=3, chunk_size=None, pairwise=False):
+    """Rank statistics of N candidates over M weight vectors
+
+    Returns the per-candidate summary, an N x top_k array counting how
+    often candidate i landed at rank j + 1, and, with ``pairwise``, an
+    N x N array counting how often each pair swapped order relative to the
+    base weights (None otherwise). The summary costs O(M N log N); only the
+    opt-in pairwise counts compare every pair in every sample.
+    """
+    normalized = np.asarray(normalized, dtype=float)
+    weights = np.atleast_2d(weights)
+    n = normalized.shape[0]
+    top_k = min(top_k, n)
+
+    base_scores = batch_scores(normalized, base_weights)[0]
+    base_ranks = batch_ranks(base_scores[None, :])[0]
+    # Candidates are processed in base order: samples near the base weights
+    # are then nearly sorted already, and the base rank of column i is i + 1
+    base_order = np.argsort(base_ranks)
+    in_order = normalized[base_order]
+    base_ahead = base_scores[base_order][:, None] > base_scores[base_order][None, :]
+    positions = np.arange(1, n + 1)
+
+    # Score/rank chunks are chunk x N (x N for the pairwise counts), keep that bounded
+    if chunk_size is None:
+        chunk_size = max(1, 20_000_000 // max(n * n if pairwise else n, 1))
+
+    rank_counts = np.zeros((n, top_k), dtype=np.int64)
+    reversals = np.zeros((n, n), dtype=np.int64) if pairwise else None
+    reversal_samples = np.zeros(n, dtype=np.int64)
+    stable_samples = np.zeros(n, dtype=np.int64)
+    best_rank = np.full(n, n + 1)
+    worst_rank = np.zeros(n, dtype=np.int64)
+    rank_sum = np.zeros(n)
+    rank_sq_sum = np.zeros(n)
+
+    for start in range(0, len(weights), chunk_size):
+        scores = batch_scores(in_order, weights[start:start + chunk_size])
+        ranks = batch_ranks(scores)
+
+        for j in range(top_k):
+            rank_counts[:, j] += (ranks == j + 1).sum(axis=0)
+        stable_samples += (ranks == positions).sum(axis=0)
+        best_rank = np.minimum(best_rank, ranks.min(axis=0))
+        worst_rank = np.maximum(worst_rank, ranks.max(axis=0))
+        rank_sum += ranks.sum(axis=0)
+        rank_sq_sum += np.einsum('ij,ij->j', ranks, ranks, dtype=float)
+
+        # A candidate swapped with another when one ranked ahead of it in
+        # the base now ranks behind it, or one ranked behind it now ahead
+        behind = np.zeros_like(ranks)
+        behind[:, 1:] = np.maximum.accumulate(ranks, axis=1)[:, :-1]
+        ahead = np.full_like(ranks, n + 1)
+        ahead[:, :-1] = np.minimum.accumulate(ranks[:, ::-1], axis=1)[:, -2::-1]
+        reversal_samples += ((behind > ranks) | (ahead < ranks)).sum(axis=0)
+
+        if pairwise:
+            flipped = (scores[:, :, None] > scores[:, None, :]) & base_ahead.T[None, :, :]
+            reversals += flipped.sum(axis=0)
+
+    # Back from base order to the input order
+    original = np.argsort(base_order)
+    rank_counts, reversal_samples, stable_samples = rank_counts[original], reversal_samples[original], \
+        stable_samples[original]
+    best_rank, worst_rank, rank_sum, rank_sq_sum = best_rank[original], worst_rank[original], \
+        rank_sum[original], rank_sq_sum[original]
+    if pairwise:
+        reversals = reversals[np.ix_(original, original)]
+
+    m = len(weights)
+    mean_rank = rank_sum / m
+    summary = pd.DataFrame({
+        'Base_Rank': base_ranks,
+        'Base_Score': base_scores,
+        'Mean_Rank': mean_rank,
+        'Rank_Std': np.sqrt(np.maximum(rank_sq_sum / m - mean_rank ** 2, 0)),
+        'Best_Rank': best_rank,
+        'Worst_Rank': worst_rank,
+        'Rank_Stability': stable_samples / m,
+        f'P_Rank_Top_{top_k}': rank_counts.sum(axis=1) / m,
+        'Rank_Reversals': reversal_samples,
+    })
+    return SensitivityResult(summary, rank_counts, reversals)
+
+
+def criteria_table(table, criteria='tehsils'):
+    """Criterion names, normalized (N x K) values and base weights of a scored table
+
+    Tehsils are read from their normalized score columns; sites are
+    normalized from their raw attributes the way site_scoring scores them,
+    leaving out criteria with no data.
+    """
+    if criteria == 'sites':
+        from criteria import site_criteria_directions, site_criteria_weights
+        from site_scoring import _normalized_criteria
+
+        missing = [name for name in site_criteria_weights if name not in table.columns]
+        if missing:
+            raise ValueError(f"Site table lacks criterion columns: {', '.join(missing)} (run ev_site_analysis.py)")
+        return _normalized_criteria(table, site_criteria_weights, site_criteria_directions)
+
+    names = list(criteria_weights)
+    missing = [score_columns[name] for name in names if score_columns[name] not in table.columns]
+    if missing:
+        raise ValueError(f"Tehsil table lacks score columns: {', '.join(missing)} (run ev_site_analysis.py)")
+    return names, table[[score_columns[name] for name in names]].to_numpy(), mcda.weight_vector(criteria_weights, names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weight-sensitivity analysis of the EV site rankings")
+    parser.add_argument('--criteria', choices=list(TABLES), default='tehsils',
+                        help="Rank the tehsils or the candidate sites")
+    parser.add_argument('--table', help="Scored table (default: the --criteria mode's analysis output)")
+    parser.add_argument('--id-column', help="Candidate name column (default: Tehsil or Site_Name)")
+    parser.add_argument('--method', choices=['dirichlet', 'grid'], default='dirichlet')
+    parser.add_argument('--samples', type=int, default=100_000, help="Dirichlet weight samples")
+    parser.add_argument('--concentration', type=float, default=50.0,
+                        help="Dirichlet concentration around the base weights (0 = uniform)")
+    parser.add_argument('--grid-steps', type=int, default=20)
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='outputs/analysis/weight_sensitivity.csv')
+    args = parser.parse_args()
+
+    print("⚡ WEIGHT SENSITIVITY ANALYSIS")
+    print("=" * 60)
+
+    default_table, default_id = TABLES[args.criteria]
+    args.table = args.table or default_table
+    args.id_column = args.id_column or default_id
+
+    table = pd.read_csv(args.table)
+    try:
+        criteria, normalized, base_weights = criteria_table(table, args.criteria)
+    except ValueError as error:
+        print(f"❌ {args.table}: {error}")
+        return 1
+
+    if args.method == 'grid':
+        weights = weight_grid(len(criteria), args.grid_steps)
+    else:
+        weights = sample_dirichlet(args.samples, base_weights,
+                                   concentration=args.concentration or None, seed=args.seed)
+    print(f"📋 Scoring {len(table)} candidates under {len(weights):,} weight vectors ({args.method})")
+
+    result = rank_sensitivity(normalized, weights, base_weights, top_k=args.top_k)
+    summary = pd.concat([table[[args.id_column]], result.summary], axis=1)
+    summary = summary.sort_values('Base_Rank').reset_index(drop=True)
+
+    print("🏆 RANK STABILITY:")
+    for _, row in summary.iterrows():
+        print(f"#{row['Base_Rank']}: {row[args.id_column]} - stable in {row['Rank_Stability']:.0%} of samples, "
+              f"P(top {args.top_k}) = {row[f'P_Rank_Top_{args.top_k}']:.0%}, "
+              f"ranks {row['Best_Rank']}-{row['Worst_Rank']}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    summary.to_csv(args.output, index=False)
+    print(f"✅ Sensitivity results saved: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+import mcda
+from coordinates import metric_xy
+from sensitivity import batch_ranks, sample_dirichlet
+
+# Site-level scoring computed as whole-table columns. Every site gets its own
+# attributes (POI proximity, POI density, road proximity) instead of its
+# parent tehsil score plus random noise, so identical inputs always give
+# identical rankings.
+
+# Score thresholds for the recommendation tiers
+TIERS = [(70, 'High Priority'), (50, 'Medium Priority')]
+DEFAULT_TIER = 'Future Consideration'
+
+
+def site_features(sites_df, infrastructure, radius_km=1.0):
+    """Per-site POI and road proximity attributes for the whole table at once
+
+    ``infrastructure`` is a spatial_index.InfrastructureIndex. Missing layers
+    give NaN columns, which score_sites leaves out.
+    """
+    features = pd.DataFrame(index=sites_df.index)
+    x, y = metric_xy(sites_df)
+
+    pois = infrastructure.pois()
+    commercial = infrastructure.layer('commercial')
+    roads = infrastructure.roads()
+
+    features['Nearest_POI_Km'] = pois.nearest(x, y)[0] / 1000 if pois else np.nan
+    features['Nearest_Commercial_Km'] = commercial.nearest(x, y)[0] / 1000 if commercial else np.nan
+    features[f'POIs_Within_{radius_km:g}Km'] = pois.count_within(x, y, radius_km * 1000) if pois else np.nan
+    features['Road_Distance_Km'] = roads.nearest(x, y)[0] / 1000 if roads else np.nan
+
+    return features
+
+
+def recommendation_tiers(scores):
+    """Map site scores to the High/Medium/Future recommendation tiers"""
+    scores = np.asarray(scores, dtype=float)
+    return np.select([scores > threshold for threshold, _ in TIERS],
+                     [tier for _, tier in TIERS], default=DEFAULT_TIER)
+
+
+def _normalize_column(values, direction):
+    """0-100 criterion values; None marks a column already on that scale"""
+    values = np.asarray(values, dtype=float)
+    normalized = values if direction is None else mcda.normalize(values, directions=direction)
+    # Sites missing one attribute are scored on the others
+    return np.where(np.isnan(normalized), np.nanmean(normalized, axis=0), normalized)
+
+
+def _normalized_criteria(sites_df, site_weights, directions):
+    """Criteria with data, their normalized (sites x criteria) values and weights"""
+    columns = [name for name in site_weights if sites_df[name].notna().any()]
+    normalized = np.column_stack([_normalize_column(sites_df[name], directions[name]) for name in columns])
+    return columns, normalized, mcda.weight_vector(site_weights, columns)
+
+
+def score_sites(sites_df, site_weights, directions, monte_carlo_samples=0, seed=None):
+    """Score sites from their tehsil score and own attributes
+
+    ``site_weights`` and ``directions`` are keyed by column name. A direction
+    of None marks a column that is already on a 0-100 scale, such as the
+    tehsil score, and is used as-is so the tier thresholds keep their
+    meaning; site attributes are min-max normalized across candidates.
+    Criteria with no data at all are dropped and the remaining weights
+    re-normalized.
+
+    With monte_carlo_samples > 0 the weights are perturbed (Dirichlet, seeded)
+    and Tier_Confidence gives the share of samples that agree with each
+    site's tier.
+    """
+    columns, normalized, weights = _normalized_criteria(sites_df, site_weights, directions)
+    result = mcda.score(None, weights, normalized=normalized)
+
+    scored = sites_df.copy()
+    scored['Site_Score'] = result.composite
+    scored['Recommendation'] = recommendation_tiers(result.composite)
+
+    if monte_carlo_samples:
+        samples = sample_dirichlet(monte_carlo_samples, weights, seed=seed)
+        sample_tiers = recommendation_tiers(samples @ normalized.T)
+        scored['Tier_Confidence'] = (sample_tiers == scored['Recommendation'].to_numpy()).mean(axis=0)
+
+    return scored
+
+
+def scores_over_time(sites_df, site_weights, directions, column, values):
+    """Site scores and ranks with one criterion replaced by values over time
+
+    ``values`` is a (times x sites) array for ``column`` (e.g. projected
+    population in reach per year); the other criteria are normalized once
+    and every time step is scored in the same batch. Returns (times x
+    sites) scores and ranks (1 = best).
+    """
+    columns, normalized, weights = _normalized_criteria(sites_df, site_weights, directions)
+    values = np.asarray(values, dtype=float)
+    if column not in columns:
+        scores = np.broadcast_to(normalized @ weights, values.shape).copy()
+        return scores, batch_ranks(scores)
+
+    k = columns.index(column)
+    # Each time step is normalized across sites, like the static column
+    varying = _normalize_column(values.T, directions[column]).T
+    scores = (np.delete(normalized, k, axis=1) @ np.delete(weights, k))[None, :] + weights[k] * varying
+    return scores, batch_ranks(scores)
@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+
+from storage import INFRASTRUCTURE_DIR, find_layer, read_layer
+from study_area import METRIC_CRS
+
+# Spatial index service for proximity queries against the infrastructure
+# layers. Each layer is read and projected once; point layers get a
+# cKDTree, line/polygon layers a shapely STRtree. All queries take arrays of
+# metric coordinates and run in O(N log M) batches.
+
+POI_CATEGORIES = ['commercial', 'education', 'healthcare', 'transport', 'residential']
+ROAD_LAYERS = ['major_roads', 'lahore_roads']
+
+# Points per query batch, keeps temporary arrays bounded for huge inputs
+QUERY_CHUNK = 1_000_000
+
+
+def _chunks(n):
+    for start in range(0, n, QUERY_CHUNK):
+        yield slice(start, min(start + QUERY_CHUNK, n))
+
+
+class LayerIndex:
+    """Nearest-neighbour, k-nearest and radius queries against one layer"""
+
+    def __init__(self, geometry, name=None):
+        import shapely
+
+        if geometry.crs is not None:
+            geometry = geometry.to_crs(METRIC_CRS)
+        self.name = name
+        self.geometry = geometry.reset_index(drop=True)
+        self.is_points = bool(len(geometry)) and bool((geometry.geom_type == 'Point').all())
+
+        if self.is_points:
+            from scipy.spatial import cKDTree
+
+            self.coords = shapely.get_coordinates(self.geometry.values)
+            self._tree = cKDTree(self.coords)
+        else:
+            self._tree = shapely.STRtree(self.geometry.values)
+
+    @classmethod
+    def from_file(cls, filepath, name=None):
+        # Only the geometry is indexed; Feather road layers are memory-mapped
+        return cls(read_layer(filepath, columns=[], memory_map=True).geometry, name=name)
+
+    def __len__(self):
+        return len(self.geometry)
+
+    def nearest(self, x, y, max_distance=None):
+        """Distance (m) to and index of the nearest feature for every point
+
+        Points with nothing within max_distance get distance inf, index -1.
+        """
+        import shapely
+
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        distances = np.full(len(x), np.inf)
+        indices = np.full(len(x), -1, dtype=np.int64)
+
+        for part in _chunks(len(x)):
+            if self.is_points:
+                d, i = self._tree.query(np.column_stack([x[part], y[part]]),
+                                        distance_upper_bound=max_distance or np.inf, workers=-1)
+                found = i < len(self)
+                distances[part] = np.where(found, d, np.inf)
+                indices[part] = np.where(found, i, -1)
+            else:
+                points = shapely.points(x[part], y[part])
+                (source, target), d = self._tree.query_nearest(
+                    points, max_distance=max_distance, return_distance=True, all_matches=False
+                )
+                distances[part][source] = d
+                indices[part][source] = target
+        return distances, indices
+
+    def knn(self, x, y, k):
+        """Distances and indices of the k nearest features (N x k arrays)"""
+        if not self.is_points:
+            raise ValueError(f"k-nearest queries need a point layer, {self.name} has lines/polygons")
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        distances = np.empty((len(x), k))
+        indices = np.empty((len(x), k), dtype=np.int64)
+        for part in _chunks(len(x)):
+            d, i = self._tree.query(np.column_stack([x[part], y[part]]), k=k, workers=-1)
+            distances[part] = d.reshape(-1, k)
+            indices[part] = i.reshape(-1, k)
+        # Fewer than k features: missing neighbours come back as inf / -1
+        indices[indices >= len(self)] = -1
+        return distances, indices
+
+    def count_within(self, x, y, radius):
+        """Number of features within radius metres of every point"""
+        import shapely
+
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        counts = np.zeros(len(x), dtype=np.int64)
+        for part in _chunks(len(x)):
+            if self.is_points:
+                counts[part] = self._tree.query_ball_point(np.column_stack([x[part], y[part]]), radius,
+                                                           return_length=True, workers=-1)
+            else:
+                source, _ = self._tree.query(shapely.points(x[part], y[part]),
+                                             predicate='dwithin', distance=radius)
+                counts[part] = np.bincount(source, minlength=part.stop - part.start)
+        return counts
+
+
+class InfrastructureIndex:
+    """Loads each infrastructure layer once and keeps its spatial index"""
+
+    def __init__(self, infrastructure_dir=INFRASTRUCTURE_DIR):
+        self.infrastructure_dir = infrastructure_dir
+        self._layers = {}
+
+    def path(self, name):
+        """File for a layer name such as 'commercial' or 'major_roads', or None"""
+        for layer in [name, f'{name}_sample']:
+            filepath = find_layer(os.path.join(self.infrastructure_dir, layer))
+            if filepath:
+                return filepath
+        return None
+
+    def layer(self, name):
+        """Index for one layer, or None if it has not been downloaded"""
+        if name not in self._layers:
+            filepath = self.path(name)
+            self._layers[name] = LayerIndex.from_file(filepath, name=name) if filepath else None
+        return self._layers[name]
+
+    def roads(self):
+        """Index of the major road layer, falling back to all roads"""
+        for name in ROAD_LAYERS:
+            if self.layer(name) is not None:
+                return self.layer(name)
+        return None
+
+    def pois(self):
+        """Index of all POI categories together, with a category per point"""
+        if 'pois' not in self._layers:
+            import geopandas as gpd
+            import pandas as pd
+
+            layers = [(category, self.layer(category)) for category in POI_CATEGORIES]
+            layers = [(category, layer) for category, layer in layers if layer is not None and len(layer)]
+            if layers:
+                index = LayerIndex(gpd.GeoSeries(pd.concat([layer.geometry for _, layer in layers]),
+                                                 crs=METRIC_CRS), name='pois')
+                index.categories = np.concatenate([[category] * len(layer) for category, layer in layers])
+            else:
+                index = None
+            self._layers['pois'] = index
+        return self._layers['pois']
@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+
+# Columnar storage for the vector layers passed between scripts. Layers are
+# written as GeoParquet (boundary, POIs) or uncompressed Arrow/Feather (large
+# road layers, which can then be memory-mapped) with WKB geometry, and read
+# back with optional column projection and bbox filtering. Layers are named
+# by path without extension; shapefiles are only read for trees created
+# before this layer existed, and written on request as an interchange format.
+
+FORMATS = {'parquet': '.parquet', 'feather': '.feather', 'shapefile': '.shp'}
+DEFAULT_FORMAT = 'parquet'
+SHAPEFILE_SIDECARS = ['.shp', '.shx', '.dbf', '.prj', '.cpg', '.qix', '.sbn', '.sbx', '.shp.xml']
+
+# Lookup order when a layer exists in several formats
+READ_ORDER = ['parquet', 'feather', 'shapefile']
+
+BOUNDARY_LAYER = 'data/boundaries/lahore_boundary'
+INFRASTRUCTURE_DIR = 'data/infrastructure'
+
+
+def layer_format(filepath):
+    """Storage format of a layer file, from its extension"""
+    extension = os.path.splitext(filepath)[1].lower()
+    for fmt, suffix in FORMATS.items():
+        if suffix == extension:
+            return fmt
+    raise ValueError(f"Unknown layer format: {filepath}")
+
+
+def layer_path(base, fmt=DEFAULT_FORMAT):
+    return base + FORMATS[fmt]
+
+
+def find_layer(base):
+    """Existing file for a layer path without extension, or None"""
+    for fmt in READ_ORDER:
+        filepath = layer_path(base, fmt)
+        if os.path.exists(filepath):
+            return filepath
+    return None
+
+
+def write_layer(gdf, base, fmt=DEFAULT_FORMAT):
+    """Write a GeoDataFrame as ``base`` + the format's extension, returns the path
+
+    Parquet files carry a per-row bbox column so bbox reads can skip data;
+    Feather files are written uncompressed so they can be memory-mapped.
+    Columnar copies of the layer in other formats, and a legacy shapefile,
+    are removed so readers never pick up a stale one.
+    """
+    filepath = layer_path(base, fmt)
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    if fmt == 'parquet':
+        gdf.to_parquet(filepath, index=False, write_covering_bbox=True)
+    elif fmt == 'feather':
+        gdf.to_feather(filepath, index=False, compression='uncompressed')
+    else:
+        # Opt-in interchange export, leaves the columnar copy in place
+        gdf.to_file(filepath)
+        return filepath
+
+    for other in READ_ORDER:
+        if other != fmt:
+            remove_layer(base, other)
+    return filepath
+
+
+def remove_layer(base, fmt):
+    """Delete one format of a layer, including shapefile sidecars"""
+    filepaths = [base + suffix for suffix in SHAPEFILE_SIDECARS] if fmt == 'shapefile' else [layer_path(base, fmt)]
+    for filepath in filepaths:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+def _geo_metadata(filepath, fmt):
+    """GeoParquet 'geo' metadata from the file schema (no data is read)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == 'parquet':
+        schema = pq.read_schema(filepath)
+    else:
+        with pa.memory_map(filepath) as source:
+            schema = pa.ipc.open_file(source).schema
+    return json.loads(schema.metadata[b'geo'])
+
+
+def _crs_name(crs):
+    """'EPSG:4326'-style name of a PROJJSON CRS (GeoParquet default: OGC:CRS84)"""
+    if crs is None:
+        return 'OGC:CRS84'
+    if isinstance(crs, dict) and 'id' in crs:
+        return f"{crs['id']['authority']}:{crs['id']['code']}"
+    return crs.get('name') if isinstance(crs, dict) else str(crs)
+
+
+def layer_info(filepath):
+    """Feature count, bbox, CRS, geometry types and schema without reading features
+
+    Columnar layers are answered from the file footer/schema alone;
+    shapefiles through pyogrio's metadata query.
+    """
+    fmt = layer_format(filepath)
+    if fmt == 'shapefile':
+        import pyogrio
+
+        info = pyogrio.read_info(filepath)
+        return {
+            'format': fmt, 'count': int(info['features']),
+            'bbox': [float(v) for v in info['total_bounds']] if info.get('total_bounds') is not None else None,
+            'crs': info['crs'], 'geometry_types': [info['geometry_type']],
+            'schema': dict(zip(info['fields'].tolist(), info['dtypes'].tolist()))
+        }
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == 'parquet':
+        parquet = pq.ParquetFile(filepath)
+        schema, count = parquet.schema_arrow, parquet.metadata.num_rows
+    else:
+        with pa.memory_map(filepath) as source:
+            reader = pa.ipc.open_file(source)
+            schema = reader.schema
+            # Record batch headers only, the buffers stay mapped
+            count = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+    geo = json.loads(schema.metadata[b'geo']) if schema.metadata and b'geo' in schema.metadata else {}
+    primary = geo.get('primary_column', 'geometry')
+    column = geo.get('columns', {}).get(primary, {})
+    return {
+        'format': fmt, 'count': int(count), 'bbox': column.get('bbox'),
+        'crs': _crs_name(column.get('crs')) if geo else None,
+        'geometry_types': column.get('geometry_types', []),
+        'schema': {field.name: str(field.type) for field in schema if field.name not in (primary, 'bbox')}
+    }
+
+
+def read_layer(filepath, columns=None, bbox=None, memory_map=False):
+    """Read a layer file into a GeoDataFrame
+
+    ``columns`` limits the attribute columns read (the geometry is always
+    included, so ``columns=[]`` reads geometry only). ``bbox`` is
+    (minx, miny, maxx, maxy) in the layer's CRS and keeps features whose
+    bounding box intersects it; GeoParquet skips non-matching data on disk.
+    ``memory_map`` maps Feather files instead of copying them into memory.
+    """
+    import geopandas as gpd
+
+    fmt = layer_format(filepath)
+    if fmt == 'shapefile':
+        gdf = gpd.read_file(filepath, columns=columns, bbox=bbox)
+        return gdf if columns is None else gdf[[*columns, gdf.geometry.name]]
+
+    if columns is not None:
+        geometry = _geo_metadata(filepath, fmt)['primary_column']
+        columns = [*[column for column in columns if column != geometry], geometry]
+
+    if fmt == 'parquet':
+        return gpd.read_parquet(filepath, columns=columns, bbox=bbox)
+
+    gdf = gpd.read_feather(filepath, columns=columns, memory_map=memory_map)
+    if bbox is not None:
+        import numpy as np
+        import shapely
+
+        hits = gdf.sindex.query(shapely.box(*bbox))
+        gdf = gdf.iloc[np.sort(hits)].reset_index(drop=True)
+    return gdf
+
+
+class LayerWriter:
+    """Layer file written batch by batch, for layers too large to build as one GeoDataFrame
+
+    ``fields`` maps attribute names to pyarrow types. Every ``write`` call
+    appends one Parquet row group / Arrow record batch, so memory is bounded
+    by the batch. The file is written under a temporary name and only
+    replaces the layer (and any copy in another format) on ``close``;
+    Parquet files get the same covering bbox column as ``write_layer``.
+    """
+
+    def __init__(self, base, fields, geometry_type, fmt=DEFAULT_FORMAT, crs='EPSG:4326'):
+        import pyarrow as pa
+        from pyproj import CRS
+
+        if fmt not in ('parquet', 'feather'):
+            raise ValueError(f"Streaming writes need a columnar format, not {fmt!r}")
+        self.base = base
+        self.fmt = fmt
+        self.filepath = layer_path(base, fmt)
+        self.count = 0
+        self.bounds = [float('inf'), float('inf'), -float('inf'), -float('inf')]
+        self._geo_column = {'encoding': 'WKB', 'geometry_types': [geometry_type],
+                            'crs': CRS(crs).to_json_dict()}
+
+        columns = [pa.field(name, dtype) for name, dtype in fields.items()] + [pa.field('geometry', pa.binary())]
+        if fmt == 'parquet':
+            columns.append(pa.field('bbox', pa.struct([(key, pa.float64()) for key in ('xmin', 'ymin', 'xmax', 'ymax')])))
+            self._geo_column['covering'] = {'bbox': {key: ['bbox', key] for key in ('xmin', 'ymin', 'xmax', 'ymax')}}
+        self.schema = pa.schema(columns)
+
+        os.makedirs(os.path.dirname(self.filepath) or '.', exist_ok=True)
+        self._tmp = self.filepath + '.tmp'
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+
+            # Without the stored Arrow schema readers take the footer metadata, where 'geo' goes on close
+            self._writer = pq.ParquetWriter(self._tmp, self.schema, store_schema=False)
+        else:
+            # The IPC schema is written first, so Feather metadata cannot carry the final bbox
+            self._writer = pa.ipc.new_file(self._tmp, self.schema.with_metadata({'geo': self._geo_metadata()}))
+
+    def _geo_metadata(self):
+        column = dict(self._geo_column)
+        if self.count:
+            column['bbox'] = [float(value) for value in self.bounds]
+        return json.dumps({'version': '1.1.0', 'primary_column': 'geometry', 'columns': {'geometry': column}})
+
+    def write(self, columns, geometries):
+        """Append a batch: attribute arrays by field name and a shapely geometry array"""
+        import numpy as np
+        import pyarrow as pa
+        import shapely
+
+        if not len(geometries):
+            return
+        arrays = {name: pa.array(columns[name], type=self.schema.field(name).type)
+                  for name in self.schema.names if name not in ('geometry', 'bbox')}
+        arrays['geometry'] = pa.array(shapely.to_wkb(geometries), type=pa.binary())
+        bounds = shapely.bounds(geometries)
+        if self.fmt == 'parquet':
+            arrays['bbox'] = pa.StructArray.from_arrays([pa.array(bounds[:, i]) for i in range(4)],
+                                                        names=['xmin', 'ymin', 'xmax', 'ymax'])
+        self._writer.write_table(pa.Table.from_pydict(arrays, schema=self.schema))
+        self.bounds = [*np.minimum(self.bounds[:2], np.nanmin(bounds[:, :2], axis=0)),
+                       *np.maximum(self.bounds[2:], np.nanmax(bounds[:, 2:], axis=0))]
+        self.count += len(geometries)
+
+    def close(self):
+        """Finish the file and move it into place, returns its path"""
+        if self.fmt == 'parquet':
+            self._writer.add_key_value_metadata({'geo': self._geo_metadata()})
+        self._writer.close()
+        os.replace(self._tmp, self.filepath)
+        for other in READ_ORDER:
+            if other != self.fmt:
+                remove_layer(self.base, other)
+        return self.filepath
+
+    def abort(self):
+        """Drop the partial file, leaving any existing layer untouched"""
+        self._writer.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert vector layers between storage formats")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="Write a layer as a shapefile for other GIS tools")
+    export.add_argument('layer', help="Layer file (.parquet/.feather)")
+    export.add_argument('output', help="Output .shp path")
+    convert = commands.add_parser('convert', help="Rewrite legacy shapefiles in the default format")
+    convert.add_argument('directories', nargs='*', default=['data/boundaries', INFRASTRUCTURE_DIR])
+    convert.add_argument('--format', choices=['parquet', 'feather'], default=DEFAULT_FORMAT)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        read_layer(args.layer).to_file(args.output)
+        print(f"✅ Exported {args.layer} to {args.output}")
+        return
+
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.shp'):
+                base = os.path.join(directory, filename[:-len('.shp')])
+                filepath = write_layer(read_layer(layer_path(base, 'shapefile')), base, args.format)
+                print(f"✅ {base}.shp -> {filepath}")
+
+
+if __name__ == '__main__':
+    main()
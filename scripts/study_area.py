@@ -0,0 +1,38 @@
+# Fixed facts about the Lahore study area shared by the scripts
+
+# Geographic coordinates in EPSG:4326; distances and areas are computed in
+# UTM zone 43N, which covers Lahore
+GEOGRAPHIC_CRS = 'EPSG:4326'
+METRIC_CRS = 'EPSG:32643'
+
+lahore_center = [31.5204, 74.3587]
+
+# Approximate tehsil centres (lat, lon)
+tehsil_coordinates = {
+    'Lahore City': [31.5204, 74.3587],
+    'Model Town': [31.5204, 74.3287],
+    'Shalimar': [31.5404, 74.3687],
+    'Lahore Cantt': [31.5004, 74.3387],
+    'Raiwind': [31.4204, 74.3887]
+}
+
+# Approximate district boundary used when no boundary file is available
+lahore_coords = [
+    (74.007, 31.201),  # SW
+    (74.655, 31.201),  # SE
+    (74.655, 31.713),  # NE
+    (74.007, 31.713),  # NW
+    (74.007, 31.201)  # Close
+]
+
+
+def approximate_boundary():
+    """Simple Lahore district polygon as a GeoDataFrame"""
+    import geopandas as gpd
+    from shapely.geometry import Polygon
+
+    return gpd.GeoDataFrame(
+        {'name': ['Lahore District'], 'type': ['district']},
+        geometry=[Polygon(lahore_coords)],
+        crs=GEOGRAPHIC_CRS
+    )
@@ -0,0 +1,397 @@
+import argparse
+import json
+import os
+import shutil
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from coordinates import transformer
+from spatial_index import ROAD_LAYERS
+from study_area import GEOGRAPHIC_CRS, METRIC_CRS
+
+# Static XYZ tile pyramid for the web maps. The suitability grid and the
+# road layer are rendered to 256 px PNG tiles in Web Mercator, so maps only
+# fetch the tiles in view instead of embedding every cell or road segment.
+# Tiles are plain files: any static file server (python -m http.server)
+# serves them, nothing has to be online. Batches of tiles from all zoom
+# levels are rendered in a process pool.
+
+TILES_DIR = 'outputs/tiles'
+METADATA_FILE = 'tiles.json'
+VIEWER_FILE = 'viewer.html'
+TILE_SIZE = 256
+MIN_ZOOM = 10
+MAX_ZOOM = 14
+WEB_MERCATOR = 'EPSG:3857'
+
+# Half the Web Mercator world width in metres
+ORIGIN = 20037508.342789244
+
+# Tiles handed to a worker at a time
+TILES_PER_TASK = 32
+
+# Red -> yellow -> green ramp for scores 0..100
+SCORE_STOPS = [(0, (215, 48, 39)), (25, (252, 141, 89)), (50, (254, 224, 139)),
+               (75, (145, 207, 96)), (100, (26, 152, 80))]
+SCORE_ALPHA = 170
+ROAD_COLOR = (50, 50, 60, 220)
+
+
+def encode_png(rgba):
+    """PNG bytes for an (H, W, 4) uint8 image"""
+    height, width, _ = rgba.shape
+    # Each scanline starts with filter type 0 (none)
+    raw = np.concatenate([np.zeros((height, 1), np.uint8), rgba.reshape(height, width * 4)], axis=1)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6))
+            + chunk(b'IEND', b''))
+
+
+@lru_cache(maxsize=None)
+def score_palette():
+    """256-entry RGBA lookup table for scores scaled to 0..255"""
+    positions = np.linspace(0, 100, 256)
+    stops = np.array([stop for stop, _ in SCORE_STOPS], dtype=float)
+    colors = np.array([color for _, color in SCORE_STOPS], dtype=float)
+    palette = np.empty((256, 4), dtype=np.uint8)
+    for channel in range(3):
+        palette[:, channel] = np.round(np.interp(positions, stops, colors[:, channel]))
+    palette[:, 3] = SCORE_ALPHA
+    return palette
+
+
+def tile_bounds(z, x, y):
+    """(minx, miny, maxx, maxy) of a tile in Web Mercator metres"""
+    span = 2 * ORIGIN / 2 ** z
+    return -ORIGIN + x * span, ORIGIN - (y + 1) * span, -ORIGIN + (x + 1) * span, ORIGIN - y * span
+
+
+def tile_range(bounds, z):
+    """Tile column/row ranges covering lon/lat bounds at zoom z"""
+    minx, miny, maxx, maxy = bounds
+    (x0, x1), (y0, y1) = transformer(GEOGRAPHIC_CRS, WEB_MERCATOR).transform([minx, maxx], [miny, maxy])
+    span = 2 * ORIGIN / 2 ** z
+    columns = range(int((x0 + ORIGIN) // span), int((x1 + ORIGIN) // span) + 1)
+    rows = range(int((ORIGIN - y1) // span), int((ORIGIN - y0) // span) + 1)
+    return columns, rows
+
+
+def _pixel_centres_metric(z, x, y, step=16):
+    """Metric CRS x/y of every pixel centre of a tile, as (TILE_SIZE, TILE_SIZE) arrays
+
+    Only a lattice of control points every ``step`` pixels is projected;
+    pixels in between are interpolated bilinearly, which is far below a
+    pixel's size at these scales.
+    """
+    minx, miny, maxx, maxy = tile_bounds(z, x, y)
+    size = (maxx - minx) / TILE_SIZE
+    n = TILE_SIZE // step
+    control = np.linspace(0.5, TILE_SIZE - 0.5, n + 1)
+    cx, cy = np.meshgrid(minx + control * size, maxy - control * size)
+    mx, my = transformer(WEB_MERCATOR, METRIC_CRS).transform(cx, cy)
+
+    u = np.arange(TILE_SIZE) / (TILE_SIZE - 1) * n
+    i = np.minimum(u.astype(np.int64), n - 1)
+    f = u - i
+    fy, fx = f[:, None], f[None, :]
+    iy, ix = i[:, None], i[None, :]
+
+    def interpolate(values):
+        return ((1 - fy) * ((1 - fx) * values[iy, ix] + fx * values[iy, ix + 1])
+                + fy * ((1 - fx) * values[iy + 1, ix] + fx * values[iy + 1, ix + 1]))
+
+    return interpolate(mx), interpolate(my)
+
+
+def render_score_tile(locator, scores, z, x, y):
+    """Colour every pixel by the score of the grid cell it falls in
+
+    ``locator`` is a grid.CellLocator; pixels outside the grid stay
+    transparent.
+    """
+    cells = locator(*_pixel_centres_metric(z, x, y))
+    inside = cells >= 0
+    image = np.zeros((TILE_SIZE * TILE_SIZE, 4), dtype=np.uint8)
+    if inside.any():
+        image[inside] = score_palette()[scores[cells[inside]]]
+    return image.reshape(TILE_SIZE, TILE_SIZE, 4)
+
+
+def line_samples(geometries, minx, maxy, pixel_size):
+    """Points every half pixel along the lines, as fractional (column, row)
+
+    ``minx``/``maxy`` is the top-left corner of the image in the lines' CRS.
+    """
+    import shapely
+
+    coords, index = shapely.get_coordinates(geometries, return_index=True)
+    col = (coords[:, 0] - minx) / pixel_size
+    row = (maxy - coords[:, 1]) / pixel_size
+    same = index[1:] == index[:-1]
+    x0, y0, x1, y1 = col[:-1][same], row[:-1][same], col[1:][same], row[1:][same]
+
+    steps = np.ceil(np.hypot(x1 - x0, y1 - y0) * 2).astype(np.int64) + 1
+    segment = np.repeat(np.arange(len(steps)), steps)
+    t = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)) / np.maximum(np.repeat(steps, steps) - 1, 1)
+    return x0[segment] + t * (x1 - x0)[segment], y0[segment] + t * (y1 - y0)[segment]
+
+
+def render_road_tile(tree, geometries, z, x, y, width=1):
+    """Draw road lines by sampling each segment at sub-pixel spacing"""
+    import shapely
+
+    minx, miny, maxx, maxy = tile_bounds(z, x, y)
+    size = (maxx - minx) / TILE_SIZE
+    image = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    hits = tree.query(shapely.box(minx - size, miny - size, maxx + size, maxy + size))
+    if not len(hits):
+        return image
+
+    sx, sy = line_samples(geometries[hits], minx, maxy, size)
+    for dx in range(width):
+        for dy in range(width):
+            c = np.floor(sx).astype(np.int64) + dx
+            r = np.floor(sy).astype(np.int64) + dy
+            keep = (c >= 0) & (c < TILE_SIZE) & (r >= 0) & (r < TILE_SIZE)
+            image[r[keep], c[keep]] = ROAD_COLOR
+    return image
+
+
+# Per-process layer data, set once by _init_worker
+_layers = {}
+
+
+def _init_worker(layers):
+    import shapely
+
+    from grid import CellLocator
+
+    for name, layer in layers.items():
+        if layer['kind'] == 'score':
+            _layers[name] = (CellLocator(layer['cells']), layer['scores'])
+        else:
+            geometries = shapely.from_wkb(layer['wkb'])
+            _layers[name] = (shapely.STRtree(geometries), geometries)
+
+
+def _render_batch(output_dir, name, kind, z, tiles):
+    """Render and write a batch of tiles of one layer, returns how many were non-empty"""
+    written = 0
+    for x, y in tiles:
+        if kind == 'score':
+            image = render_score_tile(*_layers[name], z, x, y)
+        else:
+            image = render_road_tile(*_layers[name], z, x, y, width=2 if z >= 14 else 1)
+        if not image[..., 3].any():
+            continue
+        filepath = os.path.join(output_dir, name, str(z), str(x), f'{y}.png')
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(encode_png(image))
+        written += 1
+    return written
+
+
+def score_layer(cells, column='composite_score'):
+    """Worker payload for a grid of cells (see grid.py)"""
+    scores = np.clip(np.round(cells[column].to_numpy(dtype=float) * 2.55), 0, 255).astype(np.uint8)
+    centres = cells[['x', 'y']].copy()
+    centres.attrs = dict(cells.attrs)
+    return {'kind': 'score', 'cells': centres, 'scores': scores}
+
+
+def road_layer(roads):
+    """Worker payload for a road GeoDataFrame"""
+    import shapely
+
+    return {'kind': 'roads', 'wkb': shapely.to_wkb(roads.to_crs(WEB_MERCATOR).geometry.values)}
+
+
+def build_pyramid(layers, bounds, output_dir=TILES_DIR, zooms=range(MIN_ZOOM, MAX_ZOOM + 1), workers=None):
+    """Render every layer at every zoom over the lon/lat bounds
+
+    ``layers`` maps layer names to score_layer/road_layer payloads. Writes
+    <output_dir>/<layer>/<z>/<x>/<y>.png plus tiles.json describing the
+    pyramid, and returns that metadata.
+    """
+    tasks = []
+    for name, layer in layers.items():
+        # Empty tiles are not written, so clear out tiles of a previous run
+        shutil.rmtree(os.path.join(output_dir, name), ignore_errors=True)
+        for z in zooms:
+            columns, rows = tile_range(bounds, z)
+            tiles = [(x, y) for x in columns for y in rows]
+            for start in range(0, len(tiles), TILES_PER_TASK):
+                tasks.append((output_dir, name, layer['kind'], z, tiles[start:start + TILES_PER_TASK]))
+
+    counts = dict.fromkeys(layers, 0)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(layers,)) as pool:
+        futures = [(task[1], pool.submit(_render_batch, *task)) for task in tasks]
+        for name, future in futures:
+            counts[name] += future.result()
+
+    metadata = {
+        'bounds': list(bounds),
+        'center': [(bounds[1] + bounds[3]) / 2, (bounds[0] + bounds[2]) / 2],
+        'minzoom': min(zooms),
+        'maxzoom': max(zooms),
+        'tile_size': TILE_SIZE,
+        'layers': {name: {'url': f'{name}/{{z}}/{{x}}/{{y}}.png', 'tiles': counts[name]} for name in layers},
+        'score_stops': SCORE_STOPS
+    }
+    with open(os.path.join(output_dir, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+def load_metadata(tiles_dir=TILES_DIR):
+    """tiles.json of a pyramid, or None if no tiles have been built"""
+    filepath = os.path.join(tiles_dir, METADATA_FILE)
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath) as f:
+        return json.load(f)
+
+
+# Dependency-free slippy map (no Leaflet or CDN) for browsing the pyramid offline
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Lahore EV suitability tiles</title>
+<style>
+  html, body { margin: 0; height: 100%; font-family: sans-serif; }
+  #map { position: absolute; inset: 0; overflow: hidden; background: #f2efe9; cursor: grab; }
+  #map img { position: absolute; width: 256px; height: 256px; user-select: none; pointer-events: none; }
+  #panel { position: absolute; top: 10px; right: 10px; background: white; padding: 8px 12px;
+           border: 1px solid #ccc; border-radius: 4px; font-size: 13px; z-index: 10; }
+</style>
+</head>
+<body>
+<div id="map"></div>
+<div id="panel"></div>
+<script>
+fetch('tiles.json').then(function(r) { return r.json(); }).then(function(meta) {
+  var map = document.getElementById('map'), panel = document.getElementById('panel');
+  var size = meta.tile_size, zoom = meta.minzoom + 1, shown = {}, tiles = {};
+  Object.keys(meta.layers).forEach(function(name) {
+    shown[name] = true;
+    panel.insertAdjacentHTML('beforeend', '<label><input type="checkbox" checked data-layer="' + name + '"> ' + name + '</label><br>');
+  });
+  panel.addEventListener('change', function(e) { shown[e.target.dataset.layer] = e.target.checked; draw(); });
+  function project(lat, lon, z) {
+    var s = Math.sin(lat * Math.PI / 180), n = size * Math.pow(2, z);
+    return [(lon + 180) / 360 * n, (0.5 - Math.log((1 + s) / (1 - s)) / (4 * Math.PI)) * n];
+  }
+  var centre = project(meta.center[0], meta.center[1], zoom);
+  function draw() {
+    var w = map.clientWidth, h = map.clientHeight, left = centre[0] - w / 2, top = centre[1] - h / 2, keep = {};
+    Object.keys(meta.layers).forEach(function(name, order) {
+      if (!shown[name]) return;
+      for (var x = Math.floor(left / size); x <= Math.floor((left + w) / size); x++) {
+        for (var y = Math.floor(top / size); y <= Math.floor((top + h) / size); y++) {
+          var key = [name, zoom, x, y].join('/');
+          keep[key] = true;
+          if (!tiles[key]) {
+            var img = new Image();
+            img.onerror = function() { this.style.display = 'none'; };
+            img.src = meta.layers[name].url.replace('{z}', zoom).replace('{x}', x).replace('{y}', y);
+            img.style.zIndex = order;
+            map.appendChild(img);
+            tiles[key] = {img: img, x: x, y: y};
+          }
+          tiles[key].img.style.left = (tiles[key].x * size - left) + 'px';
+          tiles[key].img.style.top = (tiles[key].y * size - top) + 'px';
+        }
+      }
+    });
+    Object.keys(tiles).forEach(function(key) {
+      if (!keep[key]) { map.removeChild(tiles[key].img); delete tiles[key]; }
+    });
+  }
+  var drag = null;
+  map.addEventListener('mousedown', function(e) { drag = [e.clientX, e.clientY]; });
+  window.addEventListener('mouseup', function() { drag = null; });
+  window.addEventListener('mousemove', function(e) {
+    if (!drag) return;
+    centre = [centre[0] - (e.clientX - drag[0]), centre[1] - (e.clientY - drag[1])];
+    drag = [e.clientX, e.clientY];
+    draw();
+  });
+  map.addEventListener('wheel', function(e) {
+    e.preventDefault();
+    var next = Math.max(meta.minzoom, Math.min(meta.maxzoom, zoom + (e.deltaY < 0 ? 1 : -1)));
+    var factor = Math.pow(2, next - zoom);
+    centre = [centre[0] * factor, centre[1] * factor];
+    zoom = next;
+    draw();
+  }, {passive: false});
+  window.addEventListener('resize', draw);
+  draw();
+});
+</script>
+</body>
+</html>
+"""
+
+
+def main():
+    import grid
+    from storage import INFRASTRUCTURE_DIR, find_layer, read_layer
+    from study_area import lahore_coords
+
+    parser = argparse.ArgumentParser(description="Render the suitability grid and roads as static map tiles")
+    parser.add_argument('--grid', default='data/grid/lahore_grid_hex_500m.npz')
+    parser.add_argument('--output', default=TILES_DIR)
+    parser.add_argument('--min-zoom', type=int, default=MIN_ZOOM)
+    parser.add_argument('--max-zoom', type=int, default=MAX_ZOOM)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    print("⚡ RENDERING MAP TILES")
+    print("=" * 60)
+
+    layers = {}
+    if os.path.exists(args.grid):
+        cells = grid.load_grid(args.grid, columns=['x', 'y', 'lon', 'lat', 'composite_score'])
+        layers['score'] = score_layer(cells)
+        bounds = (cells['lon'].min(), cells['lat'].min(), cells['lon'].max(), cells['lat'].max())
+        print(f"✅ Suitability grid: {len(cells):,} cells")
+    else:
+        print(f"⚠️ Grid not found: {args.grid} (run grid.py)")
+        lons, lats = zip(*lahore_coords)
+        bounds = (min(lons), min(lats), max(lons), max(lats))
+
+    for name in ROAD_LAYERS:
+        filepath = find_layer(f'{INFRASTRUCTURE_DIR}/{name}')
+        if filepath:
+            roads = read_layer(filepath, columns=[], memory_map=True)
+            layers['roads'] = road_layer(roads)
+            print(f"✅ Roads: {len(roads):,} segments from {filepath}")
+            break
+
+    if not layers:
+        print("❌ Nothing to render")
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    metadata = build_pyramid(layers, bounds, args.output, range(args.min_zoom, args.max_zoom + 1), args.workers)
+    with open(os.path.join(args.output, VIEWER_FILE), 'w', encoding='utf-8') as f:
+        f.write(VIEWER_HTML)
+
+    for name, layer in metadata['layers'].items():
+        print(f"✅ {name}: {layer['tiles']:,} tiles, zoom {metadata['minzoom']}-{metadata['maxzoom']}")
+    print(f"✅ Tiles saved: {args.output} (open {VIEWER_FILE} through a local web server)")
+
+
+if __name__ == '__main__':
+    main()
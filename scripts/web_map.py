@@ -0,0 +1,227 @@
+import html
+import json
+import os
+import time
+
+import folium
+import numpy as np
+from folium.map import Layer
+from folium.plugins import FastMarkerCluster
+from folium.template import Template
+
+# Point layers for the folium maps. Small layers are drawn as one
+# folium.Marker each; above MARKER_LIMIT points the layer is emitted once as
+# a compact JSON array and built in the browser, clustered
+# (FastMarkerCluster) or, above CLUSTER_LIMIT, as CircleMarkers on a single
+# canvas. Popups are assembled on click from the array instead of being
+# written out as HTML per point.
+
+MARKER_LIMIT = 200
+CLUSTER_LIMIT = 20_000
+
+# Leaflet/awesome-markers colour names -> CSS colours for canvas circles
+CSS_COLORS = {
+    'red': '#d63e2a', 'darkred': '#a23336', 'orange': '#f69730', 'green': '#72b026',
+    'darkgreen': '#728224', 'blue': '#38aadd', 'darkblue': '#0067a3', 'purple': '#d252b9',
+    'darkpurple': '#5b396b', 'cadetblue': '#436978', 'gray': '#575757', 'black': '#303030'
+}
+
+# Display names of the tiles.py layers
+TILE_LAYER_NAMES = {'score': 'Suitability Score', 'roads': 'Major Roads'}
+
+# Same layout as popup_html, built in the browser from a data row
+# [lat, lon, style, title, field, ...]
+_POPUP_JS = """
+    function popupHtml(row, labels) {
+        var lines = ['<b>' + row[3] + '</b>'];
+        for (var j = 0; j < labels.length; j++) {
+            lines.push(labels[j] + ': ' + row[4 + j]);
+        }
+        return lines.join('<br>');
+    }
+"""
+
+
+def render_mode(n_points, marker_limit=MARKER_LIMIT, cluster_limit=CLUSTER_LIMIT):
+    """How a layer of n_points is drawn"""
+    if n_points <= marker_limit:
+        return 'markers'
+    return 'cluster' if n_points <= cluster_limit else 'canvas'
+
+
+def popup_html(title, fields):
+    """'<b>title</b><br>Label: value<br>...' from (label, formatted value) pairs"""
+    lines = [f'<b>{html.escape(str(title))}</b>']
+    lines += [f'{label}: {html.escape(str(value))}' for label, value in fields]
+    return '<br>'.join(lines)
+
+
+class CanvasPoints(Layer):
+    """CircleMarkers drawn on one shared canvas from a JSON array of rows"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function() {
+            """ + _POPUP_JS + """
+            var data = {{ this.data }};
+            var renderer = L.canvas({padding: 0.5});
+            var layer = L.featureGroup();
+            for (var i = 0; i < data.points.length; i++) {
+                var row = data.points[i];
+                L.circleMarker([row[0], row[1]], {
+                    renderer: renderer, radius: {{ this.radius }}, weight: 1,
+                    color: data.colors[row[2]], fillColor: data.colors[row[2]], fillOpacity: 0.7,
+                    row: i
+                }).addTo(layer);
+            }
+            if (data.labels !== null) {
+                layer.bindPopup(function(marker) {
+                    return popupHtml(data.points[marker.options.row], data.labels);
+                });
+            }
+            return layer.addTo({{ this._parent.get_name() }});
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, rows, colors, labels=None, radius=5, name=None):
+        super().__init__(name=name)
+        self._name = 'CanvasPoints'
+        self.radius = radius
+        self.data = json.dumps({'colors': [CSS_COLORS.get(color, color) for color in colors],
+                                'labels': labels, 'points': rows}, separators=(',', ':'))
+
+
+def _cluster_callback(styles, labels, prefix):
+    """FastMarkerCluster callback building one awesome-marker per data row"""
+    return """(function() {
+        var styles = %s;
+        var labels = %s;
+        %s
+        return function(row) {
+            var style = styles[row[2]];
+            var icon = L.AwesomeMarkers.icon({markerColor: style[0], icon: style[1], prefix: %s});
+            var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+            if (labels !== null) {
+                marker.bindPopup(function() { return popupHtml(row, labels); });
+            }
+            return marker;
+        };
+    })()""" % (json.dumps(styles), json.dumps(labels), _POPUP_JS, json.dumps(prefix))
+
+
+def _point_rows(lat, lon, codes, popups):
+    """[[lat, lon, style, title, field, ...], ...] with HTML-escaped strings"""
+    columns = [np.round(np.asarray(lat, dtype=float), 6).tolist(),
+               np.round(np.asarray(lon, dtype=float), 6).tolist(),
+               codes.tolist()]
+    if popups is not None:
+        columns += [[html.escape(str(value)) for value in popups[column]] for column in popups.columns]
+    return [list(row) for row in zip(*columns)]
+
+
+def _style_codes(n, color, icon):
+    """Distinct (color, icon) pairs and each point's index into them"""
+    colors = np.broadcast_to(np.asarray(color, dtype=object), n)
+    icons = np.broadcast_to(np.asarray(icon, dtype=object), n)
+    styles = list(dict.fromkeys(zip(colors, icons)))
+    lookup = {style: code for code, style in enumerate(styles)}
+    return styles, np.fromiter((lookup[style] for style in zip(colors, icons)), dtype=np.int64, count=n)
+
+
+def add_points(folium_map, lat, lon, popups=None, color='blue', icon='info-sign', prefix='glyphicon',
+               name=None, max_width=250, radius=5, marker_limit=MARKER_LIMIT, cluster_limit=CLUSTER_LIMIT):
+    """Add a point layer, drawn as markers, a cluster or a canvas by size
+
+    ``popups`` is a DataFrame of formatted values: the first column is the
+    popup title, the others are shown as "column: value" lines. ``color``
+    and ``icon`` are folium.Icon names, one for the layer or one per point.
+    Returns the render mode used; the layer is recorded for save_map.
+    """
+    n = len(lat)
+    mode = render_mode(n, marker_limit, cluster_limit)
+    styles, codes = _style_codes(n, color, icon)
+    labels = list(popups.columns[1:]) if popups is not None else None
+
+    if mode == 'markers':
+        target = folium.FeatureGroup(name=name).add_to(folium_map) if name else folium_map
+        rows = popups.to_numpy().tolist() if popups is not None else None
+        for i, (y, x) in enumerate(zip(lat, lon)):
+            popup = None
+            if rows is not None:
+                popup = folium.Popup(popup_html(rows[i][0], zip(labels, rows[i][1:])), max_width=max_width)
+            style_color, style_icon = styles[codes[i]]
+            folium.Marker(location=[y, x], popup=popup,
+                          icon=folium.Icon(color=style_color, icon=style_icon, prefix=prefix)).add_to(target)
+    elif mode == 'cluster':
+        rows = _point_rows(lat, lon, codes, popups)
+        FastMarkerCluster(rows, callback=_cluster_callback(styles, labels, prefix), name=name).add_to(folium_map)
+    else:
+        rows = _point_rows(lat, lon, codes, popups)
+        CanvasPoints(rows, [style[0] for style in styles], labels, radius=radius, name=name).add_to(folium_map)
+
+    if not hasattr(folium_map, 'point_layers'):
+        folium_map.point_layers = {}
+    folium_map.point_layers[name or f'layer_{len(folium_map.point_layers)}'] = {'points': n, 'mode': mode}
+    return mode
+
+
+def add_tile_layers(folium_map, map_path, tiles_dir=None):
+    """Overlay the static tile pyramid from tiles.py on a map saved at map_path
+
+    Tiles are referenced by relative URL, so the map and tiles only need a
+    static file server. Returns the added layer names (none if no tiles
+    have been built). Add a folium.LayerControl afterwards to toggle them.
+    """
+    from tiles import TILES_DIR, load_metadata
+
+    tiles_dir = tiles_dir or TILES_DIR
+    metadata = load_metadata(tiles_dir)
+    if metadata is None:
+        return []
+
+    base = os.path.relpath(tiles_dir, os.path.dirname(map_path) or '.').replace(os.sep, '/')
+    west, south, east, north = metadata['bounds']
+    for name, layer in metadata['layers'].items():
+        folium.TileLayer(
+            tiles=f"{base}/{layer['url']}",
+            attr='Lahore EV analysis',
+            name=TILE_LAYER_NAMES.get(name, name),
+            overlay=True,
+            min_native_zoom=metadata['minzoom'],
+            max_native_zoom=metadata['maxzoom'],
+            bounds=[[south, west], [north, east]]
+        ).add_to(folium_map)
+    return list(metadata['layers'])
+
+
+def save_map(folium_map, filepath):
+    """Save the map and report its size and render time
+
+    The numbers are also written to <map>.metrics.json next to the HTML to
+    track size regressions between runs. The page itself prints its load
+    time to the browser console.
+    """
+    folium_map.get_root().script.add_child(folium.Element(
+        "console.info('Map ready in ' + Math.round(performance.now()) + ' ms');"
+    ))
+
+    start = time.perf_counter()
+    folium_map.save(filepath)
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(filepath)
+
+    layers = getattr(folium_map, 'point_layers', {})
+    metrics = {
+        'bytes': size,
+        'render_seconds': round(seconds, 3),
+        'points': sum(layer['points'] for layer in layers.values()),
+        'layers': layers
+    }
+    with open(os.path.splitext(filepath)[0] + '.metrics.json', 'w') as f:
+        json.dump(metrics, f, indent=2)
+
+    modes = ', '.join(f"{name}: {layer['points']:,} as {layer['mode']}" for name, layer in layers.items())
+    print(f"   {os.path.basename(filepath)}: {size / 1024:,.1f} KB, rendered in {seconds:.2f}s"
+          + (f" ({modes})" if modes else ''))
+    return size